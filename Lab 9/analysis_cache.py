@@ -0,0 +1,512 @@
+#!/usr/bin/env python3
+"""
+Incremental dependency analysis backed by an on-disk cache.
+
+The cache remembers, per source file, its size, mtime and content hash together
+with the raw imports parsed from it, and per module the derived metrics (fan-in,
+fan-out, coupling, depth, height, cycle membership and transitive importers).
+A re-run only reparses files whose content changed, and only recomputes metrics
+for the part of the graph that an added or removed import can affect:
+
+- fan-in/fan-out: the two ends of every changed import
+- cycles, transitive impact and depth: everything reachable from a changed
+  import's target
+- height: everything that can reach a changed import's source
+
+Cycle counts, witness cycles and suggested cycle breaks are only worked out
+for components an edit touched, and only when a summary or report asks for
+them. LiveAnalysis keeps
+the module map and graph in memory as well, so a long-running caller only
+re-resolves the files it reparsed.
+
+It writes the same dependencies.json, coupling_metrics.csv and
+dependency_metrics_summary.txt as a full run.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+from collections import deque
+
+from dependency_graph import DependencyGraph, MutableDependencyGraph
+from dependency_reports import write_coupling_csv, write_summary
+from graph_algorithms import closure, induced_subgraph, reachable_counts_within, strongly_connected_components
+from import_extractor import (assemble_dependencies, find_modules, is_package_path, parse_all, resolve_all,
+                              resolve_imports, write_dependencies)
+
+CACHE_VERSION = 2
+DEFAULT_CACHE_FILE = ".dependency_cache.json"
+
+# Same bounds as cycle_detector's enumeration
+MAX_CYCLE_LENGTH = 10
+MAX_CYCLES = 1000
+
+
+def file_digest(path):
+    """SHA-256 of a file's content."""
+    with open(path, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def count_cycles(graph, modules):
+    """Count the cycles among `modules`, one component's names (bounded like cycle_detector's enumeration)."""
+    from cycle_detector import iter_cycles
+    count = 0
+    for count, _ in enumerate(iter_cycles(graph, [{"modules": modules}], MAX_CYCLE_LENGTH, MAX_CYCLES), 1):
+        pass
+    return count
+
+
+def summarize_component(graph, modules):
+    """
+    The "degrees" and "witness" of one cyclic component as in
+    cycle_detector.summarize_cycle_components, found without condensing the
+    whole graph: the witness is a shortest cycle through the component's most
+    connected module.
+    """
+    index, names = graph.index, graph.names
+    members = {index[module] for module in modules}
+    degree = dict.fromkeys(members, 0)
+    for node in members:
+        for nxt in graph.imports[node]:
+            if nxt in members:
+                degree[node] += 1
+                degree[nxt] += 1
+    anchor = max(sorted(members, key=names.__getitem__), key=degree.__getitem__)
+    summary = {"degrees": {names[node]: count for node, count in degree.items()}, "witness": [names[anchor]]}
+    if len(members) == 1:
+        return summary
+    parents = {anchor: None}
+    queue = deque([anchor])
+    while queue:
+        current = queue.popleft()
+        for nxt in graph.imports[current]:
+            if nxt == anchor and current != anchor:
+                path = [current]
+                while parents[path[-1]] is not None:
+                    path.append(parents[path[-1]])
+                summary["witness"] = [names[node] for node in reversed(path)]
+                return summary
+            if nxt in members and nxt not in parents:
+                parents[nxt] = current
+                queue.append(nxt)
+    return summary
+
+
+class AnalysisCache:
+    """
+    Parsed imports keyed by file path + content hash, plus per-module metrics.
+
+    The cache lives in memory between calls (so long-running callers can keep
+    it warm) and is persisted as JSON with save().
+    """
+
+    def __init__(self, cache_file=None):
+        self.cache_file = cache_file
+        self.files = {}       # path -> {"size", "mtime_ns", "hash", "imports"}
+        self.imports = {}     # module -> modules it imported in the last analyzed graph
+        self.metrics = {}     # module -> metric record
+        self.components = {}  # cyclic component representative -> {"modules", "size", "edges", ...}
+        self.edge_count = 0
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                # Unreadable or truncated: start over, like a cache from another version
+                data = None
+            sections = {"files": dict, "imports": dict, "metrics": dict, "components": dict, "edge_count": int}
+            if isinstance(data, dict) and data.get("version") == CACHE_VERSION \
+                    and all(isinstance(data.get(key), kind) for key, kind in sections.items()):
+                self.files = data["files"]
+                self.imports = data["imports"]
+                self.metrics = data["metrics"]
+                self.components = data["components"]
+                self.edge_count = data["edge_count"]
+
+    def save(self):
+        """Write the cache atomically next to its final location."""
+        data = {
+            "version": CACHE_VERSION,
+            "files": self.files,
+            "imports": self.imports,
+            "metrics": self.metrics,
+            "components": self.components,
+            "edge_count": self.edge_count
+        }
+        temp_file = self.cache_file + ".tmp"
+        with open(temp_file, "w") as f:
+            json.dump(data, f)
+        os.replace(temp_file, self.cache_file)
+
+    def parse_sources(self, modules, workers=None, prune=True):
+        """
+        Return (raw_imports, reparsed) for `modules` (module name -> path).
+
+        Files whose size and mtime are unchanged are trusted; otherwise the
+        content hash decides whether the file has to be parsed again. Modules
+        whose file has disappeared since `modules` was listed are removed from
+        it; an unreadable file counts as a module without imports, as in
+        parse_imports. With `prune` the cache forgets every file that is not
+        in `modules`; without it only the given files' entries are replaced.
+        """
+        raw_imports = {}
+        files = {}
+        to_parse = []
+        unreadable = []
+        vanished = []
+        for module, path in modules.items():
+            entry = self.files.get(path)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                vanished.append(module)
+                continue
+            if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+                files[path] = entry
+                raw_imports[module] = entry["imports"]
+                continue
+            try:
+                digest = file_digest(path)
+            except OSError as e:
+                print(f"Warning: could not read {path}: {e}", file=sys.stderr)
+                raw_imports[module] = []
+                unreadable.append(module)
+                continue
+            if entry and entry["hash"] == digest:
+                entry = dict(entry, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+                files[path] = entry
+                raw_imports[module] = entry["imports"]
+                continue
+            files[path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "hash": digest}
+            to_parse.append(module)
+
+        parsed = parse_all([modules[module] for module in to_parse], workers)
+        for module, records in zip(to_parse, parsed):
+            files[modules[module]]["imports"] = records
+            raw_imports[module] = records
+
+        if prune:
+            self.files = files
+        else:
+            for module in vanished:
+                self.files.pop(modules[module], None)
+            self.files.update(files)
+        for module in vanished:
+            del modules[module]
+        return raw_imports, to_parse + unreadable
+
+    def update(self, graph, changed_modules=None):
+        """
+        Bring the cached metrics up to date with `graph`.
+
+        `graph` is a DependencyGraph or a MutableDependencyGraph. By default
+        every module's imports are compared; `changed_modules` may instead name
+        the only modules whose imports can have changed, in which case the
+        graph may only have gained modules that they import. Returns the set of
+        module names whose metrics were recomputed.
+        """
+        names, index = graph.names, graph.index
+        old_imports = self.imports
+        if changed_modules is None:
+            candidates = names
+            removed_modules = [module for module in old_imports if module not in graph]
+        else:
+            candidates = {module for module in changed_modules if module in graph}
+            for module in list(candidates):
+                candidates.update(names[t] for t in graph.imports[index[module]])
+            removed_modules = []
+        added_modules = [module for module in candidates if module not in old_imports]
+
+        # Diff the imports of every module that may have changed
+        sources, targets = set(), set()
+        new_imports = {}
+        for module in candidates:
+            new_imports[module] = new = [names[t] for t in graph.imports[index[module]]]
+            old = old_imports.get(module, ())
+            if set(old) != set(new):
+                sources.add(module)
+                targets.update(set(old) ^ set(new))
+        for module in removed_modules:
+            targets.update(old_imports[module])
+        targets.update(added_modules)
+        sources.update(added_modules)
+
+        if changed_modules is None:
+            self.imports = new_imports
+        else:
+            self.imports.update(new_imports)
+        self.edge_count = graph.number_of_edges()
+        for module in removed_modules:
+            component = self.metrics.pop(module).get("component")
+            self.components.pop(component, None)
+        if not sources and not targets:
+            return set()
+
+        # A module that lost an ancestor through a removed import was reachable
+        # from that import's target, and the target is in `targets` itself, so
+        # closures in the new graph also cover everything the old graph reached
+        target_ids = {index[m] for m in targets if m in graph}
+        source_ids = {index[m] for m in sources if m in graph}
+        downstream = closure(graph.imports, target_ids)
+        upstream = closure(graph.imported_by, source_ids)
+        fan_changed = {index[m] for m in sources | targets if m in graph}
+
+        for node in fan_changed | downstream | upstream:
+            module = names[node]
+            record = self.metrics.setdefault(module, {"module": module})
+            fan_in, fan_out = graph.fan_in(node), graph.fan_out(node)
+            record.update(fan_in=fan_in, fan_out=fan_out, coupling=fan_in * fan_out)
+
+        self._update_cycles_and_depth(graph, downstream)
+        self._update_impact(graph, downstream)
+        self._update_height(graph, upstream)
+        return {names[node] for node in fan_changed | downstream | upstream}
+
+    def _update_cycles_and_depth(self, graph, region):
+        """Recompute SCC membership and depth for a successor-closed region."""
+        names = graph.names
+        local_nodes, local_adjacency = induced_subgraph(graph.imports, region)
+        local_id = {node: i for i, node in enumerate(local_nodes)}
+        component_of, components = strongly_connected_components(local_adjacency)
+
+        # Components that touched the region are rebuilt from scratch
+        for node in local_nodes:
+            self.components.pop(self.metrics[names[node]].get("component"), None)
+
+        depth = [0] * len(components)
+        # Tarjan emits sinks first, so walk backwards for a topological order
+        for c in range(len(components) - 1, -1, -1):
+            members = [local_nodes[i] for i in components[c]]
+            member_set = set(members)
+            edges = sum(1 for node in members for t in graph.imports[node] if t in member_set)
+            cyclic = edges > 0
+            representative = min(names[node] for node in members) if cyclic else None
+            if cyclic:
+                # Cycles, degrees, witness and breaks are only worked out when asked for
+                self.components[representative] = {
+                    "modules": sorted(names[node] for node in members),
+                    "size": len(members),
+                    "edges": edges,
+                    "cycles": None,
+                    "degrees": None,
+                    "witness": None,
+                    "breaks": None
+                }
+
+            best = 0
+            for node in members:
+                for importer in graph.imported_by[node]:
+                    if importer in member_set:
+                        continue
+                    if importer in local_id:
+                        best = max(best, depth[component_of[local_id[importer]]] + 1)
+                    else:
+                        best = max(best, self.metrics[names[importer]]["depth"] + 1)
+            depth[c] = best
+            for node in members:
+                self.metrics[names[node]].update(depth=best, in_cycle=cyclic, component=representative)
+
+    def _update_impact(self, graph, region):
+        """Recompute transitive importer counts for a successor-closed region."""
+        names = graph.names
+        for node, count in reachable_counts_within(graph.imported_by, region).items():
+            self.metrics[names[node]]["transitive_importers"] = count
+
+    def _update_height(self, graph, region):
+        """Recompute heights for a predecessor-closed region."""
+        names = graph.names
+        local_nodes, local_adjacency = induced_subgraph(graph.imports, region)
+        local_id = {node: i for i, node in enumerate(local_nodes)}
+        component_of, components = strongly_connected_components(local_adjacency)
+        height = [0] * len(components)
+        # Sinks first: successors are always settled before their importers
+        for c, local_members in enumerate(components):
+            best = 0
+            for i in local_members:
+                for t in graph.imports[local_nodes[i]]:
+                    if t in local_id:
+                        target = component_of[local_id[t]]
+                        if target != c:
+                            best = max(best, height[target] + 1)
+                    else:
+                        best = max(best, self.metrics[names[t]]["height"] + 1)
+            height[c] = best
+            for i in local_members:
+                self.metrics[names[local_nodes[i]]]["height"] = best
+
+    def coupling_metrics(self, graph):
+        """Cached records in module name order, ranked by coupling like the full analysis."""
+        records = [self.metrics[module] for module in sorted(graph.names)]
+        return sorted(records, key=lambda x: x["coupling"], reverse=True)
+
+    def cyclic_totals(self):
+        """(cyclic components, modules in cycles)."""
+        return len(self.components), sum(c["size"] for c in self.components.values())
+
+    def cycle_count(self, graph):
+        """
+        Number of cycles for the summary, capped at MAX_CYCLES.
+
+        Components are counted on demand and stay counted until an edit
+        touches them; counting stops as soon as the cap is reached.
+        """
+        total = 0
+        for component in self.components.values():
+            if total >= MAX_CYCLES:
+                break
+            if component.get("cycles") is None:
+                component["cycles"] = count_cycles(graph, component["modules"])
+            total += component["cycles"]
+        return min(total, MAX_CYCLES)
+
+    def cycle_summaries(self, graph):
+        """
+        The cyclic components in cycle_detector.summarize_cycle_components'
+        layout and order, each with its suggest_cycle_breaks entry as "breaks".
+        """
+        from cycle_detector import suggest_cycle_breaks
+        summaries = []
+        for component in self.components.values():
+            if component.get("witness") is None:
+                component.update(summarize_component(graph, component["modules"]))
+            if component.get("breaks") is None:
+                component["breaks"] = suggest_cycle_breaks(graph, [component])[0]
+            summaries.append({key: component[key]
+                              for key in ("modules", "size", "edges", "degrees", "witness", "breaks")})
+        summaries.sort(key=lambda s: (-s["size"], -s["edges"], s["modules"][0]))
+        return summaries
+
+
+class LiveAnalysis:
+    """
+    A source tree's module map, resolved imports and graph, kept next to an
+    AnalysisCache for callers that refresh repeatedly (watch_dependencies).
+
+    refresh() re-resolves only the edited files and applies their import
+    changes to the graph in place. Adding or removing files can change how
+    other modules' imports resolve, so that (and an edit that leaves a
+    third-party module without importers) falls back to rebuild(), which
+    relists and re-resolves the whole tree but still only reparses files
+    whose content changed.
+
+    Like analyze_dependencies, the summary only counts individual cycles with
+    `enumerate_cycles`.
+    """
+
+    def __init__(self, cache, source_root, workers=None, enumerate_cycles=False):
+        self.cache = cache
+        self.source_root = source_root
+        self.workers = workers
+        self.enumerate_cycles = enumerate_cycles
+        self.modules = {}   # module -> path
+        self.paths = {}     # path -> module
+        self.resolved = {}  # module -> set of modules it imports
+        self.graph = None
+
+    def rebuild(self):
+        """Relist and re-resolve the tree; returns (reparsed, recomputed) module names."""
+        modules = find_modules(self.source_root)
+        raw_imports, reparsed = self.cache.parse_sources(modules, self.workers)
+        resolved = resolve_all(modules, raw_imports)
+        imports = dict(resolved)
+        for targets in resolved.values():
+            for target in targets:
+                imports.setdefault(target, set())
+        graph = DependencyGraph.from_dependencies(
+            {module: {"imports": sorted(imports[module])} for module in sorted(imports)})
+
+        self.modules = modules
+        self.paths = {path: module for module, path in modules.items()}
+        self.resolved = resolved
+        self.graph = MutableDependencyGraph(graph)
+        # With an unchanged module set only reparsed files can have new imports
+        changed = reparsed if set(imports) == set(self.cache.imports) else None
+        return reparsed, self.cache.update(self.graph, changed)
+
+    def refresh(self, paths):
+        """Bring the graph and cache up to date after `paths` changed; returns (reparsed, recomputed)."""
+        if self.graph is None or any(path not in self.paths or not os.path.exists(path) for path in paths):
+            return self.rebuild()
+        edited = {self.paths[path]: path for path in paths}
+        raw_imports, reparsed = self.cache.parse_sources(edited, self.workers, prune=False)
+        if len(edited) < len(paths):
+            # A file vanished while it was being read
+            return self.rebuild()
+
+        graph = self.graph
+        orphaned = False
+        for module in reparsed:
+            path = self.modules[module]
+            targets = resolve_imports(module, is_package_path(path), raw_imports[module], self.modules)
+            self.resolved[module] = targets
+            target_ids = [graph.index[t] if t in graph else graph.add_module(t) for t in targets]
+            _, removed = graph.set_imports(graph.index[module], target_ids)
+            orphaned = orphaned or any(graph.names[t] not in self.modules and not graph.imported_by[t]
+                                       for t in removed)
+        if orphaned:
+            # A full run would not list a third-party module nobody imports anymore
+            return self.rebuild()
+        return reparsed, self.cache.update(graph, reparsed)
+
+    def write_outputs(self, output_dir):
+        """Write dependencies.json, coupling_metrics.csv and the summary to `output_dir`."""
+        self.write_dependency_file(output_dir)
+        self.write_metrics(output_dir)
+
+    def write_dependency_file(self, output_dir):
+        """Write dependencies.json, which serializes the whole graph."""
+        dependencies = assemble_dependencies(self.modules, self.resolved)
+        write_dependencies(dependencies, os.path.join(output_dir, "dependencies.json"))
+
+    def write_metrics(self, output_dir):
+        """Write coupling_metrics.csv and the summary from the cached metrics."""
+        coupling_metrics = self.cache.coupling_metrics(self.graph)
+        write_coupling_csv(os.path.join(output_dir, "coupling_metrics.csv"), coupling_metrics)
+        component_count, cyclic_module_count = self.cache.cyclic_totals()
+        cycle_count = self.cache.cycle_count(self.graph) if self.enumerate_cycles else None
+        write_summary(os.path.join(output_dir, "dependency_metrics_summary.txt"), coupling_metrics,
+                      self.cache.edge_count, component_count, cyclic_module_count,
+                      cycle_count, MAX_CYCLE_LENGTH, MAX_CYCLES)
+
+
+def refresh_outputs(cache, source_root, output_dir, workers=None, enumerate_cycles=False):
+    """
+    Bring `cache` up to date with `source_root` and rewrite the analysis files.
+
+    Writes dependencies.json, coupling_metrics.csv and the summary to `output_dir`.
+    Returns (graph, reparsed modules, recomputed modules).
+    """
+    live = LiveAnalysis(cache, source_root, workers, enumerate_cycles)
+    reparsed, recomputed = live.rebuild()
+    live.write_outputs(output_dir)
+    return live.graph, reparsed, recomputed
+
+
+def analyze_incrementally(source_root, output_dir, cache_file=None, workers=None, enumerate_cycles=False):
+    """Run refresh_outputs once with a cache loaded from (and saved back to) disk."""
+    start_time = time.time()
+    cache = AnalysisCache(cache_file or os.path.join(output_dir, DEFAULT_CACHE_FILE))
+    graph, reparsed, recomputed = refresh_outputs(cache, source_root, output_dir, workers, enumerate_cycles)
+    cache.save()
+
+    print(f"Reparsed {len(reparsed)} of {len(cache.files)} files, recomputed metrics for "
+          f"{len(recomputed)} of {len(graph)} modules in {time.time() - start_time:.2f} seconds")
+    return cache, graph
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Incrementally analyze a source tree using a content-hash cache.")
+    parser.add_argument("source_root", help="package directory or directory containing packages")
+    parser.add_argument("--output-dir", default=".", help="where to write the analysis files")
+    parser.add_argument("--cache", default=None, help=f"cache file (default: OUTPUT_DIR/{DEFAULT_CACHE_FILE})")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: all cores)")
+    parser.add_argument("--enumerate", action="store_true", dest="enumerate_cycles",
+                        help=f"count individual cycles for the summary (length <= {MAX_CYCLE_LENGTH}, "
+                             f"at most {MAX_CYCLES})")
+    args = parser.parse_args()
+    analyze_incrementally(args.source_root, args.output_dir, args.cache, args.workers, args.enumerate_cycles)
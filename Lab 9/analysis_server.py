@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Local server answering dependency queries from a graph kept in memory.
+
+A script pays for interpreter startup, imports and building the graph before
+it can answer anything. The server pays that once: it loads the graph (a
+dependencies.json or a snapshot), its SCCs and an ImpactIndex, then answers
+queries over a Unix socket or a localhost TCP port. Clients such as editor
+plugins and pre-commit hooks send one JSON object per line and get one JSON
+line back:
+
+    {"op": "fan", "module": "pkg.mod"}
+    {"op": "impact", "module": "pkg.mod"}
+    {"op": "affected", "changes": ["pkg/mod.py"], "rank": true, "select": ["tests.*"]}
+    {"op": "risk", "module": "pkg.mod"}
+    {"op": "cycle", "module": "pkg.mod"}
+    {"op": "path", "source": "pkg.a", "target": "pkg.b"}
+    {"op": "stats"}
+
+Replies are {"ok": true, "result": ...} or {"ok": false, "error": "..."}, with
+the request's "id" copied over if it had one. Connections are served
+concurrently and each may send any number of requests.
+
+The dependency file is polled for changes. A changed file is loaded in a
+worker thread while queries keep being answered from the current graph, and
+the new state is swapped in once it is ready; if no import changed the old
+state (and everything it has cached) is kept. A reload is a full rebuild of
+the graph and the index: the file has to be read whole anyway, and the
+edge diff is only used to skip no-op reloads and to log what changed. Risk scores are computed on
+first use and then cached until the next reload.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import deque
+
+from dependency_graph import DependencyGraph
+from graph_diff import diff_edges
+from impact_query import ImpactIndex
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 7341
+# Seconds between two checks of the dependency file
+DEFAULT_POLL_INTERVAL = 1.0
+
+
+class AnalysisState:
+    """One loaded graph and everything derived from it."""
+
+    def __init__(self, dependency_file):
+        self.dependency_file = dependency_file
+        self.stat = _file_stat(dependency_file)
+        start_time = time.perf_counter()
+        self.graph = DependencyGraph.load(dependency_file)
+        self.impact_index = ImpactIndex(self.graph)
+        self.load_seconds = time.perf_counter() - start_time
+        self.risk_scores = None
+
+    def module_id(self, name):
+        if name not in self.graph:
+            raise ValueError(f"Unknown module: {name}")
+        return self.graph.index[name]
+
+    def risk_table(self):
+        """Risk scores by module, computed once per loaded graph."""
+        if self.risk_scores is None:
+            from dependency_impact_assessment import calculate_risk_scores
+            self.risk_scores = {score["module"]: score for score in calculate_risk_scores(self.graph)}
+        return self.risk_scores
+
+    def fan(self, module):
+        graph = self.graph
+        node = self.module_id(module)
+        fan_in, fan_out = graph.fan_in(node), graph.fan_out(node)
+        return {
+            "module": module,
+            "fan_in": fan_in,
+            "fan_out": fan_out,
+            "coupling": fan_in * fan_out,
+            "imports": [graph.names[i] for i in graph.imports[node]],
+            "imported_by": [graph.names[i] for i in graph.imported_by[node]],
+        }
+
+    def impact(self, module):
+        """The module's row of calculate_impact_scores, from a single index walk."""
+        node = self.module_id(module)
+        direct = self.graph.fan_in(node)
+        # The walk includes the module itself, which only imports itself if it is cyclic
+        transitive = len(self.impact_index.affected([node])) - (0 if self.in_cycle(node) else 1)
+        return {
+            "module": module,
+            "direct_impact": direct,
+            "indirect_impact": transitive - direct,
+            "total_impact": direct * 2 + transitive - direct,
+        }
+
+    def in_cycle(self, node):
+        members = self.impact_index.components[self.impact_index.component_of[node]]
+        return len(members) > 1 or node in self.graph.imports[node]
+
+    def cycle(self, module):
+        node = self.module_id(module)
+        members = self.impact_index.components[self.impact_index.component_of[node]]
+        cyclic = self.in_cycle(node)
+        return {"module": module, "in_cycle": cyclic,
+                "component": sorted(self.graph.names[i] for i in members) if cyclic else []}
+
+    def path(self, source, target):
+        """
+        Shortest import chain from `source` to `target`, or None if there is none.
+
+        For source == target this is the shortest cycle through the module
+        (starting and ending with it), or just [module] if it is on no cycle.
+        """
+        imports = self.graph.imports
+        start, goal = self.module_id(source), self.module_id(target)
+        previous = {start: None}
+        queue = deque([start])
+        while queue:
+            node = queue.popleft()
+            for nxt in imports[node]:
+                # Checked before `previous` so that a walk back to the start is found too
+                if nxt == goal:
+                    chain = [nxt, node]
+                    while previous[chain[-1]] is not None:
+                        chain.append(previous[chain[-1]])
+                    return [self.graph.names[i] for i in reversed(chain)]
+                if nxt in previous:
+                    continue
+                previous[nxt] = node
+                queue.append(nxt)
+        return [source] if start == goal else None
+
+    def stats(self):
+        return {
+            "dependency_file": self.dependency_file,
+            "modules": len(self.graph),
+            "imports": self.graph.number_of_edges(),
+            "components": len(self.impact_index.components),
+            "cyclic_modules": len(self.graph.cyclic_nodes()),
+            "load_seconds": round(self.load_seconds, 4),
+        }
+
+
+def _file_stat(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class AnalysisServer:
+    """Serves queries from the current AnalysisState and swaps in reloads."""
+
+    def __init__(self, dependency_file, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.dependency_file = dependency_file
+        self.poll_interval = poll_interval
+        self.state = AnalysisState(dependency_file)
+        self._risk_lock = asyncio.Lock()
+
+    async def answer(self, request):
+        """Result of one request; a bad request raises KeyError (missing field) or ValueError."""
+        state = self.state
+        op = request.get("op")
+        if op == "fan":
+            return state.fan(request["module"])
+        if op == "impact":
+            return state.impact(request["module"])
+        if op == "affected":
+            found, unknown = state.impact_index.query(request["changes"], request.get("rank", False),
+                                                      request.get("select"), request.get("source_root"))
+            return {"affected": found, "unknown": unknown}
+        if op == "risk":
+            state.module_id(request["module"])
+            if state.risk_scores is None:
+                # The first risk query builds the whole table; keep serving others meanwhile
+                async with self._risk_lock:
+                    await asyncio.to_thread(state.risk_table)
+            return state.risk_table()[request["module"]]
+        if op == "cycle":
+            return state.cycle(request["module"])
+        if op == "path":
+            return state.path(request["source"], request["target"])
+        if op == "stats":
+            return state.stats()
+        raise ValueError(f"Unknown op: {op}")
+
+    async def handle_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                reply = {}
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("A request must be a JSON object")
+                    if "id" in request:
+                        reply["id"] = request["id"]
+                    reply.update(ok=True, result=await self.answer(request))
+                except KeyError as e:
+                    reply.update(ok=False, error=f"Missing field: {e}")
+                except (ValueError, TypeError) as e:
+                    reply.update(ok=False, error=str(e))
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def watch(self):
+        """Reload the graph whenever the dependency file changes."""
+        failed_stat = None
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            stat = None
+            try:
+                stat = _file_stat(self.dependency_file)
+                if stat in (self.state.stat, failed_stat):
+                    continue
+                new_state = await asyncio.to_thread(AnalysisState, self.dependency_file)
+            except Exception as e:
+                # Most likely caught mid-write; retried once the file changes
+                # again. A bad file must never stop the watcher.
+                print(f"Reload failed: {e!r}", file=sys.stderr)
+                failed_stat = stat
+                continue
+            added_modules, removed_modules, added_edges, removed_edges = diff_edges(self.state.graph,
+                                                                                    new_state.graph)
+            if not (added_modules or removed_modules or added_edges or removed_edges):
+                self.state.stat = new_state.stat
+                print("Dependency file touched, no import changes")
+                continue
+            self.state = new_state
+            print(f"Reloaded in {new_state.load_seconds:.2f} seconds: "
+                  f"+{len(added_modules)}/-{len(removed_modules)} modules, "
+                  f"+{len(added_edges)}/-{len(removed_edges)} imports")
+
+
+async def serve(dependency_file, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT,
+                poll_interval=DEFAULT_POLL_INTERVAL):
+    """Load `dependency_file` and serve queries until cancelled."""
+    server = AnalysisServer(dependency_file, poll_interval)
+    if socket_path:
+        listener = await asyncio.start_unix_server(server.handle_client, path=socket_path)
+        where = socket_path
+    else:
+        listener = await asyncio.start_server(server.handle_client, host, port)
+        where = f"{host}:{port}"
+    stats = server.state.stats()
+    print(f"Serving {stats['modules']} modules from {dependency_file} on {where} "
+          f"(loaded in {stats['load_seconds']:.2f} seconds)")
+    watcher = asyncio.create_task(server.watch())
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        watcher.cancel()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+async def query(requests, socket_path=None, host=DEFAULT_HOST, port=DEFAULT_PORT):
+    """Send requests (dicts) to a running server and return the replies in order."""
+    if socket_path:
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    try:
+        for request in requests:
+            writer.write(json.dumps(request).encode() + b"\n")
+        await writer.drain()
+        return [json.loads(await reader.readline()) for _ in requests]
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve dependency queries from a graph kept in memory.")
+    parser.add_argument("dependency_file", nargs="?", default=None,
+                        help="dependencies.json or snapshot to serve (omit with --query)")
+    parser.add_argument("--socket", default=None, help="Unix socket path (default: TCP on localhost)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="TCP port when no socket is given")
+    parser.add_argument("--poll-interval", type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="seconds between checks of the dependency file for changes")
+    parser.add_argument("--query", action="append", default=None,
+                        help="send this JSON request to a running server and print the reply (repeatable)")
+    args = parser.parse_args()
+
+    if args.query:
+        replies = asyncio.run(query([json.loads(q) for q in args.query], args.socket, port=args.port))
+        for reply in replies:
+            print(json.dumps(reply, indent=2))
+    elif args.dependency_file:
+        try:
+            asyncio.run(serve(args.dependency_file, args.socket, port=args.port, poll_interval=args.poll_interval))
+        except KeyboardInterrupt:
+            pass
+    else:
+        parser.error("give a dependency file to serve or --query to ask a running server")
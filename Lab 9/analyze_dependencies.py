@@ -1,64 +1,48 @@
-import json
-import os
-import sys
-
-# Setup path to avoid circular imports - crucial for preventing the logging module conflict
-current_dir = os.path.dirname(os.path.abspath(__file__))
-# Remove current dir from path to avoid importing local logging.py when networkx tries to import logging
-sys_path_copy = sys.path.copy()
-sys.path = [p for p in sys.path if p != current_dir and p != '']
+import time
 
-# Now import dependencies after path modification
-try:
-    import networkx as nx
-    import matplotlib.pyplot as plt
-    import numpy as np
-    from tabulate import tabulate
-    from collections import defaultdict
-except ImportError as e:
-    # Restore path before reporting error
-    sys.path = sys_path_copy
-    print(f"Error importing dependencies: {e}")
-    print("Make sure required packages are installed: networkx, matplotlib, numpy, tabulate")
-    sys.exit(1)
+# Taken first so the startup measurement covers every import below
+start_time = time.perf_counter()
 
-# Restore original path after imports
-sys.path = sys_path_copy
-
-# Load the dependency data
-with open(os.path.join(current_dir, "dependencies.json"), "r") as f:
-    dependencies = json.load(f)
+import argparse
+import os
 
-# Create a directed graph
-G = nx.DiGraph()
+from cycle_detector import (DEFAULT_MAX_CYCLE_LENGTH, DEFAULT_MAX_CYCLES,
+                            iter_cycles, summarize_cycle_components)
+from dependency_graph import DependencyGraph
+from dependency_plots import DEFAULT_MAX_PACKAGES, draw_core_dependencies, draw_package_graph
+from dependency_reports import categorize_modules, write_coupling_csv, write_summary
+from lazy_imports import report_startup, tabulate
+
+parser = argparse.ArgumentParser(description="Analyze coupling, cycles and depth of the module dependencies.")
+parser.add_argument("--no-plots", action="store_true",
+                    help="metrics only: skip the visualizations and never import the plotting stack")
+parser.add_argument("--rollup-depth", type=int, default=1,
+                    help="package levels shown in package_dependencies.png (below --rollup-prefix if given)")
+parser.add_argument("--rollup-prefix", default=None,
+                    help="drill down into this package, e.g. uvicorn.protocols")
+parser.add_argument("--max-packages", type=int, default=DEFAULT_MAX_PACKAGES,
+                    help="packages drawn in package_dependencies.png; the rest are merged into (other)")
+parser.add_argument("--enumerate", action="store_true", dest="enumerate_cycles",
+                    help=f"also list individual cycles (length <= {DEFAULT_MAX_CYCLE_LENGTH}, "
+                         f"at most {DEFAULT_MAX_CYCLES})")
+args = parser.parse_args()
+if args.rollup_depth < 1:
+    parser.error("--rollup-depth must be at least 1")
+if args.max_packages < 1:
+    parser.error("--max-packages must be at least 1")
 
-# Add nodes (modules)
-for module_name in dependencies.keys():
-    G.add_node(module_name)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+report_startup(start_time)
 
-# Add edges (dependencies)
-for module_name, module_data in dependencies.items():
-    for imported_module in module_data.get("imports", []):
-        G.add_edge(module_name, imported_module)
+# Load the dependency data into the shared compact graph
+graph = DependencyGraph.load(os.path.join(current_dir, "dependencies.json"))
 
 print("=== Dependency Analysis ===\n")
 
 # 1. Calculate Coupling Metrics
-coupling_metrics = []
-for module_name, module_data in dependencies.items():
-    fan_in = len(module_data.get("imported_by", []))
-    fan_out = len(module_data.get("imports", []))
-    coupling = fan_in * fan_out  # A simple coupling metric
-    
-    coupling_metrics.append({
-        "module": module_name,
-        "fan_in": fan_in,
-        "fan_out": fan_out,
-        "coupling": coupling
-    })
-
-# Sort by coupling score
-coupling_metrics.sort(key=lambda x: x["coupling"], reverse=True)
+# Keyed per-module table; coupling_metrics is the same records ranked by coupling
+coupling_table = graph.coupling_table()
+coupling_metrics = sorted(coupling_table.values(), key=lambda x: x["coupling"], reverse=True)
 
 # Display top 10 most coupled modules
 print("Top 10 Most Coupled Modules:")
@@ -69,35 +53,42 @@ print(tabulate(table_data,
               tablefmt="grid"))
 print("\n")
 
-# Save coupling data to CSV
-with open(os.path.join(current_dir, "coupling_metrics.csv"), "w") as f:
-    f.write("Module,Fan-In,Fan-Out,Coupling Score\n")
-    for m in coupling_metrics:
-        f.write(f"{m['module']},{m['fan_in']},{m['fan_out']},{m['coupling']}\n")
-
 # 2. Detect Cyclic Dependencies
 print("Cyclic Dependencies Analysis:")
-cycles = list(nx.simple_cycles(G))
+# Summarize cycles per strongly connected component instead of enumerating them all
+cycle_components = summarize_cycle_components(graph)
+# Only counted when the individual cycles are listed
+cycle_count = 0 if args.enumerate_cycles else None
+cyclic_modules = set()
 
-if not cycles:
+if not cycle_components:
     print("No cyclic dependencies detected.")
 else:
-    print(f"Found {len(cycles)} cyclic dependencies:")
-    for i, cycle in enumerate(cycles, 1):
-        cycle_str = " -> ".join(cycle)
-        print(f"Cycle {i}: {cycle_str} -> {cycle[0]}")
-        
-        # Identify modules involved in cycles
-        for module in cycle:
-            # Mark modules that are part of cycles
-            for m in coupling_metrics:
-                if m["module"] == module:
-                    m["in_cycle"] = True
+    cyclic_modules = {module for component in cycle_components for module in component["modules"]}
+    print(f"Found {len(cycle_components)} cyclic components covering {len(cyclic_modules)} modules:")
+    for i, component in enumerate(cycle_components, 1):
+        witness = component["witness"]
+        print(f"Component {i}: {component['size']} modules, {component['edges']} imports "
+              f"(e.g. {' -> '.join(witness)} -> {witness[0]})")
+    
+    # Mark modules that are part of cycles
+    for module in cyclic_modules:
+        coupling_table[module]["in_cycle"] = True
+    
+    # List individual cycles on request, bounded so this finishes on any graph
+    if args.enumerate_cycles:
+        print(f"\nCyclic dependencies (length <= {DEFAULT_MAX_CYCLE_LENGTH}, "
+              f"at most {DEFAULT_MAX_CYCLES} listed):")
+        for cycle_count, cycle in enumerate(
+                iter_cycles(graph, cycle_components, DEFAULT_MAX_CYCLE_LENGTH, DEFAULT_MAX_CYCLES), 1):
+            cycle_str = " -> ".join(cycle)
+            print(f"Cycle {cycle_count}: {cycle_str} -> {cycle[0]}")
 print("\n")
 
 # 3. Identify Unused and Disconnected Modules
 print("Unused and Disconnected Modules:")
-isolated_nodes = list(nx.isolates(G))
+isolated_nodes = [module for module_id, module in enumerate(graph.names)
+                  if graph.fan_in(module_id) == 0 and graph.fan_out(module_id) == 0]
 if isolated_nodes:
     print(f"Found {len(isolated_nodes)} isolated modules:")
     for node in isolated_nodes:
@@ -106,16 +97,16 @@ else:
     print("No isolated modules found.")
 
 # Check for modules with no fan-in (not imported by any other module)
-no_fan_in = [module for module, data in dependencies.items() 
-             if not data.get("imported_by", [])]
+no_fan_in = [module for module_id, module in enumerate(graph.names) 
+             if graph.fan_in(module_id) == 0]
 if no_fan_in:
     print(f"\nModules not imported by any other module (no fan-in): {len(no_fan_in)}")
     for module in no_fan_in:
         print(f"  - {module}")
 
 # Check for modules with no fan-out (not importing any other module)
-no_fan_out = [module for module, data in dependencies.items() 
-              if not data.get("imports", [])]
+no_fan_out = [module for module_id, module in enumerate(graph.names) 
+              if graph.fan_out(module_id) == 0]
 if no_fan_out:
     print(f"\nModules not importing any other module (no fan-out): {len(no_fan_out)}")
     for module in no_fan_out:
@@ -125,70 +116,36 @@ print("\n")
 # 4. Assess the Dependency Depth
 print("Dependency Depth Analysis:")
 
-# Calculate longest paths
-try:
-    # Make a copy of G without cycles for longest path calculation
-    DAG = nx.DiGraph(G)
-    cycles_edges = set()
-    for cycle in cycles:
-        for i in range(len(cycle)):
-            cycles_edges.add((cycle[i], cycle[(i+1) % len(cycle)]))
-    
-    for edge in cycles_edges:
-        if DAG.has_edge(*edge):
-            DAG.remove_edge(*edge)
-    
-    # Find all roots (nodes with no incoming edges)
-    roots = [n for n in DAG.nodes() if DAG.in_degree(n) == 0]
-    
-    # Find all leaves (nodes with no outgoing edges)
-    leaves = [n for n in DAG.nodes() if DAG.out_degree(n) == 0]
-    
-    # Find the longest path
-    longest_path = None
-    longest_length = 0
-    
-    for root in roots:
-        for leaf in leaves:
-            try:
-                path = nx.shortest_path(DAG, root, leaf)
-                if len(path) > longest_length:
-                    longest_length = len(path)
-                    longest_path = path
-            except nx.NetworkXNoPath:
-                pass
-    
-    if longest_path:
-        print(f"Maximum dependency depth: {longest_length - 1}")
-        print(f"Longest dependency chain: {' -> '.join(longest_path)}")
-    else:
-        print("Could not determine the longest dependency chain.")
-except Exception as e:
-    print(f"Error calculating dependency depth: {e}")
+# Longest chains over the SCC condensation, in a single topological pass
+depth_profile = graph.longest_chains()
+
+for module_id, m in enumerate(coupling_table.values()):
+    m["depth"] = depth_profile.depth[module_id]
+    m["height"] = depth_profile.height[module_id]
+
+if depth_profile.chain:
+    chain_names = []
+    for i in depth_profile.chain:
+        name = graph.names[i]
+        if name in cyclic_modules:
+            # Import cycles are collapsed into one step of the chain
+            name += " (cycle)"
+        chain_names.append(name)
+    print(f"Maximum dependency depth: {len(depth_profile.chain) - 1}")
+    print(f"Longest dependency chain: {' -> '.join(chain_names)}")
+else:
+    print("Could not determine the longest dependency chain.")
 print("\n")
 
+# Save coupling data to CSV
+write_coupling_csv(os.path.join(current_dir, "coupling_metrics.csv"), coupling_metrics)
+
 # 5. Module Categorization
 print("Module Categorization:")
 
 # Categorize modules
-stable_abstractions = []
-unstable_abstractions = []
-stable_concretions = []
-unstable_concretions = []
-
-# Define thresholds
-fan_in_threshold = 5  # High fan-in
-fan_out_threshold = 5  # High fan-out
-
-for m in coupling_metrics:
-    if m["fan_in"] >= fan_in_threshold and m["fan_out"] < fan_out_threshold:
-        stable_abstractions.append(m["module"])
-    elif m["fan_in"] >= fan_in_threshold and m["fan_out"] >= fan_out_threshold:
-        unstable_abstractions.append(m["module"])
-    elif m["fan_in"] < fan_in_threshold and m["fan_out"] < fan_out_threshold:
-        stable_concretions.append(m["module"])
-    else:  # Low fan-in, high fan-out
-        unstable_concretions.append(m["module"])
+(stable_abstractions, unstable_abstractions,
+ stable_concretions, unstable_concretions) = categorize_modules(coupling_metrics)
 
 print(f"Stable Abstractions (high fan-in, low fan-out): {len(stable_abstractions)}")
 for module in stable_abstractions[:5]:
@@ -215,71 +172,23 @@ if len(unstable_concretions) > 5:
     print(f"  - ... and {len(unstable_concretions) - 5} more")
 
 # 6. Visualize Core Dependencies
-print("\n=== Creating Visualizations ===")
-
-# Create a visualization of the top coupled modules
-plt.figure(figsize=(12, 10))
-
-# Only visualize the most important dependencies
-top_n = 15
-top_modules = [m["module"] for m in coupling_metrics[:top_n]]
-subgraph = G.subgraph(top_modules)
-
-# Use a layout that works well for directed graphs
-pos = nx.spring_layout(subgraph, seed=42, k=0.8)
-
-# Draw nodes with size proportional to coupling
-node_sizes = [coupling_metrics[coupling_metrics.index(next(m for m in coupling_metrics if m["module"] == node))]["coupling"] * 10 + 100 for node in subgraph.nodes()]
-
-# Draw the graph
-nx.draw_networkx_nodes(subgraph, pos, node_color='skyblue', 
-                      node_size=node_sizes, alpha=0.8)
-nx.draw_networkx_edges(subgraph, pos, edge_color='gray', 
-                      width=1, alpha=0.5, arrows=True, arrowsize=15)
-nx.draw_networkx_labels(subgraph, pos, font_size=10)
-
-plt.title(f"Dependencies Between Top {top_n} Most Coupled Modules")
-plt.axis('off')
-plt.tight_layout()
-
-# Save the visualization
-core_deps_path = os.path.join(current_dir, "core_dependencies.png")
-plt.savefig(core_deps_path, bbox_inches="tight", dpi=300)
-print(f"Core dependencies visualization saved as {core_deps_path}")
+if args.no_plots:
+    print("\n=== Skipping Visualizations (--no-plots) ===")
+else:
+    print("\n=== Creating Visualizations ===")
+    core_deps_path = draw_core_dependencies(graph, coupling_metrics, coupling_table,
+                                            os.path.join(current_dir, "core_dependencies.png"))
+    print(f"Core dependencies visualization saved as {core_deps_path}")
+    # The module-level drawing only shows a handful of modules; this covers the whole graph
+    package_path = draw_package_graph(graph, os.path.join(current_dir, "package_dependencies.png"),
+                                      args.rollup_depth, args.rollup_prefix, args.max_packages)
+    print(f"Package dependencies visualization saved as {package_path}")
 
 # 7. Create a metrics summary report
 print("\nGenerating dependency metrics summary report...")
 
-with open(os.path.join(current_dir, "dependency_metrics_summary.txt"), "w") as f:
-    f.write("DEPENDENCY METRICS SUMMARY\n")
-    f.write("==========================\n\n")
-    
-    f.write(f"Total modules: {len(dependencies)}\n")
-    f.write(f"Total dependencies: {G.number_of_edges()}\n")
-    
-    if cycles:
-        f.write(f"Cyclic dependencies: {len(cycles)}\n")
-    else:
-        f.write("Cyclic dependencies: None\n")
-    
-    f.write(f"Isolated modules: {len(isolated_nodes)}\n")
-    f.write(f"Modules with no imports (fan-out=0): {len(no_fan_out)}\n")
-    f.write(f"Modules not imported (fan-in=0): {len(no_fan_in)}\n\n")
-    
-    f.write("Module Categorization:\n")
-    f.write(f"- Stable Abstractions: {len(stable_abstractions)}\n")
-    f.write(f"- Unstable Abstractions: {len(unstable_abstractions)}\n")
-    f.write(f"- Stable Concretions: {len(stable_concretions)}\n")
-    f.write(f"- Unstable Concretions: {len(unstable_concretions)}\n\n")
-    
-    # Calculate averages
-    avg_fan_in = sum(m["fan_in"] for m in coupling_metrics) / len(coupling_metrics)
-    avg_fan_out = sum(m["fan_out"] for m in coupling_metrics) / len(coupling_metrics)
-    avg_coupling = sum(m["coupling"] for m in coupling_metrics) / len(coupling_metrics)
-    
-    f.write("Averages:\n")
-    f.write(f"- Average Fan-In: {avg_fan_in:.2f}\n")
-    f.write(f"- Average Fan-Out: {avg_fan_out:.2f}\n")
-    f.write(f"- Average Coupling Score: {avg_coupling:.2f}\n")
+write_summary(os.path.join(current_dir, "dependency_metrics_summary.txt"), coupling_metrics,
+              graph.number_of_edges(), len(cycle_components), len(cyclic_modules),
+              cycle_count, DEFAULT_MAX_CYCLE_LENGTH, DEFAULT_MAX_CYCLES)
 
 print("Analysis complete! Check the generated files for results.")
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Analyze many projects in parallel and tabulate them side by side.
+
+Every input is either a pydeps-style dependencies.json or a source tree (which
+is first extracted with import_extractor). Each project runs the pipeline
+stages in its own worker process and gets its own output directory with the
+usual files plus an analysis.log of the console output. Workers are replaced
+after a few projects (max_tasks_per_child) and can be given an address-space
+limit, so one huge project cannot keep memory pinned for the rest of the batch.
+
+The consolidated table (batch_summary.csv) has one row per project with the
+statistics of dependency_metrics_summary.txt plus the top coupled, highest
+impact and highest risk module.
+"""
+
+import argparse
+import contextlib
+import csv
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dependency_reports import summary_stats
+from instrumentation import Instrumentation, limit_memory
+from import_extractor import extract_dependencies, write_dependencies
+from lazy_imports import tabulate
+from pipeline import STAGES, AnalysisContext, run_pipeline
+
+# Stages run for every project unless told otherwise (plots are slow and rarely
+# looked at across hundreds of projects)
+DEFAULT_STAGES = [stage for stage in STAGES if stage != "plots"]
+
+# Projects analyzed by one worker process before it is replaced
+DEFAULT_TASKS_PER_CHILD = 4
+
+# Column order of batch_summary.csv
+SUMMARY_COLUMNS = ["project", "modules", "dependencies", "cyclic_components", "cyclic_modules", "cycles",
+                   "isolated", "no_fan_out", "no_fan_in", "stable_abstractions", "unstable_abstractions",
+                   "stable_concretions", "unstable_concretions", "avg_fan_in", "avg_fan_out", "avg_coupling",
+                   "max_depth", "top_coupled", "top_impact", "top_risk", "seconds", "error"]
+
+
+def project_names(inputs):
+    """Give every input a unique, readable project name (used as its output directory)."""
+    names = []
+    seen = {}
+    for path in inputs:
+        path = os.path.abspath(path)
+        if os.path.isdir(path):
+            name = os.path.basename(path)
+        else:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            # dependencies.json is named after the directory it sits in
+            name = os.path.basename(os.path.dirname(path)) if stem == "dependencies" else stem
+        seen[name] = seen.get(name, 0) + 1
+        names.append(name if seen[name] == 1 else f"{name}-{seen[name]}")
+    return names
+
+
+def analyze_project(name, source, output_dir, stages, options, instrument=False):
+    """
+    Run the pipeline for one project and return its row of the consolidated table.
+
+    Runs inside a worker process; console output goes to OUTPUT_DIR/analysis.log
+    and, with `instrument`, the stage records to OUTPUT_DIR/instrumentation.json.
+    """
+    start_time = time.perf_counter()
+    row = {"project": name}
+    instrumentation = Instrumentation()
+    try:
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "analysis.log"), "w") as log, contextlib.redirect_stdout(log):
+            dependency_file = source
+            if os.path.isdir(source):
+                # Already inside a worker, so parse this project's files serially
+                dependency_file = os.path.join(output_dir, "dependencies.json")
+                with instrumentation.stage("extract") as record:
+                    dependencies = extract_dependencies(source, workers=1)
+                    write_dependencies(dependencies, dependency_file)
+                    record["items"] = len(dependencies)
+
+            ctx = AnalysisContext(dependency_file, output_dir, instrumentation=instrumentation, **options)
+            run_pipeline(ctx, stages)
+
+        row.update({
+            "modules": len(ctx.graph),
+            "dependencies": ctx.graph.number_of_edges(),
+            "cyclic_components": len(ctx.cycle_components),
+            "cyclic_modules": len(ctx.cyclic_modules),
+        })
+        if ctx.enumerate_cycles:
+            row["cycles"] = len(ctx.cycles)
+        row.update(summary_stats(ctx.coupling_metrics))
+        row["max_depth"] = max(len(ctx.depth_profile.chain) - 1, 0)
+        row["top_coupled"] = ctx.coupling_metrics[0]["module"] if ctx.coupling_metrics else ""
+        row["top_impact"] = ctx.impact_scores[0]["module"] if ctx.impact_scores else ""
+        row["top_risk"] = ctx.risk_scores[0]["module"] if ctx.risk_scores else ""
+    except Exception as e:
+        row["error"] = f"{type(e).__name__}: {e}"
+    if instrument and os.path.isdir(output_dir):
+        instrumentation.write(os.path.join(output_dir, "instrumentation.json"))
+    row["seconds"] = round(time.perf_counter() - start_time, 3)
+    return row
+
+
+def write_batch_summary(path, rows):
+    """Write the consolidated cross-project table."""
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS, restval="")
+        writer.writeheader()
+        for row in rows:
+            writer.writerow({key: (f"{value:.2f}" if isinstance(value, float) and key != "seconds" else value)
+                             for key, value in row.items()})
+
+
+def run_batch(inputs, output_dir, stages=None, workers=None, tasks_per_child=DEFAULT_TASKS_PER_CHILD,
+              memory_limit_mb=None, instrument=False, **options):
+    """
+    Analyze every input in a process pool and write OUTPUT_DIR/batch_summary.csv.
+
+    `options` are passed on to AnalysisContext (cycle enumeration and bounds, centrality method, pivots).
+    Returns the table rows sorted by project name.
+    """
+    stages = DEFAULT_STAGES if stages is None else stages
+    names = project_names(inputs)
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=tasks_per_child,
+                             initializer=limit_memory, initargs=(memory_limit_mb,)) as pool:
+        futures = {pool.submit(analyze_project, name, os.path.abspath(source),
+                               os.path.join(output_dir, name), stages, options, instrument): name
+                   for name, source in zip(names, inputs)}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                row = future.result()
+            except Exception as e:
+                # The worker itself died (e.g. killed for exceeding its memory limit)
+                row = {"project": futures[future], "error": f"{type(e).__name__}: {e}", "seconds": 0.0}
+            status = f"failed ({row['error']})" if "error" in row else f"{row['modules']} modules"
+            print(f"[{done}/{len(futures)}] {row['project']}: {status} in {row['seconds']:.2f} seconds")
+            rows.append(row)
+
+    rows.sort(key=lambda row: row["project"])
+    write_batch_summary(os.path.join(output_dir, "batch_summary.csv"), rows)
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze many dependency files or source trees in parallel.")
+    parser.add_argument("inputs", nargs="+", help="dependencies.json files and/or source directories")
+    parser.add_argument("--output-dir", default="batch_output", help="one subdirectory per project goes here")
+    parser.add_argument("--stages", default=",".join(DEFAULT_STAGES),
+                        help=f"comma-separated pipeline stages (default: {','.join(DEFAULT_STAGES)})")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument("--tasks-per-child", type=int, default=DEFAULT_TASKS_PER_CHILD,
+                        help="projects a worker analyzes before it is replaced")
+    parser.add_argument("--memory-limit", type=int, default=None,
+                        help="address-space limit per worker in MB (Unix only)")
+    parser.add_argument("--instrument", action="store_true",
+                        help="write per-stage timings to each project's instrumentation.json")
+    parser.add_argument("--centrality", choices=["connections", "betweenness"], default="connections",
+                        help="centrality measure feeding the risk score")
+    parser.add_argument("--enumerate", action="store_true", dest="enumerate_cycles",
+                        help="also enumerate individual cycles and fill the cycles column")
+    parser.add_argument("--pivots", type=int, default=None,
+                        help="estimate betweenness from this many sampled source modules")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+
+    start_time = time.time()
+    os.makedirs(args.output_dir, exist_ok=True)
+    rows = run_batch(args.inputs, args.output_dir, stages, args.workers, args.tasks_per_child,
+                     args.memory_limit, args.instrument, centrality_method=args.centrality, pivots=args.pivots,
+                     enumerate_cycles=args.enumerate_cycles)
+
+    print()
+    columns = ["project", "modules", "dependencies", "cyclic_modules", "cycles", "max_depth", "top_risk", "error"]
+    print(tabulate([[row.get(column, "") for column in columns] for row in rows], headers=columns, tablefmt="grid"))
+    failed = sum(1 for row in rows if "error" in row)
+    print(f"\nAnalyzed {len(rows) - failed} of {len(rows)} projects in {time.time() - start_time:.2f} seconds")
+    print(f"Consolidated table: {os.path.join(args.output_dir, 'batch_summary.csv')}")
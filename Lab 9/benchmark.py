@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Benchmark the analysis stages on synthetic graphs.
+
+For every requested size a dependencies.json is generated (see
+synthetic_graphs.py) and each stage is timed on it, in the order the pipeline
+runs them:
+
+    load, coupling, scc, cycles, depth, impact, centrality, risk, reporting
+
+Peak memory per stage is measured with tracemalloc (which slows everything
+down, so it can be switched off). Each size runs in its own worker process,
+optionally under an address-space limit: a stage that raises (MemoryError
+once the limit is hit) is recorded with its error and the stages after it are
+skipped, and a worker killed outright fails the whole size, without taking the
+remaining sizes down with it. Results are written as JSON; pass an earlier
+results file with --compare to flag stages that got slower.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+
+from cycle_detector import DEFAULT_MAX_CYCLE_LENGTH, DEFAULT_MAX_CYCLES, iter_cycles, summarize_cycle_components
+from dependency_graph import DependencyGraph
+from dependency_impact_assessment import (calculate_centrality, calculate_impact_scores, calculate_risk_scores,
+                                          generate_report)
+from dependency_reports import write_coupling_csv, write_summary
+from instrumentation import limit_memory
+from lazy_imports import require
+from synthetic_graphs import write_synthetic
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+
+# A stage only counts as regressed if it is this much slower (relative and absolute)
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def _stage_load(state):
+    state["graph"] = DependencyGraph.load(state["dependency_file"])
+    return len(state["graph"])
+
+
+def _stage_coupling(state):
+    state["coupling_table"] = state["graph"].coupling_table()
+    state["coupling_metrics"] = sorted(state["coupling_table"].values(), key=lambda x: x["coupling"], reverse=True)
+    return len(state["coupling_metrics"])
+
+
+def _stage_scc(state):
+    return len(state["graph"].strongly_connected_components()[1])
+
+
+def _stage_cycles(state):
+    graph = state["graph"]
+    state["components"] = summarize_cycle_components(graph)
+    state["cycle_count"] = sum(1 for _ in iter_cycles(graph, state["components"],
+                                                      DEFAULT_MAX_CYCLE_LENGTH, DEFAULT_MAX_CYCLES))
+    return state["cycle_count"]
+
+
+def _stage_depth(state):
+    profile = state["graph"].longest_chains()
+    for module_id, m in enumerate(state["coupling_table"].values()):
+        m["depth"] = profile.depth[module_id]
+        m["height"] = profile.height[module_id]
+    return len(profile.chain)
+
+
+def _stage_impact(state):
+    state["impact_scores"] = calculate_impact_scores(state["graph"])
+    return len(state["impact_scores"])
+
+
+def _stage_centrality(state):
+    return len(calculate_centrality(state["graph"]))
+
+
+def _stage_risk(state):
+    state["risk_scores"] = calculate_risk_scores(state["graph"], coupling_table=state["coupling_table"])
+    return len(state["risk_scores"])
+
+
+def _stage_reporting(state):
+    output_dir = state["output_dir"]
+    graph = state["graph"]
+    cyclic_modules = sum(c["size"] for c in state["components"])
+    write_coupling_csv(os.path.join(output_dir, "coupling_metrics.csv"), state["coupling_metrics"])
+    write_summary(os.path.join(output_dir, "dependency_metrics_summary.txt"), state["coupling_metrics"],
+                  graph.number_of_edges(), len(state["components"]), cyclic_modules,
+                  state["cycle_count"], DEFAULT_MAX_CYCLE_LENGTH, DEFAULT_MAX_CYCLES)
+    generate_report(state["impact_scores"], state["risk_scores"], graph, output_dir, plots=False)
+    return 3
+
+
+# Every stage relies on the ones before it
+STAGES = {
+    "load": _stage_load,
+    "coupling": _stage_coupling,
+    "scc": _stage_scc,
+    "cycles": _stage_cycles,
+    "depth": _stage_depth,
+    "impact": _stage_impact,
+    "centrality": _stage_centrality,
+    "risk": _stage_risk,
+    "reporting": _stage_reporting,
+}
+
+
+def _describe_error(error):
+    # A MemoryError usually comes without a message
+    return f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+
+
+def benchmark_graph(dependency_file, output_dir, measure_memory=True):
+    """
+    Run every stage once on `dependency_file`.
+
+    Returns {stage: {"seconds", "items", "peak_kb"}}, where peak_kb is the
+    largest amount of memory the stage allocated on top of what it started with.
+    A stage that raises gets {"seconds", "error"} instead, and as every stage
+    relies on the ones before it, the run stops there.
+    """
+    # Import networkx up front so the cycles stage doesn't pay for it
+    require("networkx")
+    state = {"dependency_file": dependency_file, "output_dir": output_dir}
+    results = {}
+    if measure_memory:
+        tracemalloc.start()
+    try:
+        for name, stage in STAGES.items():
+            if measure_memory:
+                tracemalloc.reset_peak()
+                baseline_memory = tracemalloc.get_traced_memory()[0]
+            start_time = time.perf_counter()
+            try:
+                items = stage(state)
+            except Exception as e:
+                # Most likely a MemoryError from the worker's memory limit
+                state.clear()
+                results[name] = {"seconds": round(time.perf_counter() - start_time, 4),
+                                 "error": _describe_error(e)}
+                break
+            elapsed = time.perf_counter() - start_time
+            results[name] = {"seconds": round(elapsed, 4), "items": items}
+            if measure_memory:
+                # Peak on top of what earlier stages still hold
+                results[name]["peak_kb"] = (tracemalloc.get_traced_memory()[1] - baseline_memory) // 1024
+    finally:
+        if measure_memory:
+            tracemalloc.stop()
+    return results
+
+
+def _benchmark_in_worker(dependency_file, output_dir, measure_memory, memory_limit_mb):
+    """benchmark_graph in a fresh process, so a failure cannot affect the next run."""
+    with ProcessPoolExecutor(max_workers=1, initializer=limit_memory, initargs=(memory_limit_mb,)) as pool:
+        return pool.submit(benchmark_graph, dependency_file, output_dir, measure_memory).result()
+
+
+def run_benchmarks(sizes, avg_imports=5.0, hub_skew=1.0, back_edges=0.01, seed=42, repeat=1,
+                   measure_memory=True, keep_dir=None, memory_limit_mb=None):
+    """
+    Benchmark every size; with `repeat` > 1 the fastest time of each stage is kept.
+
+    Every run is done in a worker process limited to `memory_limit_mb` (Unix
+    only). A run whose worker died is recorded with an "error" and no stages.
+    """
+    runs = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        graph_dir = keep_dir or work_dir
+        for size in sizes:
+            params = {"modules": size, "avg_imports": avg_imports, "hub_skew": hub_skew,
+                      "back_edges": back_edges, "seed": seed}
+            dependency_file = os.path.join(graph_dir, f"synthetic_{size}.json")
+            start_time = time.perf_counter()
+            edges = write_synthetic(dependency_file, size, avg_imports, hub_skew, back_edges, seed)
+            print(f"Generated {size} modules, {edges} imports in {time.perf_counter() - start_time:.2f} seconds")
+
+            run = {"params": dict(params, edges=edges), "stages": None}
+            for _ in range(repeat):
+                try:
+                    result = _benchmark_in_worker(dependency_file, work_dir, measure_memory, memory_limit_mb)
+                except (Exception, SystemExit) as e:
+                    # The worker itself died (e.g. killed for running out of memory)
+                    # or could not even import its dependencies under the limit
+                    run.update(stages={}, error=_describe_error(e))
+                    break
+                stages = run["stages"]
+                if stages is None:
+                    run["stages"] = result
+                    continue
+                for name, measured in result.items():
+                    if name not in stages or "error" in measured or "error" in stages[name]:
+                        stages[name] = measured
+                        continue
+                    stages[name]["seconds"] = min(stages[name]["seconds"], measured["seconds"])
+                    if "peak_kb" in measured:
+                        stages[name]["peak_kb"] = max(stages[name]["peak_kb"], measured["peak_kb"])
+
+            for name, measured in run["stages"].items():
+                if "error" in measured:
+                    print(f"  {name:<10} failed after {measured['seconds']:.3f} s: {measured['error']}")
+                    continue
+                peak = f", peak {measured['peak_kb'] / 1024:.1f} MB" if "peak_kb" in measured else ""
+                print(f"  {name:<10} {measured['seconds']:>9.3f} s  ({measured['items']} items{peak})")
+            if "error" in run:
+                print(f"  run failed: {run['error']}")
+            runs.append(run)
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "tracemalloc": measure_memory,
+        "memory_limit_mb": memory_limit_mb,
+        "runs": runs,
+    }
+
+
+def compare_results(baseline, current, tolerance=DEFAULT_TOLERANCE, min_seconds=MIN_REGRESSION_SECONDS):
+    """
+    List the stages that got slower than `baseline` by more than `tolerance`.
+
+    Runs are matched on their generator parameters; returns a list of
+    (modules, stage, baseline seconds, current seconds) tuples.
+    """
+    def key(run):
+        params = run["params"]
+        return (params["modules"], params["avg_imports"], params["hub_skew"], params["back_edges"], params["seed"])
+
+    baseline_runs = {key(run): run for run in baseline["runs"]}
+    regressions = []
+    for run in current["runs"]:
+        old = baseline_runs.get(key(run))
+        if old is None:
+            continue
+        for name, measured in run["stages"].items():
+            # Failed stages have no time to compare
+            if name not in old["stages"] or "error" in measured or "error" in old["stages"][name]:
+                continue
+            before = old["stages"][name]["seconds"]
+            after = measured["seconds"]
+            if after > before * (1 + tolerance) and after - before > min_seconds:
+                regressions.append((run["params"]["modules"], name, before, after))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time each analysis stage on synthetic graphs.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="comma-separated module counts (e.g. 1000,10000,1000000)")
+    parser.add_argument("--avg-imports", type=float, default=5.0, help="mean number of imports per module")
+    parser.add_argument("--hub-skew", type=float, default=1.0, help="how strongly imports concentrate on hubs")
+    parser.add_argument("--back-edges", type=float, default=0.01,
+                        help="fraction of imports pointing upwards (creates cycles)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per size; the fastest time is kept")
+    parser.add_argument("--no-memory", action="store_true", help="skip tracemalloc (faster, no peak memory)")
+    parser.add_argument("--memory-limit", type=int, default=None,
+                        help="address-space limit per run in MB (Unix only); stages exceeding it fail")
+    parser.add_argument("--keep-graphs", default=None, help="directory to keep the generated JSON files in")
+    parser.add_argument("-o", "--output", default="benchmark_results.json", help="where to write the results")
+    parser.add_argument("--compare", default=None, help="earlier results file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown before a stage counts as regressed")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    results = run_benchmarks(sizes, args.avg_imports, args.hub_skew, args.back_edges, args.seed,
+                             args.repeat, not args.no_memory, args.keep_graphs, args.memory_limit)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {args.output}")
+
+    failures = [(run["params"]["modules"], name, measured["error"])
+                for run in results["runs"] for name, measured in run["stages"].items() if "error" in measured]
+    failures += [(run["params"]["modules"], "run", run["error"]) for run in results["runs"] if "error" in run]
+    if failures:
+        print(f"\n{len(failures)} failure(s):")
+        for modules, stage, error in failures:
+            print(f"  {modules} modules, {stage}: {error}")
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            baseline = json.load(f)
+        if baseline.get("tracemalloc") != results["tracemalloc"]:
+            print("Warning: only one of the two runs used tracemalloc, timings are not comparable")
+        regressions = compare_results(baseline, results, args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.compare}:")
+            for modules, stage, before, after in regressions:
+                print(f"  {modules} modules, {stage}: {before:.3f} s -> {after:.3f} s ({after / before:.1f}x)")
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+    if failures:
+        sys.exit(1)
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Re-score datasets of Java snippets and their cohesion metrics.
+
+Reads CSVs laid out like cohersion_visualization.csv (a "Java Code" column
+followed by "LCOM 1" ... "LCOM 5" and "YALCOM"), recomputes the metrics for
+every snippet and writes, per row, the given values next to the recomputed
+ones and whether they agree:
+
+    verified   every metric matches within the tolerance
+    mismatch   the "Mismatches" column names the metrics that differ
+    error      the snippet could not be analyzed (no type declaration found,
+               or not a single field or method read from a non-empty body)
+
+The input is read row by row with the csv module, which handles quoted cells
+spanning many lines, and rows are scored in batches by a process pool. Only a
+bounded number of batches is in flight at a time and results are written as
+soon as they come back (in input order), so memory stays flat however large
+the file is.
+
+The Java side is a tokenizer plus a brace-matching reader, not a parser. It
+takes the first top-level type of a snippet and finds its fields, its methods
+(constructors included) and, in each method body, the fields it uses (`x` or
+`this.x`, minus parameters and locals) and the methods it calls. Members of
+nested types count as members of the top-level type, as in the datasets.
+Many snippets have had their line breaks removed, so a `//` comment can run on
+into code; a `//` comment whose line ends in ';', '{' or '}' and that has prose
+before something that looks like a statement or declaration is cut off there.
+
+The metrics themselves are shared with cohesion.py and follow its definitions
+(LCOM2 = P - Q over all method pairs, YALCOM = -1 without fields, ...). The
+tool that produced the datasets evidently uses other ones for some columns:
+cohersion_visualization.csv gives LCOM1 = 66 but LCOM2 = 0 for classes whose
+methods share no field at all, where P - Q = 66. Such rows come out as
+mismatches on those columns; the Mismatches column tells which.
+"""
+
+import argparse
+import csv
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from cohesion import lcom_metrics, transpose_masks
+
+METRIC_COLUMNS = ["LCOM 1", "LCOM 2", "LCOM 3", "LCOM 4", "LCOM 5", "YALCOM"]
+CODE_COLUMN = "Java Code"
+
+DEFAULT_BATCH_SIZE = 64
+# Values in the datasets are rounded to three decimals
+DEFAULT_TOLERANCE = 0.001
+
+_TOKEN = re.compile(r"""
+      (?P<comment>/\*.*?\*/|//[^\n]*)
+    | (?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+    | (?P<ident>[A-Za-z_$][\w$]*)
+    | (?P<number>\d[\w.]*)
+    | (?P<symbol>\S)
+""", re.VERBOSE | re.DOTALL)
+
+# Where the code starts in a `//` comment that ran on into it (see the module docstring)
+_CODE_START = re.compile(r"""
+    (?<![\w$.@])(?:
+        (?:public|protected|private|static|final|abstract|native|synchronized|transient|volatile)\s+[\w$<]
+      | (?:boolean|byte|char|short|int|long|float|double|void|var)(?:\s*\[\s*\])*\s+[A-Za-z_$]
+      | (?:if|for|while|switch|catch)\s*\(
+      | (?:try|else|finally)\s*\{
+      | (?:return|throw|assert)\b[^;{}]*;
+      | (?:break|continue)\s*;
+      | new\s+[A-Za-z_$][\w$.]*\s*[(<\[]
+      | @[A-Za-z_$]
+      | [A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*(?:\(|\s*(?:=(?!=)|\+\+|--|[-+*/]=))
+      | [A-Za-z_$][\w$.]*(?:<[^;(){}=]*>)?(?:\[\])*\s+[A-Za-z_$][\w$]*\s*(?:=(?!=)|;)
+      | [{}]
+    )""", re.VERBOSE)
+
+TYPE_KEYWORDS = {"class", "interface", "enum", "record"}
+# Words that can precede a name in a declaration without being its type
+NOT_TYPES = {"return", "new", "throw", "case", "else", "do", "yield", "instanceof", "this", "super"}
+
+
+def tokenize(code):
+    """Identifiers, numbers and symbols of a Java snippet; comments dropped, literals as '""'."""
+    tokens = []
+    for match in _TOKEN.finditer(code):
+        kind = match.lastgroup
+        if kind == "comment":
+            text = match.group()
+            if text.startswith("//") and text.rstrip().endswith((";", "{", "}")):
+                # Line breaks lost: keep the code the comment ran on into
+                code_start = _CODE_START.search(text, 2)
+                if code_start and text[2:code_start.start()].strip():
+                    tokens.extend(tokenize(text[code_start.start():]))
+            continue
+        tokens.append('""' if kind == "string" else match.group())
+    return tokens
+
+
+def _is_name(token):
+    return token[0].isalpha() or token[0] in "_$"
+
+
+def _skip_block(tokens, i):
+    """Index just past the brace block that opens at tokens[i]."""
+    depth = 0
+    while i < len(tokens):
+        if tokens[i] == "{":
+            depth += 1
+        elif tokens[i] == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return i
+
+
+def _declared_names(tokens):
+    """Variable names declared by a field or local declaration (`int a, b = 1, c;`)."""
+    names = []
+    depth = 0
+    in_initializer = False
+    for i, token in enumerate(tokens):
+        if token in "([{":
+            depth += 1
+        elif token in ")]}":
+            depth -= 1
+        elif token == "<" and not in_initializer:
+            depth += 1
+        elif token == ">" and not in_initializer:
+            depth -= 1
+        elif depth == 0 and token in ("=", ",", ";") and not in_initializer:
+            if i and _is_name(tokens[i - 1]):
+                names.append(tokens[i - 1])
+            in_initializer = token == "="
+        elif depth == 0 and token == "," and in_initializer:
+            in_initializer = False
+    if not in_initializer and tokens and _is_name(tokens[-1]):
+        names.append(tokens[-1])
+    return names
+
+
+def parse_type(tokens):
+    """
+    Fields and methods of the first top-level type in `tokens`, nested types included.
+
+    Returns (fields, methods) where methods is a list of (name, parameter
+    names, body tokens), or None if there is no type declaration or nothing
+    could be read from a non-empty body.
+    """
+    start = next((i for i, token in enumerate(tokens) if token in TYPE_KEYWORDS), None)
+    if start is None:
+        return None
+    i = start
+    while i < len(tokens) and tokens[i] != "{":
+        i += 1
+    i += 1
+
+    fields, methods = [], []
+    end = _parse_members(tokens, i, fields, methods)
+    if end > i and not fields and not methods:
+        return None
+    return fields, methods
+
+
+def _parse_members(tokens, i, fields, methods):
+    """Read the members of the type body starting at tokens[i] into `fields` and `methods`; index of its '}'."""
+    member = []
+    while i < len(tokens) and tokens[i] != "}":
+        token = tokens[i]
+        if token == ";":
+            if "(" in member and "=" not in member[:member.index("(")]:
+                # Abstract or interface method: no body
+                name = member[member.index("(") - 1]
+                methods.append((name, _parameters(member), []))
+            elif member:
+                fields.extend(_declared_names(member))
+            member = []
+            i += 1
+        elif token == "{":
+            if TYPE_KEYWORDS.intersection(member):
+                # Nested type: its members count as the outer type's
+                i = _parse_members(tokens, i + 1, fields, methods) + 1
+                member = []
+                continue
+            end = _skip_block(tokens, i)
+            if not member or member == ["static"]:
+                # Initializer block
+                member = []
+            elif "=" in member and ("(" not in member or member.index("=") < member.index("(")):
+                # Array initializer of a field: keep reading up to the ';'
+                member.extend(["{", "}"])
+            else:
+                name = member[member.index("(") - 1] if "(" in member else None
+                if name:
+                    methods.append((name, _parameters(member), tokens[i + 1:end - 1]))
+                member = []
+            i = end
+        elif token == "@" and i + 1 < len(tokens) and tokens[i + 1] != "interface":
+            i = _skip_annotation(tokens, i)
+        else:
+            member.append(token)
+            i += 1
+    return i
+
+
+def _skip_annotation(tokens, i):
+    """Index just past the annotation starting at tokens[i] ('@'), arguments included."""
+    i += 2
+    while i + 1 < len(tokens) and tokens[i] == ".":
+        i += 2  # Qualified name
+    if i < len(tokens) and tokens[i] == "(":
+        depth = 0
+        while i < len(tokens):
+            depth += {"(": 1, ")": -1}.get(tokens[i], 0)
+            i += 1
+            if depth == 0:
+                break
+    return i
+
+
+def _parameters(member):
+    """Parameter names of a method header."""
+    open_paren = member.index("(")
+    depth = 0
+    names = []
+    for j in range(open_paren, len(member)):
+        token = member[j]
+        if token in "(<":
+            depth += 1
+        elif token in ")>":
+            depth -= 1
+            if depth == 0 and token == ")":
+                if member[j - 1] != "(":
+                    names.append(member[j - 1])
+                break
+        elif token == "," and depth == 1:
+            names.append(member[j - 1])
+    return names
+
+
+def method_access(tokens, fields, method_names, parameters):
+    """(fields used, methods called) by one method body."""
+    # Locals shadowing a field: its name right after a type-like token, followed by '=', ';', ':' or ','
+    hidden = set(parameters)
+    for j in range(1, len(tokens) - 1):
+        previous = tokens[j - 1]
+        if tokens[j] in fields and tokens[j + 1] in ("=", ";", ":", ",", ")") and previous not in NOT_TYPES and \
+                (_is_name(previous) or previous in (">", "]")):
+            hidden.add(tokens[j])
+
+    used, called = set(), set()
+    for j, token in enumerate(tokens):
+        if token not in fields and token not in method_names:
+            continue
+        qualified = j >= 2 and tokens[j - 1] == "."
+        if qualified and tokens[j - 2] != "this":
+            continue
+        if j + 1 < len(tokens) and tokens[j + 1] == "(":
+            if token in method_names:
+                called.add(token)
+        elif token in fields and (qualified or token not in hidden):
+            used.add(token)
+    return used, called
+
+
+def java_metrics(code):
+    """(LCOM1, LCOM2, LCOM3, LCOM4, LCOM5, YALCOM) of a snippet, or None if it has no type."""
+    parsed = parse_type(tokenize(code))
+    if parsed is None:
+        return None
+    fields, methods = parsed
+    field_index = {}
+    for name in fields:
+        field_index.setdefault(name, len(field_index))
+    method_index = {}
+    for i, (name, _, _) in enumerate(methods):
+        method_index.setdefault(name, i)
+
+    attribute_masks = [0] * len(methods)
+    call_masks = [0] * len(methods)
+    for i, (name, parameters, body) in enumerate(methods):
+        used, called = method_access(body, field_index, method_index, parameters)
+        for field in used:
+            attribute_masks[i] |= 1 << field_index[field]
+        for callee in called:
+            k = method_index[callee]
+            if k != i:
+                call_masks[i] |= 1 << k
+                call_masks[k] |= 1 << i
+
+    return lcom_metrics(len(methods), attribute_masks, call_masks, transpose_masks(attribute_masks, len(field_index)))
+
+
+def _parse_value(text):
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def score_batch(job):
+    """Score (row number, code, given values) rows; returns one output row per input row."""
+    rows, tolerance, keep_code = job
+    scored = []
+    for number, code, given in rows:
+        computed = java_metrics(code)
+        if computed is None:
+            status, mismatches, computed = "error", "", [""] * len(METRIC_COLUMNS)
+        else:
+            mismatches = []
+            for column, text, mine in zip(METRIC_COLUMNS, given, computed):
+                value = _parse_value(text)
+                if value is None or abs(value - mine) > tolerance:
+                    mismatches.append(column)
+            status = "mismatch" if mismatches else "verified"
+            mismatches = ";".join(mismatches)
+            computed = [round(value, 3) for value in computed]
+        scored.append([number] + ([code] if keep_code else []) + list(given) + list(computed) + [status, mismatches])
+    return scored
+
+
+def iter_batches(reader, header, batch_size):
+    """Group data rows into lists of (row number, code, given metric values)."""
+    code_at = header.index(CODE_COLUMN)
+    metric_at = [header.index(column) for column in METRIC_COLUMNS]
+    batch = []
+    for number, row in enumerate(reader, 1):
+        if not row:
+            continue
+        batch.append((number, row[code_at], [row[k] if k < len(row) else "" for k in metric_at]))
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def score_dataset(input_file, output_file, workers=None, batch_size=DEFAULT_BATCH_SIZE,
+                  tolerance=DEFAULT_TOLERANCE, keep_code=False):
+    """
+    Score every row of `input_file` into `output_file`; returns {status: count}.
+
+    At most `workers * 4` batches are queued at once, so memory does not grow
+    with the input.
+    """
+    # Snippets can be far longer than the csv module's default field limit
+    csv.field_size_limit(sys.maxsize)
+    workers = workers or os.cpu_count() or 1
+    counts = {"verified": 0, "mismatch": 0, "error": 0}
+    with open(input_file, newline="") as fin, open(output_file, "w", newline="") as fout:
+        reader = csv.reader(fin)
+        header = next(reader)
+        missing = [column for column in [CODE_COLUMN] + METRIC_COLUMNS if column not in header]
+        if missing:
+            raise ValueError(f"{input_file} has no {', '.join(missing)} column")
+        writer = csv.writer(fout)
+        writer.writerow(["Row"] + ([CODE_COLUMN] if keep_code else []) + METRIC_COLUMNS
+                        + [f"Computed {column}" for column in METRIC_COLUMNS] + ["Status", "Mismatches"])
+
+        def write(rows):
+            for row in rows:
+                counts[row[-2]] += 1
+            writer.writerows(rows)
+
+        jobs = ((batch, tolerance, keep_code) for batch in iter_batches(reader, header, batch_size))
+        if workers == 1:
+            for job in jobs:
+                write(score_batch(job))
+            return counts
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            for job in jobs:
+                pending.append(pool.submit(score_batch, job))
+                if len(pending) >= workers * 4:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recompute and check the cohesion metrics of Java code datasets.")
+    parser.add_argument("input", help="CSV with a 'Java Code' column and LCOM 1-5/YALCOM columns")
+    parser.add_argument("-o", "--output", default="cohesion_scores.csv", help="where to write the scored CSV")
+    parser.add_argument("--workers", type=int, default=None, help="scoring processes (default: all cores)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="rows per task")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="largest difference still counted as a match")
+    parser.add_argument("--keep-code", action="store_true", help="copy the Java code into the output")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    counts = score_dataset(args.input, args.output, args.workers, args.batch_size, args.tolerance, args.keep_code)
+    total = sum(counts.values())
+    print(f"Scored {total} rows in {time.time() - start_time:.2f} seconds -> {args.output}")
+    for status, count in counts.items():
+        print(f"  {status}: {count}")
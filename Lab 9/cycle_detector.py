@@ -2,163 +2,346 @@
 """
 A simpler script focused only on detecting and explaining cyclic dependencies.
 """
-import json
+import argparse
 import os
-import sys
 import time
+from collections import deque
+
+from dependency_graph import DependencyGraph
+from graph_algorithms import EXACT_FEEDBACK_LIMIT, feedback_arc_set, induced_subgraph
+from lazy_imports import require, tabulate
 
-# Setup path to avoid circular imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
-sys_path_copy = sys.path.copy()
-sys.path = [p for p in sys.path if p != current_dir and p != '']
-
-try:
-    import networkx as nx
-    from tabulate import tabulate
-except ImportError as e:
-    # Restore path before reporting error
-    sys.path = sys_path_copy
-    print(f"Error importing dependencies: {e}")
-    print("Make sure required packages are installed: networkx, tabulate")
-    sys.exit(1)
-
-# Restore original path
-sys.path = sys_path_copy
-
-def detect_cycles(dependency_file):
+
+# Bounds applied when individual cycles are enumerated
+DEFAULT_MAX_CYCLE_LENGTH = 10
+DEFAULT_MAX_CYCLES = 1000
+
+# Ranking column of the report when cycles are not enumerated
+CYCLE_IMPORTS_HEADER = "Imports In/Out Within Cycle"
+
+def shortest_cycle_through(graph, node, component_id):
+    """
+    Find a shortest cycle that passes through `node`, staying inside its component.
+    Uses a breadth-first search from the node back to itself. A self-import is
+    only used as the witness of a single-module component.
+    """
+    component_of, components = graph.strongly_connected_components()
+    if len(components[component_id]) == 1:
+        return [node]
+    parents = {node: None}
+    queue = deque([node])
+    while queue:
+        current = queue.popleft()
+        for nxt in graph.imports[current]:
+            if nxt == node and current != node:
+                # Walk the parents back to rebuild the path node -> ... -> current
+                path = [current]
+                while parents[path[-1]] is not None:
+                    path.append(parents[path[-1]])
+                return path[::-1]
+            if component_of[nxt] == component_id and nxt not in parents:
+                parents[nxt] = current
+                queue.append(nxt)
+    return None
+
+
+def summarize_cycle_components(graph):
+    """
+    Split the graph into strongly connected components and summarize the cyclic ones.
+
+    Every module that takes part in a cycle belongs to exactly one cyclic component,
+    so this describes all cyclic dependencies without enumerating them. For each
+    component it reports the number of modules, the number of imports between them,
+    how many of those imports each module takes part in (as importer or imported)
+    and a witness cycle: a shortest cycle through the component's most connected
+    module.
+    """
+    component_of, components = graph.strongly_connected_components()
+    summaries = []
+    for component_id, members in enumerate(components):
+        # Count imports that stay inside the component, at both of their ends
+        degree = dict.fromkeys(members, 0)
+        edges = 0
+        for node in members:
+            for nxt in graph.imports[node]:
+                if component_of[nxt] == component_id:
+                    edges += 1
+                    degree[node] += 1
+                    degree[nxt] += 1
+        if edges == 0:
+            continue
+        
+        names = graph.names
+        anchor = max(sorted(members, key=names.__getitem__), key=degree.__getitem__)
+        witness = shortest_cycle_through(graph, anchor, component_id)
+        summaries.append({
+            "modules": sorted(names[node] for node in members),
+            "size": len(members),
+            "edges": edges,
+            "degrees": {names[node]: count for node, count in degree.items()},
+            "witness": [names[node] for node in witness]
+        })
+    # Largest first; ties by name, so the order does not depend on the SCC traversal
+    summaries.sort(key=lambda s: (-s["size"], -s["edges"], s["modules"][0]))
+    return summaries
+
+
+def suggest_cycle_breaks(graph, components=None, exact_limit=EXACT_FEEDBACK_LIMIT):
+    """
+    Imports whose removal makes every cyclic component acyclic.
+
+    Returns one {"imports": [(importer, imported), ...], "exact": bool} per
+    entry of `components` (see summarize_cycle_components), in the same order.
+    Components of at most `exact_limit` modules get a minimum set of imports,
+    larger ones the Eades-Lin-Smyth heuristic, so no cycle is ever enumerated.
+    """
+    if components is None:
+        components = summarize_cycle_components(graph)
+    names = graph.names
+    suggestions = []
+    for summary in components:
+        nodes = [graph.index[module] for module in summary["modules"]]
+        local_nodes, local_imports = induced_subgraph(graph.imports, nodes)
+        edges, exact = feedback_arc_set(local_imports, exact_limit)
+        suggestions.append({
+            "imports": sorted((names[local_nodes[u]], names[local_nodes[v]]) for u, v in edges),
+            "exact": exact
+        })
+    return suggestions
+
+
+def iter_cycles(graph, components=None, max_length=None, max_count=None):
+    """
+    Stream the elementary cycles of the graph, one cyclic component at a time.
+
+    Cycles longer than `max_length` are skipped and the generator stops after
+    `max_count` cycles, so enumeration stays bounded on graphs whose cycle count
+    grows exponentially. `components` may be the output of summarize_cycle_components.
+    """
+    nx = require("networkx")
+    if components is None:
+        components = summarize_cycle_components(graph)
+    count = 0
+    for summary in components:
+        # Only the component itself is handed to networkx for enumeration
+        subgraph = graph.to_networkx(summary["modules"])
+        for cycle in nx.simple_cycles(subgraph, length_bound=max_length):
+            if max_count is not None and count >= max_count:
+                return
+            count += 1
+            yield cycle
+
+
+def write_report_summary(f, source, components):
+    """Write the report header and the per-component summary table to an open file."""
+    f.write("# Cyclic Dependencies Report\n\n")
+    f.write(f"Analysis of {source}\n\n")
+    f.write(f"## Summary\n\n")
+    if not components:
+        f.write("No cyclic dependencies detected.\n")
+        return
+    modules_in_components = sum(c["size"] for c in components)
+    f.write(f"Found {len(components)} cyclic components covering {modules_in_components} modules.\n\n")
+    f.write("| Component | Modules | Imports | Witness Cycle |\n")
+    f.write("|-----------|---------|---------|---------------|\n")
+    for i, c in enumerate(components, 1):
+        f.write(f"| {i} | {c['size']} | {c['edges']} | {' → '.join(c['witness'])} → {c['witness'][0]} |\n")
+
+
+def rank_by_cycle_imports(components):
+    """(module, imports within its component it takes part in) pairs, most entangled first."""
+    degrees = {}
+    for c in components:
+        degrees.update(c["degrees"])
+    return sorted(degrees.items(), key=lambda x: (-x[1], x[0]))
+
+
+def write_problematic_modules(f, graph, problematic_modules, involvement_header=CYCLE_IMPORTS_HEADER):
+    """Write the report table of the ten modules most entangled in cycles."""
+    f.write("\n## Most Problematic Modules\n\n")
+    f.write(f"| Module | {involvement_header} | Fan-Out | Fan-In |\n")
+    f.write("|--------|----------------|---------|--------|\n")
+    for module, count in problematic_modules[:10]:
+        fan_out = graph.fan_out(graph.index[module])
+        fan_in = graph.fan_in(graph.index[module])
+        f.write(f"| {module} | {count} | {fan_out} | {fan_in} |\n")
+
+
+def write_cycle_breaks(f, breaks):
+    """Write the report table of imports to remove (suggest_cycle_breaks' output)."""
+    f.write("\n## Imports to Remove to Break All Cycles\n\n")
+    f.write("| Component | Import | Method |\n")
+    f.write("|-----------|--------|--------|\n")
+    for i, suggestion in enumerate(breaks, 1):
+        method = "minimum" if suggestion["exact"] else "heuristic"
+        for importer, imported in suggestion["imports"]:
+            f.write(f"| {i} | {importer} → {imported} | {method} |\n")
+
+
+def detect_cycles(dependency_file, enumerate_cycles=False, max_length=DEFAULT_MAX_CYCLE_LENGTH,
+                  max_count=DEFAULT_MAX_CYCLES, graph=None, components=None, cycles=None,
+                  report_file=None, exact_limit=EXACT_FEEDBACK_LIMIT):
     """
     Detect and analyze cyclic dependencies in the given dependency file.
+
+    By default only the cyclic components (SCCs) are reported. With `enumerate_cycles`
+    the individual cycles are streamed as well, capped by `max_length` and `max_count`.
+
+    A caller that already has the graph, its cycle components or the enumerated
+    cycles can pass them in so nothing is recomputed (see pipeline.py).
+
+    The imports to remove to break every cycle come from suggest_cycle_breaks;
+    `exact_limit` is the largest component it solves exactly.
     """
-    with open(dependency_file, 'r') as f:
-        dependencies = json.load(f)
+    if graph is None:
+        graph = DependencyGraph.load(dependency_file)
     
-    # Create a directed graph
-    G = nx.DiGraph()
+    # Find cyclic components
+    if components is None:
+        start_time = time.time()
+        print("Finding cyclic dependencies...")
+        components = summarize_cycle_components(graph)
+        end_time = time.time()
+        print(f"Cycle detection completed in {end_time - start_time:.2f} seconds\n")
     
-    # Add nodes and edges
-    for module_name in dependencies.keys():
-        G.add_node(module_name)
-    
-    for module_name, module_data in dependencies.items():
-        for imported_module in module_data.get("imports", []):
-            G.add_edge(module_name, imported_module)
-    
-    # Find simple cycles
-    start_time = time.time()
-    print("Finding cyclic dependencies...")
-    cycles = list(nx.simple_cycles(G))
-    end_time = time.time()
-    print(f"Cycle detection completed in {end_time - start_time:.2f} seconds\n")
-    
-    if not cycles:
+    if not components:
         print("No cyclic dependencies detected. Great job!")
-        return
+        return components
     
-    # Group cycles by length
-    cycles_by_length = {}
-    for cycle in cycles:
-        length = len(cycle)
-        if length not in cycles_by_length:
-            cycles_by_length[length] = []
-        cycles_by_length[length].append(cycle)
+    modules_in_components = sum(c["size"] for c in components)
     
     # Print summary
-    print(f"Found {len(cycles)} cyclic dependencies.")
-    for length, cycles_list in sorted(cycles_by_length.items()):
-        print(f"  - {len(cycles_list)} cycles of length {length}")
+    print(f"Found {len(components)} cyclic components covering {modules_in_components} modules.")
+    table = [[i, c["size"], c["edges"], " → ".join(c["witness"]) + f" → {c['witness'][0]}"]
+             for i, c in enumerate(components, 1)]
+    print(tabulate(table, headers=["Component", "Modules", "Imports", "Witness Cycle"], tablefmt="grid"))
     print()
     
-    # Print details of each cycle
-    print("=== Cycle Details ===")
-    for i, cycle in enumerate(sorted(cycles, key=len), 1):
-        cycle_str = " → ".join(cycle)
-        print(f"Cycle {i}: {cycle_str} → {cycle[0]}")
+    if report_file is None:
+        report_file = os.path.join(os.path.dirname(dependency_file), "cyclic_dependencies_report.md")
+    with open(report_file, "w") as f:
+        write_report_summary(f, dependency_file, components)
         
-        # For each module in the cycle, show what they import from the cycle
-        for j, module in enumerate(cycle):
-            next_module = cycle[(j + 1) % len(cycle)]
-            if module in dependencies and next_module in dependencies[module].get("imports", []):
-                print(f"  - {module} imports {next_module}")
-        print()
-    
-    # Find modules involved in the most cycles
-    modules_in_cycles = {}
-    for cycle in cycles:
-        for module in cycle:
-            if module not in modules_in_cycles:
-                modules_in_cycles[module] = 0
-            modules_in_cycles[module] += 1
-    
-    # Print the most problematic modules
-    print("=== Most Problematic Modules ===")
-    print("These modules are involved in the most cyclic dependencies:")
-    problematic_modules = sorted(modules_in_cycles.items(), key=lambda x: x[1], reverse=True)
-    table = [[module, count, 
-              len(dependencies.get(module, {}).get("imports", [])), 
-              len(dependencies.get(module, {}).get("imported_by", []))] 
-             for module, count in problematic_modules[:10]]
-    headers = ["Module", "Cycles Involved", "Fan-Out", "Fan-In"]
-    print(tabulate(table, headers=headers, tablefmt="grid"))
+        # Count how involved each module is
+        modules_in_cycles = {}
+        cycles_by_length = {}
+        cycle_count = 0
+        if enumerate_cycles:
+            # Stream the individual cycles straight into the console and the report
+            limits = []
+            if max_length is not None:
+                limits.append(f"length <= {max_length}")
+            if max_count is not None:
+                limits.append(f"at most {max_count} cycles")
+            limit_str = f" ({', '.join(limits)})" if limits else ""
+            print(f"=== Cycle Details{limit_str} ===")
+            f.write(f"\n## Detailed Cycles{limit_str}\n\n")
+            
+            if cycles is None:
+                cycles = iter_cycles(graph, components, max_length, max_count)
+            for i, cycle in enumerate(cycles, 1):
+                cycle_count = i
+                cycles_by_length[len(cycle)] = cycles_by_length.get(len(cycle), 0) + 1
+                for module in cycle:
+                    modules_in_cycles[module] = modules_in_cycles.get(module, 0) + 1
+                
+                cycle_str = " → ".join(cycle)
+                print(f"Cycle {i}: {cycle_str} → {cycle[0]}")
+                f.write(f"### Cycle {i}\n\n")
+                f.write(f"{cycle_str} → {cycle[0]}\n\n")
+                
+                # For each module in the cycle, show what they import from the cycle
+                for j, module in enumerate(cycle):
+                    next_module = cycle[(j + 1) % len(cycle)]
+                    print(f"  - {module} imports {next_module}")
+                    f.write(f"- {module} imports {next_module}\n")
+                print()
+                f.write("\n")
+            
+            capped = max_count is not None and cycle_count >= max_count
+            print(f"Found {'at least ' if capped else ''}{cycle_count} cyclic dependencies{limit_str}.")
+            for length, count in sorted(cycles_by_length.items()):
+                print(f"  - {count} cycles of length {length}")
+            print()
+            f.write(f"Listed {cycle_count} cyclic dependencies{limit_str}.\n\n")
+            for length, count in sorted(cycles_by_length.items()):
+                f.write(f"- {count} cycles of length {length}\n")
+            
+            problematic_modules = sorted(modules_in_cycles.items(), key=lambda x: (-x[1], x[0]))
+            involvement_header = "Cycles Involved"
+        else:
+            # Without enumeration, rank modules by the imports inside their own
+            # component that they make or receive
+            problematic_modules = rank_by_cycle_imports(components)
+            involvement_header = CYCLE_IMPORTS_HEADER
+        
+        # Print the most problematic modules
+        print("=== Most Problematic Modules ===")
+        print("These modules are the most entangled in cyclic dependencies:")
+        table = [[module, count, 
+                  graph.fan_out(graph.index[module]), 
+                  graph.fan_in(graph.index[module])] 
+                 for module, count in problematic_modules[:10]]
+        headers = ["Module", involvement_header, "Fan-Out", "Fan-In"]
+        print(tabulate(table, headers=headers, tablefmt="grid"))
+        write_problematic_modules(f, graph, problematic_modules, involvement_header)
+        
+        # Imports that break every cycle, found without enumerating any
+        breaks = suggest_cycle_breaks(graph, components, exact_limit)
+        write_cycle_breaks(f, breaks)
     
     # Generate recommendations
     print("\n=== Recommendations for Breaking Cycles ===")
     
+    # A feedback arc set: removing these imports leaves no cycle at all
+    to_remove = [edge for suggestion in breaks for edge in suggestion["imports"]]
+    all_exact = all(suggestion["exact"] for suggestion in breaks)
+    print(f"1. Removing these {len(to_remove)} imports breaks every cycle"
+          f" ({'a minimum set' if all_exact else f'minimum for components up to {exact_limit} modules'}):")
+    for importer, imported in to_remove[:10]:
+        print(f"   - {importer} → {imported}")
+    if len(to_remove) > 10:
+        print(f"   ... and {len(to_remove) - 10} more (see the report)")
+    
     # Find modules that appear in multiple cycles - these are good targets for refactoring
     if problematic_modules:
         most_problematic = problematic_modules[0][0]
-        cycle_count = problematic_modules[0][1]
-        print(f"1. Focus on refactoring '{most_problematic}' which is involved in {cycle_count} cycles.")
+        count = problematic_modules[0][1]
+        if enumerate_cycles:
+            print(f"2. Focus on refactoring '{most_problematic}' which is involved in {count} cycles.")
+        else:
+            print(f"2. Focus on refactoring '{most_problematic}' which takes part in {count} imports "
+                  f"within its cycle.")
         print(f"   Consider extracting its functionality into smaller, more focused modules.")
     
     # Look for shortest cycles - these might be easier to break
-    shortest_cycles = sorted(cycles, key=len)
-    if shortest_cycles:
-        shortest = shortest_cycles[0]
-        print(f"2. Start by breaking the simplest cycle: {' → '.join(shortest)} → {shortest[0]}")
-        print("   This might be easier to fix than longer, more complex cycles.")
+    shortest = min((c["witness"] for c in components), key=len)
+    print(f"3. Start by breaking the simplest cycle: {' → '.join(shortest)} → {shortest[0]}")
+    print("   This might be easier to fix than longer, more complex cycles.")
     
     # Suggest architectural patterns
-    print("3. Consider these strategies for breaking cyclic dependencies:")
+    print("4. Consider these strategies for breaking cyclic dependencies:")
     print("   - Create interfaces to implement dependency inversion")
     print("   - Extract shared functionality to separate modules")
     print("   - Use events or callbacks instead of direct imports")
     print("   - Apply the mediator pattern to coordinate between modules")
     
-    # Generate report file
-    report_file = os.path.join(os.path.dirname(dependency_file), "cyclic_dependencies_report.md")
-    with open(report_file, "w") as f:
-        f.write("# Cyclic Dependencies Report\n\n")
-        f.write(f"Analysis of {dependency_file}\n\n")
-        f.write(f"## Summary\n\n")
-        f.write(f"Found {len(cycles)} cyclic dependencies.\n\n")
-        
-        for length, cycles_list in sorted(cycles_by_length.items()):
-            f.write(f"- {len(cycles_list)} cycles of length {length}\n")
-        
-        f.write("\n## Detailed Cycles\n\n")
-        for i, cycle in enumerate(sorted(cycles, key=len), 1):
-            cycle_str = " → ".join(cycle)
-            f.write(f"### Cycle {i}\n\n")
-            f.write(f"{cycle_str} → {cycle[0]}\n\n")
-            
-            # For each module in the cycle, show what they import from the cycle
-            for j, module in enumerate(cycle):
-                next_module = cycle[(j + 1) % len(cycle)]
-                if module in dependencies and next_module in dependencies[module].get("imports", []):
-                    f.write(f"- {module} imports {next_module}\n")
-            f.write("\n")
-        
-        f.write("## Most Problematic Modules\n\n")
-        f.write("| Module | Cycles Involved | Fan-Out | Fan-In |\n")
-        f.write("|--------|----------------|---------|--------|\n")
-        for module, count in problematic_modules[:10]:
-            fan_out = len(dependencies.get(module, {}).get("imports", []))
-            fan_in = len(dependencies.get(module, {}).get("imported_by", []))
-            f.write(f"| {module} | {count} | {fan_out} | {fan_in} |\n")
-    
     print(f"\nReport generated: {report_file}")
-    return cycles
+    return components
 
 if __name__ == "__main__":
-    dependency_file = os.path.join(current_dir, "dependencies.json")
-    cycles = detect_cycles(dependency_file)
+    parser = argparse.ArgumentParser(description="Detect cyclic dependencies between modules.")
+    parser.add_argument("dependency_file", nargs="?", default=os.path.join(current_dir, "dependencies.json"),
+                        help="pydeps-style dependencies.json to analyze")
+    parser.add_argument("--enumerate", action="store_true", dest="enumerate_cycles",
+                        help="also list individual cycles (bounded by --max-length and --max-cycles)")
+    parser.add_argument("--max-length", type=int, default=DEFAULT_MAX_CYCLE_LENGTH,
+                        help="longest cycle to enumerate")
+    parser.add_argument("--max-cycles", type=int, default=DEFAULT_MAX_CYCLES,
+                        help="stop enumerating after this many cycles")
+    parser.add_argument("--exact-limit", type=int, default=EXACT_FEEDBACK_LIMIT,
+                        help="largest component for which a minimum set of imports to remove is computed")
+    args = parser.parse_args()
+    components = detect_cycles(args.dependency_file, args.enumerate_cycles, args.max_length, args.max_cycles,
+                               exact_limit=args.exact_limit)
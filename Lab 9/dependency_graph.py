@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+Compact dependency graph shared by the analysis scripts.
+
+Module names are interned to integer ids and both edge directions are stored
+in CSR form (an offsets array plus a flat array of neighbour ids), so every
+metric is a loop over contiguous machine integers instead of dict lookups.
+The "imported by" direction is derived from "imports" rather than read from
+the JSON, so the two can never disagree.
+
+Files are read with a streaming parser (iter_dependency_entries): one module
+entry is decoded at a time and only its "imports" are kept, so memory peaks at
+the size of the compact graph rather than at a multiple of the file size.
+"""
+
+import json
+import re
+import sys
+from array import array
+from bisect import insort
+from collections import namedtuple
+from functools import cached_property
+
+from graph_algorithms import longest_chains, quotient_weights, reachable_counts, strongly_connected_components
+
+
+class Adjacency:
+    """Read-only view of one CSR edge direction: ``adjacency[v]`` lists v's neighbours."""
+
+    def __init__(self, offsets, targets):
+        self.offsets = offsets
+        self.targets = memoryview(targets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, node):
+        return self.targets[self.offsets[node]:self.offsets[node + 1]]
+
+    def __iter__(self):
+        for node in range(len(self)):
+            yield self[node]
+
+
+# Modules aggregated by package: names and sizes (module counts) per package,
+# imports inside each package, and {(i, j): imports from package i to package j}
+PackageRollup = namedtuple("PackageRollup", ["names", "sizes", "internal", "weights"])
+
+OTHER_PACKAGES = "(other)"
+
+
+# Characters read from a dependencies.json per refill of the streaming parser
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r"\s*")
+
+
+def iter_dependency_entries(dependency_file, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield (module, entry) pairs from a dependencies.json, one module at a time.
+
+    The file is read in chunks and only the top-level object is scanned by
+    hand; each module entry is decoded on its own with JSONDecoder.raw_decode,
+    so at most one chunk plus one entry is held in memory at a time.
+    """
+    with open(dependency_file, "r") as f:
+        buffer = ""
+        pos = 0
+        at_eof = False
+
+        def refill():
+            nonlocal buffer, pos, at_eof
+            chunk = f.read(chunk_size)
+            at_eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+            return not at_eof
+
+        def next_char():
+            # Skip whitespace (reading more if needed) and peek at the next character
+            nonlocal pos
+            while True:
+                pos = _whitespace.match(buffer, pos).end()
+                if pos < len(buffer):
+                    return buffer[pos]
+                if not refill():
+                    return ""
+
+        def decode():
+            # A value cut off at the end of the buffer fails to decode: read more and retry
+            nonlocal pos
+            while True:
+                try:
+                    value, pos = _decoder.raw_decode(buffer, pos)
+                    return value
+                except json.JSONDecodeError:
+                    if not refill():
+                        raise
+
+        def expect(char):
+            nonlocal pos
+            found = next_char()
+            if found != char:
+                raise json.JSONDecodeError(f"Expecting '{char}'", buffer, pos)
+            pos += 1
+
+        expect("{")
+        if next_char() == "}":
+            return
+        while True:
+            next_char()
+            module = decode()
+            expect(":")
+            next_char()
+            yield module, decode()
+            separator = next_char()
+            pos += 1
+            if separator == "}":
+                return
+            if separator != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos - 1)
+
+
+def _transpose(node_count, offsets, targets):
+    """Build the reverse CSR arrays with a counting sort over the edge targets."""
+    reverse_offsets = array("i", [0]) * (node_count + 1)
+    for target in targets:
+        reverse_offsets[target + 1] += 1
+    for node in range(node_count):
+        reverse_offsets[node + 1] += reverse_offsets[node]
+
+    reverse_targets = array("i", [0]) * len(targets)
+    position = array("i", reverse_offsets[:-1])
+    for source in range(node_count):
+        for k in range(offsets[source], offsets[source + 1]):
+            target = targets[k]
+            reverse_targets[position[target]] = source
+            position[target] += 1
+    return reverse_offsets, reverse_targets
+
+
+class DependencyGraph:
+    """
+    Module dependency graph with interned names and CSR adjacency arrays.
+
+    Edges point from a module to the modules it imports. ``imports`` and
+    ``imported_by`` are Adjacency views that can be handed directly to the
+    routines in graph_algorithms.
+    """
+
+    def __init__(self, names, import_offsets, import_targets, importer_offsets=None, importer_sources=None):
+        self.names = names
+        self.import_offsets = import_offsets
+        self.import_targets = import_targets
+        if importer_offsets is None:
+            importer_offsets, importer_sources = _transpose(len(names), import_offsets, import_targets)
+        self.importer_offsets = importer_offsets
+        self.importer_sources = importer_sources
+        self.imports = Adjacency(self.import_offsets, self.import_targets)
+        self.imported_by = Adjacency(self.importer_offsets, self.importer_sources)
+        self._scc = None
+
+    @cached_property
+    def index(self):
+        """Module name -> id."""
+        return {name: i for i, name in enumerate(self.names)}
+
+    @classmethod
+    def from_dependencies(cls, dependencies):
+        """Build the graph from a pydeps-style dict (module -> {"imports": [...], ...})."""
+        # Intern the analyzed modules first so their ids are stable and dense
+        names = list(dependencies)
+        index = {name: i for i, name in enumerate(names)}
+        offsets = array("i", [0])
+        targets = array("i")
+        for module_data in dependencies.values():
+            row = set()
+            for imported in module_data.get("imports", []):
+                if imported not in index:
+                    index[imported] = len(names)
+                    names.append(imported)
+                row.add(index[imported])
+            targets.extend(sorted(row))
+            offsets.append(len(targets))
+        # Imported modules that are not analyzed themselves import nothing
+        offsets.extend([len(targets)] * (len(names) - len(offsets) + 1))
+        return cls(names, offsets, targets)
+
+    @classmethod
+    def load(cls, dependency_file, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Stream a dependencies.json file produced by pydeps into a graph.
+
+        Binary snapshots (see graph_snapshot.py) are recognized by their magic
+        bytes and memory-mapped instead.
+
+        Gives the same graph (including module ids) as from_dependencies on the
+        parsed file, but only keeps the interned names and the CSR arrays:
+        "imported_by", "path" and the other fields are dropped entry by entry.
+        """
+        from graph_snapshot import is_snapshot, load_snapshot
+        if is_snapshot(dependency_file):
+            return load_snapshot(dependency_file)
+
+        # Provisional ids in order of first appearance, as an analyzed module or as an import
+        names = []
+        index = {}
+        analyzed = []
+        offsets = array("i", [0])
+        targets = array("i")
+        for module, module_data in iter_dependency_entries(dependency_file, chunk_size):
+            if module not in index:
+                index[module] = len(names)
+                names.append(sys.intern(module))
+            analyzed.append(index[module])
+            row = set()
+            for imported in module_data.get("imports", ()):
+                if imported not in index:
+                    index[imported] = len(names)
+                    names.append(sys.intern(imported))
+                row.add(index[imported])
+            targets.extend(row)
+            offsets.append(len(targets))
+
+        # Renumber like from_dependencies: analyzed modules first, in file order,
+        # then the modules that are only imported, in order of first appearance
+        final_id = array("i", [-1]) * len(names)
+        next_id = 0
+        for module_id in analyzed:
+            if final_id[module_id] >= 0:
+                raise ValueError(f"Duplicate module in {dependency_file}: {names[module_id]}")
+            final_id[module_id] = next_id
+            next_id += 1
+        for module_id in range(len(names)):
+            if final_id[module_id] < 0:
+                final_id[module_id] = next_id
+                next_id += 1
+        final_names = [None] * len(names)
+        for module_id, name in enumerate(names):
+            final_names[final_id[module_id]] = name
+
+        final_offsets = array("i", [0])
+        final_targets = array("i")
+        for row in range(len(analyzed)):
+            final_targets.extend(sorted(final_id[t] for t in targets[offsets[row]:offsets[row + 1]]))
+            final_offsets.append(len(final_targets))
+        # Imported modules that are not analyzed themselves import nothing
+        final_offsets.extend([len(final_targets)] * (len(final_names) - len(analyzed)))
+        return cls(final_names, final_offsets, final_targets)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def number_of_edges(self):
+        return len(self.import_targets)
+
+    def fan_out(self, node):
+        """Number of modules imported by `node`."""
+        return self.import_offsets[node + 1] - self.import_offsets[node]
+
+    def fan_in(self, node):
+        """Number of modules importing `node`."""
+        return self.importer_offsets[node + 1] - self.importer_offsets[node]
+
+    def fan_out_counts(self):
+        offsets = self.import_offsets
+        return array("i", (offsets[i + 1] - offsets[i] for i in range(len(self))))
+
+    def fan_in_counts(self):
+        offsets = self.importer_offsets
+        return array("i", (offsets[i + 1] - offsets[i] for i in range(len(self))))
+
+    def coupling_table(self):
+        """
+        Per-module coupling metrics keyed by module name (in module id order).
+
+        Each record holds module, fan_in, fan_out and coupling (fan-in * fan-out).
+        Later stages add their own columns to the same records, so any metric
+        for a module is one dict lookup away.
+        """
+        table = {}
+        import_offsets = self.import_offsets
+        importer_offsets = self.importer_offsets
+        for module_id, module in enumerate(self.names):
+            fan_in = importer_offsets[module_id + 1] - importer_offsets[module_id]
+            fan_out = import_offsets[module_id + 1] - import_offsets[module_id]
+            table[module] = {
+                "module": module,
+                "fan_in": fan_in,
+                "fan_out": fan_out,
+                "coupling": fan_in * fan_out
+            }
+        return table
+
+    def edges(self):
+        """Yield every import as a (module id, imported id) pair."""
+        for source in range(len(self)):
+            for target in self.imports[source]:
+                yield source, target
+
+    def strongly_connected_components(self):
+        """(component_of, components) for the import graph, computed once and cached."""
+        if self._scc is None:
+            self._scc = strongly_connected_components(self.imports)
+        return self._scc
+
+    def cyclic_nodes(self):
+        """Ids of all modules that take part in at least one import cycle."""
+        nodes = set()
+        for members in self.strongly_connected_components()[1]:
+            # A lone module is only cyclic if it imports itself
+            if len(members) > 1 or members[0] in self.imports[members[0]]:
+                nodes.update(members)
+        return nodes
+
+    def transitive_importer_counts(self):
+        """Number of modules that import each module directly or indirectly."""
+        return reachable_counts(self.imported_by)
+
+    def longest_chains(self):
+        """Per-module depth/height and one longest chain (see graph_algorithms)."""
+        return longest_chains(self.imports, self.strongly_connected_components())
+
+    def package_rollup(self, depth=1, prefix=None, max_packages=None):
+        """
+        Aggregate modules into packages, e.g. for an overview drawing of a large graph.
+
+        Each module goes to the package named by the first `depth` parts of its
+        name. With a `prefix` (e.g. "uvicorn.protocols") only the modules under
+        it are split, `depth` levels below the prefix, and every other module is
+        grouped at the prefix's own level as context. If that yields more than
+        `max_packages` packages, the largest are kept (those under the prefix
+        first) and the rest merged into one "(other)" package. Costs one pass
+        over the modules and the imports.
+        """
+        if depth < 1:
+            raise ValueError(f"depth must be at least 1, got {depth}")
+        if max_packages is not None and max_packages < 1:
+            raise ValueError(f"max_packages must be at least 1, got {max_packages}")
+        if prefix:
+            outer = prefix.count(".") + 1
+            inner = outer + depth
+            subtree = prefix + "."
+        else:
+            outer = inner = depth
+            subtree = None
+
+        package_index = {}
+        packages = []
+        context = []
+        group_of = array("i")
+        for name in self.names:
+            inside = subtree is None or name == prefix or name.startswith(subtree)
+            level = inner if inside else outer
+            package = ".".join(name.split(".", level)[:level])
+            group = package_index.get(package)
+            if group is None:
+                group = package_index[package] = len(packages)
+                packages.append(package)
+                context.append(not inside)
+            group_of.append(group)
+
+        sizes = [0] * len(packages)
+        for group in group_of:
+            sizes[group] += 1
+        if max_packages is not None and len(packages) > max_packages:
+            kept = sorted(range(len(packages)), key=lambda g: (context[g], -sizes[g], packages[g]))[:max_packages - 1]
+            remap = [len(kept)] * len(packages)
+            for new, old in enumerate(kept):
+                remap[old] = new
+            group_of = array("i", (remap[group] for group in group_of))
+            packages = [packages[g] for g in kept] + [OTHER_PACKAGES]
+            sizes = [sizes[g] for g in kept] + [sum(sizes) - sum(sizes[g] for g in kept)]
+
+        internal = [0] * len(packages)
+        weights = {}
+        for (a, b), weight in quotient_weights(self.imports, group_of, len(packages)).items():
+            if a == b:
+                internal[a] = weight
+            else:
+                weights[a, b] = weight
+        return PackageRollup(packages, sizes, internal, weights)
+
+    def as_numpy(self):
+        """Zero-copy NumPy views of the CSR arrays (requires numpy)."""
+        import numpy as np
+        return {
+            "import_offsets": np.frombuffer(self.import_offsets, dtype=np.int32),
+            "import_targets": np.frombuffer(self.import_targets, dtype=np.int32),
+            "importer_offsets": np.frombuffer(self.importer_offsets, dtype=np.int32),
+            "importer_sources": np.frombuffer(self.importer_sources, dtype=np.int32),
+        }
+
+    def to_networkx(self, modules=None):
+        """Build a networkx.DiGraph of the given module names (default: all) for drawing."""
+        import networkx as nx
+        ids = range(len(self)) if modules is None else [self.index[m] for m in modules]
+        keep = set(ids)
+        G = nx.DiGraph()
+        G.add_nodes_from(self.names[i] for i in ids)
+        G.add_edges_from((self.names[i], self.names[t])
+                         for i in ids for t in self.imports[i] if t in keep)
+        return G
+
+
+class MutableDependencyGraph:
+    """
+    Dependency graph on plain adjacency lists, so imports can be edited in place.
+
+    Offers the read interface of DependencyGraph that the incremental analysis
+    uses (names, index, imports, imported_by, fan-in/out, edge count) for
+    long-running callers such as watch_dependencies: an edit costs
+    O(changed imports) instead of a CSR rebuild. Modules can be added but not
+    removed; rebuild the graph for that.
+    """
+
+    def __init__(self, graph):
+        self.names = list(graph.names)
+        self.index = dict(graph.index)
+        self.imports = [list(row) for row in graph.imports]
+        self.imported_by = [list(row) for row in graph.imported_by]
+        self._edge_count = graph.number_of_edges()
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def number_of_edges(self):
+        return self._edge_count
+
+    def fan_out(self, node):
+        return len(self.imports[node])
+
+    def fan_in(self, node):
+        return len(self.imported_by[node])
+
+    # Only rely on names, index and imports
+    edges = DependencyGraph.edges
+    to_networkx = DependencyGraph.to_networkx
+
+    def add_module(self, name):
+        """Add a module that imports nothing yet; returns its id."""
+        node = len(self.names)
+        self.names.append(name)
+        self.index[name] = node
+        self.imports.append([])
+        self.imported_by.append([])
+        return node
+
+    def set_imports(self, node, targets):
+        """Make `node` import exactly the ids in `targets`; returns (added, removed) target ids."""
+        old, new = set(self.imports[node]), set(targets)
+        added, removed = new - old, old - new
+        for target in removed:
+            self.imported_by[target].remove(node)
+        for target in added:
+            insort(self.imported_by[target], node)
+        self.imports[node] = sorted(new)
+        self._edge_count += len(added) - len(removed)
+        return added, removed
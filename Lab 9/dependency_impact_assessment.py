@@ -7,69 +7,43 @@ Analyzes the dependency structure to determine:
 2. Modules that are at high risk of breaking the system if modified
 """
 
-import json
+import time
+
+# Taken first so the startup measurement covers every import below
+start_time = time.perf_counter()
+
+import argparse
 import os
-import sys
-from collections import defaultdict
-from tabulate import tabulate
-import matplotlib.pyplot as plt
-import numpy as np
+
+from dependency_graph import DependencyGraph
+from graph_algorithms import betweenness_centrality
+from lazy_imports import pyplot, report_startup, require, tabulate
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
 
 def load_dependencies(dependency_file):
-    """Load the dependency data from JSON file"""
-    with open(dependency_file, 'r') as f:
-        return json.load(f)
+    """Load the dependency data from JSON file into the shared compact graph"""
+    return DependencyGraph.load(dependency_file)
 
-def calculate_impact_scores(dependencies):
+def calculate_impact_scores(graph):
     """
     Calculate the impact score for each module.
     
     Impact Score: Measure of how many other modules would be affected if this module changes.
     It considers both direct and indirect dependencies.
+    
+    Transitive importers are found with a single pass over the strongly connected
+    components of the "imported by" graph (see graph_algorithms.reachable_counts),
+    instead of a separate search from every module.
     """
-    # Initialize direct impact scores (based on fan-in)
-    direct_impact = {}
-    for module, data in dependencies.items():
-        # Fan-in: number of modules that directly import this module
-        fan_in = len(data.get('imported_by', []))
-        direct_impact[module] = fan_in
-    
-    # Calculate transitive impact (modules that indirectly depend on this module)
-    transitive_impact = defaultdict(set)
-    
-    # For each module that has importers
-    for module in dependencies:
-        # Get direct importers
-        direct_importers = set(dependencies[module].get('imported_by', []))
-        
-        # Initialize the set of all affected modules with direct importers
-        all_affected = direct_importers.copy()
-        
-        # Keep track of modules to process
-        to_process = direct_importers.copy()
-        processed = set()
-        
-        # Find all modules that indirectly import this module
-        while to_process:
-            importer = to_process.pop()
-            processed.add(importer)
-            
-            # Find modules that import this importer
-            if importer in dependencies:
-                next_level = set(dependencies[importer].get('imported_by', []))
-                # Add new dependencies to processing queue
-                new_deps = next_level - processed - to_process
-                to_process.update(new_deps)
-                all_affected.update(new_deps)
-        
-        # Store all affected modules (both direct and indirect)
-        transitive_impact[module] = all_affected
+    # Number of modules that directly or indirectly import each module
+    transitive_counts = graph.transitive_importer_counts()
     
     # Calculate final impact scores
     impact_scores = []
-    for module in dependencies:
-        direct_count = len(dependencies[module].get('imported_by', []))
-        transitive_count = len(transitive_impact[module])
+    for module_id, module in enumerate(graph.names):
+        direct_count = graph.fan_in(module_id)
+        transitive_count = transitive_counts[module_id]
         
         # Don't count direct importers twice in transitive count
         indirect_count = transitive_count - direct_count
@@ -89,7 +63,7 @@ def calculate_impact_scores(dependencies):
     impact_scores.sort(key=lambda x: x['total_impact'], reverse=True)
     return impact_scores
 
-def calculate_risk_scores(dependencies):
+def calculate_risk_scores(graph, centrality_method="connections", pivots=None, coupling_table=None):
     """
     Calculate risk scores for each module.
     
@@ -98,32 +72,24 @@ def calculate_risk_scores(dependencies):
     - Coupling (both fan-in and fan-out)
     - Whether the module is part of a cyclic dependency
     - Whether the module is a core module (determined by usage/centrality)
+    
+    `centrality_method` and `pivots` are passed on to calculate_centrality. A
+    `coupling_table` already computed for the graph is reused instead of rebuilt.
     """
-    # Calculate module coupling (fan-in * fan-out)
-    coupling_scores = []
-    for module, data in dependencies.items():
-        fan_in = len(data.get('imported_by', []))
-        fan_out = len(data.get('imports', []))
-        coupling = fan_in * fan_out
-        coupling_scores.append({
-            'module': module,
-            'fan_in': fan_in,
-            'fan_out': fan_out,
-            'coupling': coupling
-        })
+    # Calculate module coupling (fan-in * fan-out), keyed by module
+    if coupling_table is None:
+        coupling_table = graph.coupling_table()
     
     # Detect cyclic dependencies
-    has_cycles = detect_cycles(dependencies)
+    has_cycles = detect_cycles(graph)
     
     # Calculate centrality (how central a module is in the dependency graph)
-    centrality_scores = calculate_centrality(dependencies)
+    centrality_scores = calculate_centrality(graph, centrality_method, pivots)
     
     # Combine all factors for a final risk score
     risk_scores = []
-    for module in dependencies:
-        # Find coupling score for this module
-        coupling = next((score['coupling'] for score in coupling_scores 
-                         if score['module'] == module), 0)
+    for module, metrics in coupling_table.items():
+        coupling = metrics['coupling']
         
         # Check if module is in a cycle
         in_cycle = module in has_cycles
@@ -136,13 +102,10 @@ def calculate_risk_scores(dependencies):
         # Formula: (coupling * cycle_factor * centrality_weight)
         risk_score = coupling * cycle_factor * (centrality + 1)
         
-        fan_in = len(dependencies[module].get('imported_by', []))
-        fan_out = len(dependencies[module].get('imports', []))
-        
         risk_scores.append({
             'module': module,
-            'fan_in': fan_in,
-            'fan_out': fan_out,
+            'fan_in': metrics['fan_in'],
+            'fan_out': metrics['fan_out'],
             'coupling': coupling,
             'in_cycle': in_cycle,
             'centrality': centrality,
@@ -153,47 +116,44 @@ def calculate_risk_scores(dependencies):
     risk_scores.sort(key=lambda x: x['risk_score'], reverse=True)
     return risk_scores
 
-def detect_cycles(dependencies):
+def detect_cycles(graph):
     """Detect which modules are part of cyclic dependencies"""
-    # This is a simplified cycle detection
-    # For a more comprehensive detection, use the networkx library
-    modules_in_cycles = set()
-    
-    # For each module
-    for module, data in dependencies.items():
-        # Check if any of its imports also import it (direct cycle)
-        imports = data.get('imports', [])
-        for imported in imports:
-            if imported in dependencies and module in dependencies[imported].get('imported_by', []):
-                modules_in_cycles.add(module)
-                modules_in_cycles.add(imported)
-    
-    return modules_in_cycles
+    # Every module in a non-trivial strongly connected component (or importing
+    # itself) lies on at least one cycle
+    return {graph.names[module_id] for module_id in graph.cyclic_nodes()}
 
-def calculate_centrality(dependencies):
+def calculate_centrality(graph, method="connections", pivots=None, seed=42):
     """
-    Calculate a simple centrality score for each module.
+    Calculate a centrality score for each module.
     Higher score means the module is more central to the system.
+    
+    method="connections" (default) counts direct connections plus the import
+    triangles a module sits in: importer -> module -> imported where the importer
+    also imports the imported module directly. Each triangle is counted with one
+    set intersection per import edge, so hub modules stay cheap.
+    
+    method="betweenness" uses Brandes' betweenness centrality instead. For large
+    graphs pass `pivots` to estimate it from that many sampled source modules.
     """
-    centrality = {}
+    if method == "betweenness":
+        scores = betweenness_centrality(graph.imports, pivots, seed)
+    elif method == "connections":
+        import_sets = [set(imports) for imports in graph.imports]
+        scores = []
+        for module_id, imports in enumerate(import_sets):
+            importers = graph.imported_by[module_id]
+            direct_connections = len(importers) + len(imports)
+            
+            # Modules that this module helps connect (those it imports that its importers also import)
+            connections = 0
+            for importer in importers:
+                connections += len(imports & import_sets[importer])
+            
+            scores.append(connections + direct_connections)
+    else:
+        raise ValueError(f"Unknown centrality method: {method}")
     
-    for module in dependencies:
-        # Count how many paths go through this module
-        # (simplified: count how many modules both import and are imported by this module)
-        importers = set(dependencies[module].get('imported_by', []))
-        imports = set(dependencies[module].get('imports', []))
-        
-        direct_connections = len(importers) + len(imports)
-        
-        # Modules that this module helps connect (those it imports that also import its importers)
-        connections = 0
-        for imported in imports:
-            if imported in dependencies:
-                for importer in importers:
-                    if importer in dependencies[imported].get('imported_by', []):
-                        connections += 1
-        
-        centrality[module] = connections + direct_connections
+    centrality = dict(zip(graph.names, scores))
     
     # Normalize to range 0-10
     if centrality:
@@ -204,8 +164,13 @@ def calculate_centrality(dependencies):
     
     return centrality
 
-def generate_report(impact_scores, risk_scores, dependencies, output_dir):
-    """Generate a comprehensive impact and risk assessment report"""
+def generate_report(impact_scores, risk_scores, graph, output_dir, plots=True):
+    """
+    Generate a comprehensive impact and risk assessment report.
+
+    Returns (report_path, impact_chart_path, risk_chart_path); the chart paths
+    are None when `plots` is off.
+    """
     # Table formats for better readability
     table_format = "grid"
     
@@ -216,7 +181,7 @@ def generate_report(impact_scores, risk_scores, dependencies, output_dir):
         
         # Include summary statistics
         f.write("## Summary\n\n")
-        f.write(f"- Total modules analyzed: {len(dependencies)}\n")
+        f.write(f"- Total modules analyzed: {len(graph)}\n")
         f.write(f"- High impact modules (impact score > 20): {len([m for m in impact_scores if m['total_impact'] > 20])}\n")
         f.write(f"- High risk modules (risk score > 100): {len([m for m in risk_scores if m['risk_score'] > 100])}\n\n")
         
@@ -286,7 +251,7 @@ def generate_report(impact_scores, risk_scores, dependencies, output_dir):
         
         if top_impact:
             f.write(f"## Deep Dive: Highest Impact Module - {top_impact}\n\n")
-            direct_importers = dependencies[top_impact].get('imported_by', [])
+            direct_importers = [graph.names[i] for i in graph.imported_by[graph.index[top_impact]]]
             f.write(f"The module `{top_impact}` is directly imported by {len(direct_importers)} other modules:\n\n")
             for importer in direct_importers:
                 f.write(f"- {importer}\n")
@@ -295,7 +260,7 @@ def generate_report(impact_scores, risk_scores, dependencies, output_dir):
         if top_risk and top_risk != top_impact:
             f.write(f"## Deep Dive: Highest Risk Module - {top_risk}\n\n")
             f.write("This module is high risk because:\n\n")
-            top_score = next(score for score in risk_scores if score['module'] == top_risk)
+            top_score = risk_scores[0]
             if top_score['in_cycle']:
                 f.write("- It is part of one or more dependency cycles\n")
             f.write(f"- It has high coupling (fan-in × fan-out = {top_score['coupling']})\n")
@@ -304,7 +269,15 @@ def generate_report(impact_scores, risk_scores, dependencies, output_dir):
             f.write("\nModifying this module requires extreme caution and thorough testing.\n")
     
     # 2. Create visualizations
-    
+    if not plots:
+        return report_path, None, None
+    return (report_path,) + generate_charts(impact_scores, risk_scores, output_dir)
+
+def generate_charts(impact_scores, risk_scores, output_dir):
+    """Draw the impact and risk bar charts; the plotting stack is imported here."""
+    plt = pyplot()
+    np = require("numpy")
+
     # Impact visualization
     plt.figure(figsize=(12, 8))
     modules = [score['module'].split('.')[-1] for score in impact_scores[:15]]  # Use last part of module name
@@ -344,26 +317,31 @@ def generate_report(impact_scores, risk_scores, dependencies, output_dir):
     risk_chart_path = os.path.join(output_dir, "risk_assessment_chart.png")
     plt.savefig(risk_chart_path)
     
-    return report_path, impact_chart_path, risk_chart_path
+    return impact_chart_path, risk_chart_path
 
-def main():
-    """Main function to run the assessment"""
-    # Get the project directory
-    project_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "uvicorn", "uvicorn")
-    dependency_file = os.path.join(project_dir, "dependencies.json")
+def main(dependency_file=None, centrality_method="connections", pivots=None, plots=True, output_dir=None):
+    """
+    Main function to run the assessment.
+
+    `dependency_file` defaults to the dependencies.json next to this script, like
+    the other analysis scripts; the report and charts go to `output_dir`
+    (default: the directory of the dependency file).
+    """
+    if dependency_file is None:
+        dependency_file = os.path.join(current_dir, "dependencies.json")
     
     if not os.path.exists(dependency_file):
         print(f"Error: Dependency file not found at {dependency_file}")
         return
 
     print("Loading dependencies...")
-    dependencies = load_dependencies(dependency_file)
+    graph = load_dependencies(dependency_file)
     
     print("Calculating impact scores...")
-    impact_scores = calculate_impact_scores(dependencies)
+    impact_scores = calculate_impact_scores(graph)
     
     print("Calculating risk scores...")
-    risk_scores = calculate_risk_scores(dependencies)
+    risk_scores = calculate_risk_scores(graph, centrality_method, pivots)
     
     # Print results to console
     print("\n=== DEPENDENCY IMPACT ASSESSMENT ===\n")
@@ -395,13 +373,15 @@ def main():
     print()
     
     # Generate comprehensive report
-    output_dir = os.path.dirname(os.path.abspath(__file__))
+    if output_dir is None:
+        output_dir = os.path.dirname(os.path.abspath(dependency_file))
     report_path, impact_chart, risk_chart = generate_report(
-        impact_scores, risk_scores, dependencies, output_dir)
+        impact_scores, risk_scores, graph, output_dir, plots)
     
     print(f"Report generated: {report_path}")
-    print(f"Impact chart: {impact_chart}")
-    print(f"Risk chart: {risk_chart}")
+    if plots:
+        print(f"Impact chart: {impact_chart}")
+        print(f"Risk chart: {risk_chart}")
     
     # Provide specific advice for high-impact and high-risk modules
     if impact_scores:
@@ -418,4 +398,17 @@ def main():
         print("  - This module has the highest chance of breaking the system if modified.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Assess the impact and risk of changing each module.")
+    parser.add_argument("dependency_file", nargs="?", default=os.path.join(current_dir, "dependencies.json"),
+                        help="pydeps-style dependencies.json to analyze")
+    parser.add_argument("--output-dir", default=None,
+                        help="where to write the report and charts (default: next to the dependency file)")
+    parser.add_argument("--centrality", choices=["connections", "betweenness"], default="connections",
+                        help="centrality measure feeding the risk score")
+    parser.add_argument("--pivots", type=int, default=None,
+                        help="estimate betweenness from this many sampled source modules")
+    parser.add_argument("--no-plots", action="store_true",
+                        help="write the report only and never import the plotting stack")
+    args = parser.parse_args()
+    report_startup(start_time)
+    main(args.dependency_file, args.centrality, args.pivots, not args.no_plots, args.output_dir)
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Drawing routines shared by analyze_dependencies.py, fan_analysis.py and the pipeline.
+
+matplotlib and networkx are only imported when a chart is drawn (see
+lazy_imports), so importing this module costs nothing in metrics-only runs.
+"""
+
+import heapq
+import math
+
+from graph_layout import cached_layout
+from lazy_imports import pyplot, require
+
+# Packages drawn by draw_package_graph; smaller ones are merged into "(other)"
+DEFAULT_MAX_PACKAGES = 60
+# Package-to-package edges drawn; each arrow is a matplotlib patch and costs milliseconds
+DEFAULT_MAX_EDGES = 200
+# Above this many modules the fan table is exported instead of drawn and the
+# scatter plot becomes a density plot (see draw_fan_density)
+SCALABLE_FAN_OUTPUT = 500
+# Outliers labeled in the density plot
+DEFAULT_TOP_OUTLIERS = 15
+
+
+def draw_core_dependencies(graph, coupling_metrics, coupling_table, path, top_n=15):
+    """Draw the imports between the `top_n` most coupled modules."""
+    plt = pyplot()
+    nx = require("networkx")
+
+    # Create a visualization of the top coupled modules
+    plt.figure(figsize=(12, 10))
+
+    # Only visualize the most important dependencies
+    top_modules = [m["module"] for m in coupling_metrics[:top_n]]
+    subgraph = graph.to_networkx(top_modules)
+
+    # Use a layout that works well for directed graphs, reusing the last run's positions
+    pos, _ = cached_layout("core_dependencies", subgraph, path, k=0.8)
+
+    # Draw nodes with size proportional to coupling
+    node_sizes = [coupling_table[node]["coupling"] * 10 + 100 for node in subgraph.nodes()]
+
+    # Draw the graph
+    nx.draw_networkx_nodes(subgraph, pos, node_color='skyblue',
+                          node_size=node_sizes, alpha=0.8)
+    nx.draw_networkx_edges(subgraph, pos, edge_color='gray',
+                          width=1, alpha=0.5, arrows=True, arrowsize=15)
+    nx.draw_networkx_labels(subgraph, pos, font_size=10)
+
+    plt.title(f"Dependencies Between Top {top_n} Most Coupled Modules")
+    plt.axis('off')
+    plt.tight_layout()
+
+    # Save the visualization
+    plt.savefig(path, bbox_inches="tight", dpi=300)
+    plt.close()
+    return path
+
+
+def draw_package_graph(graph, path, depth=1, prefix=None, max_packages=DEFAULT_MAX_PACKAGES,
+                       max_edges=DEFAULT_MAX_EDGES):
+    """
+    Draw the imports between packages (see DependencyGraph.package_rollup).
+
+    Only the aggregated packages reach networkx, so the layout and drawing cost
+    depends on `max_packages`, not on the number of modules. Node area follows
+    the package's module count and edge width the number of imports it stands for.
+    Every edge shapes the layout but only the `max_edges` heaviest are drawn,
+    those touching a package under `prefix` first.
+    """
+    plt = pyplot()
+    nx = require("networkx")
+
+    rollup = graph.package_rollup(depth, prefix, max_packages)
+    names = rollup.names
+    G = nx.DiGraph()
+    G.add_nodes_from(names)
+    for (a, b), weight in rollup.weights.items():
+        # Log-scaled so a few heavy edges do not pull everything into one clump
+        G.add_edge(names[a], names[b], weight=weight, strength=1 + math.log(weight))
+
+    plt.figure(figsize=(14, 12))
+    pos, _ = cached_layout(f"package_dependencies:{prefix or ''}:{depth}", G, path,
+                           weight="strength", k=1.5 / math.sqrt(max(len(G), 1)))
+
+    largest = max(rollup.sizes, default=1)
+    node_sizes = [300 + 3000 * math.sqrt(size / largest) for size in rollup.sizes]
+    def inside(name):
+        return prefix is not None and (name == prefix or name.startswith(prefix + "."))
+
+    drawn = sorted(G.edges(), key=lambda e: (inside(e[0]) or inside(e[1]), G.edges[e]["weight"]),
+                   reverse=True)[:max_edges]
+    heaviest = max(rollup.weights.values(), default=1)
+    edge_widths = [0.5 + 4 * math.log1p(G.edges[e]["weight"]) / math.log1p(heaviest) for e in drawn]
+
+    nx.draw_networkx_nodes(G, pos, node_color='skyblue', node_size=node_sizes, alpha=0.8)
+    nx.draw_networkx_edges(G, pos, edgelist=drawn, edge_color='gray', width=edge_widths, alpha=0.5,
+                           arrows=True, arrowsize=12, node_size=node_sizes)
+    labels = {name: f"{name}\n{size} modules" if size > 1 else name for name, size in zip(names, rollup.sizes)}
+    nx.draw_networkx_labels(G, pos, labels, font_size=8)
+
+    scope = f"under {prefix}, " if prefix else ""
+    title = f"Package Dependencies ({scope}depth {depth}: {len(rollup.names)} packages, {len(graph)} modules)"
+    if len(drawn) < len(G.edges()):
+        title += f"\nheaviest {len(drawn)} of {len(G.edges())} package imports shown"
+    plt.title(title)
+    plt.axis('off')
+    plt.tight_layout()
+
+    plt.savefig(path, bbox_inches="tight", dpi=150)
+    plt.close()
+    return path
+
+
+def draw_fan_table(table_str, row_count, path):
+    """Render the tabulated fan-in/fan-out text as an image."""
+    plt = pyplot()
+
+    # Configure plot
+    plt.figure(figsize=(10, row_count * 0.4))  # Adjust height based on number of rows
+    plt.text(0, 1, table_str, fontsize=10, family="monospace", verticalalignment="top")
+
+    plt.axis("off")  # Hide axes
+    plt.tight_layout()
+
+    # Save as image
+    plt.savefig(path, bbox_inches="tight", dpi=300)
+    plt.close()
+    return path
+
+
+def draw_fan_scatter(modules, fan_ins, fan_outs, path):
+    """Scatter plot of fan-in against fan-out with every module labeled."""
+    plt = pyplot()
+
+    # Create a fan-in vs fan-out scatter plot
+    plt.figure(figsize=(10, 8))
+    plt.scatter(fan_ins, fan_outs, alpha=0.6)
+
+    # Add labels to points
+    for i, module in enumerate(modules):
+        plt.annotate(module, (fan_ins[i], fan_outs[i]), fontsize=8)
+
+    plt.title("Fan-In vs Fan-Out Analysis")
+    plt.xlabel("Fan-In (Number of modules importing this module)")
+    plt.ylabel("Fan-Out (Number of modules imported by this module)")
+    plt.grid(True, linestyle='--', alpha=0.7)
+
+    # Save scatter plot
+    plt.savefig(path, bbox_inches="tight", dpi=300)
+    plt.close()
+    return path
+
+
+def fan_outliers(fan_ins, fan_outs, top_k=DEFAULT_TOP_OUTLIERS):
+    """
+    Indices of the `top_k` modules farthest from the origin in log(1 + fan) space.
+
+    Each axis is scaled to its largest value first, so a module importing
+    unusually many others counts as much as one imported by unusually many.
+    """
+    logs_in = [math.log1p(v) for v in fan_ins]
+    logs_out = [math.log1p(v) for v in fan_outs]
+    scale_in = max(logs_in, default=0) or 1
+    scale_out = max(logs_out, default=0) or 1
+    return heapq.nlargest(top_k, range(len(logs_in)),
+                          key=lambda i: (logs_in[i] / scale_in) ** 2 + (logs_out[i] / scale_out) ** 2)
+
+
+def draw_fan_density(modules, fan_ins, fan_outs, path, top_k=DEFAULT_TOP_OUTLIERS):
+    """
+    Hexbin density of fan-in against fan-out, labeling only the `top_k` outliers.
+
+    Unlike draw_fan_scatter, which adds a text artist per module, this draws a
+    fixed number of hexagons and labels, so its cost barely grows with the graph.
+    """
+    plt = pyplot()
+    np = require("numpy")
+
+    # Shifted by one so modules with no fan-in or fan-out fit on log axes
+    x = np.asarray(fan_ins, dtype=float) + 1
+    y = np.asarray(fan_outs, dtype=float) + 1
+
+    plt.figure(figsize=(10, 8))
+    plt.hexbin(x, y, gridsize=50, bins="log", mincnt=1, xscale="log", yscale="log", cmap="Blues")
+    plt.colorbar(label="Modules (log scale)")
+
+    outliers = fan_outliers(fan_ins, fan_outs, top_k)
+    plt.scatter(x[outliers], y[outliers], color="crimson", s=12)
+    for i in outliers:
+        plt.annotate(modules[i], (x[i], y[i]), fontsize=8, xytext=(3, 3), textcoords="offset points")
+
+    plt.title(f"Fan-In vs Fan-Out Density ({len(modules)} modules, top {len(outliers)} outliers labeled)")
+    plt.xlabel("Fan-In + 1 (Number of modules importing this module)")
+    plt.ylabel("Fan-Out + 1 (Number of modules imported by this module)")
+    plt.grid(True, linestyle='--', alpha=0.7)
+
+    plt.savefig(path, bbox_inches="tight", dpi=150)
+    plt.close()
+    return path
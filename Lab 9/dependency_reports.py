@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Writers for the coupling CSV, the fan-in/fan-out tables and the dependency metrics summary.
+
+Shared by analyze_dependencies.py, pipeline.py and the incremental cache so
+a cached run produces exactly the same files as a full run.
+"""
+
+import csv
+import json
+
+# Thresholds used for module categorization
+FAN_IN_THRESHOLD = 5  # High fan-in
+FAN_OUT_THRESHOLD = 5  # High fan-out
+
+
+def categorize_modules(coupling_metrics, fan_in_threshold=FAN_IN_THRESHOLD,
+                       fan_out_threshold=FAN_OUT_THRESHOLD):
+    """
+    Split modules into stable/unstable abstractions and concretions.
+
+    Returns (stable_abstractions, unstable_abstractions, stable_concretions,
+    unstable_concretions) as lists of module names, in the input order.
+    """
+    stable_abstractions = []
+    unstable_abstractions = []
+    stable_concretions = []
+    unstable_concretions = []
+
+    for m in coupling_metrics:
+        if m["fan_in"] >= fan_in_threshold and m["fan_out"] < fan_out_threshold:
+            stable_abstractions.append(m["module"])
+        elif m["fan_in"] >= fan_in_threshold and m["fan_out"] >= fan_out_threshold:
+            unstable_abstractions.append(m["module"])
+        elif m["fan_in"] < fan_in_threshold and m["fan_out"] < fan_out_threshold:
+            stable_concretions.append(m["module"])
+        else:  # Low fan-in, high fan-out
+            unstable_concretions.append(m["module"])
+
+    return stable_abstractions, unstable_abstractions, stable_concretions, unstable_concretions
+
+
+def write_coupling_csv(path, coupling_metrics):
+    """Write coupling_metrics.csv (records ranked by coupling score)."""
+    with open(path, "w") as f:
+        f.write("Module,Fan-In,Fan-Out,Coupling Score,Depth,Height\n")
+        for m in coupling_metrics:
+            f.write(f"{m['module']},{m['fan_in']},{m['fan_out']},{m['coupling']},{m['depth']},{m['height']}\n")
+
+
+FAN_COLUMNS = ["Module", "Fan-Out", "Fan-In"]
+
+
+def write_fan_csv(path, modules, fan_ins, fan_outs):
+    """Write the fan-in/fan-out table sorted by module name."""
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(FAN_COLUMNS)
+        for i in sorted(range(len(modules)), key=modules.__getitem__):
+            writer.writerow([modules[i], fan_outs[i], fan_ins[i]])
+    return path
+
+
+# Standalone page: the data is embedded as JSON and only the rows in view exist in the DOM
+_FAN_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Fan-In / Fan-Out</title>
+<style>
+body { font-family: sans-serif; margin: 1em; }
+#view { height: 80vh; overflow-y: auto; border: 1px solid #ccc; position: relative; }
+#spacer { position: relative; }
+.row { position: absolute; left: 0; right: 0; height: ROW_HEIGHTpx; line-height: ROW_HEIGHTpx;
+       display: grid; grid-template-columns: 1fr 8em 8em; font-family: monospace; }
+.row:nth-child(odd) { background: #f5f5f5; }
+.head { display: grid; grid-template-columns: 1fr 8em 8em; font-weight: bold; cursor: pointer; }
+.num { text-align: right; padding-right: 1em; }
+</style>
+</head>
+<body>
+<p><input id="filter" placeholder="Filter modules" size="40"> <span id="count"></span></p>
+<div class="head"><span data-key="0">Module</span><span class="num" data-key="1">Fan-Out</span><span class="num" data-key="2">Fan-In</span></div>
+<div id="view"><div id="spacer"></div></div>
+<script>
+const data = DATA;
+const rowHeight = ROW_HEIGHT;
+const view = document.getElementById("view"), spacer = document.getElementById("spacer");
+let rows = data.module.map((_, i) => i), sortKey = 0, descending = false;
+const columns = [data.module, data.fan_out, data.fan_in];
+
+function render() {
+  spacer.style.height = rows.length * rowHeight + "px";
+  const first = Math.floor(view.scrollTop / rowHeight);
+  const last = Math.min(rows.length, first + Math.ceil(view.clientHeight / rowHeight) + 1);
+  let html = "";
+  for (let r = first; r < last; r++) {
+    const i = rows[r];
+    html += `<div class="row" style="top:${r * rowHeight}px"><span></span>` +
+            `<span class="num">${data.fan_out[i]}</span><span class="num">${data.fan_in[i]}</span></div>`;
+  }
+  spacer.innerHTML = html;
+  // Module names go in as text, never as markup
+  spacer.querySelectorAll(".row span:first-child").forEach((cell, k) => { cell.textContent = data.module[rows[first + k]]; });
+  document.getElementById("count").textContent = `${rows.length} of ${data.module.length} modules`;
+}
+
+function update() {
+  const needle = document.getElementById("filter").value;
+  rows = data.module.map((_, i) => i).filter(i => !needle || data.module[i].includes(needle));
+  const column = columns[sortKey];
+  rows.sort((a, b) => (column[a] < column[b] ? -1 : column[a] > column[b] ? 1 : 0) * (descending ? -1 : 1));
+  view.scrollTop = 0;
+  render();
+}
+
+document.querySelectorAll(".head span").forEach(cell => cell.addEventListener("click", () => {
+  const key = Number(cell.dataset.key);
+  descending = key === sortKey ? !descending : key !== 0;
+  sortKey = key;
+  update();
+}));
+document.getElementById("filter").addEventListener("input", update);
+view.addEventListener("scroll", render);
+update();
+</script>
+</body>
+</html>
+"""
+
+
+def write_fan_html(path, modules, fan_ins, fan_outs, row_height=22):
+    """
+    Write the fan-in/fan-out table as a single HTML page with virtual scrolling.
+
+    The browser only creates the rows in view, so the page stays responsive for
+    any number of modules; columns sort on click and a box filters by name.
+    """
+    order = sorted(range(len(modules)), key=modules.__getitem__)
+    data = {
+        "module": [modules[i] for i in order],
+        "fan_out": [fan_outs[i] for i in order],
+        "fan_in": [fan_ins[i] for i in order],
+    }
+    # "</" would end the <script> element early
+    payload = json.dumps(data, separators=(",", ":")).replace("</", "<\\/")
+    page = _FAN_HTML.replace("ROW_HEIGHT", str(row_height)).replace("DATA", payload)
+    with open(path, "w") as f:
+        f.write(page)
+    return path
+
+
+def summary_stats(coupling_metrics):
+    """
+    Graph-wide statistics of dependency_metrics_summary.txt as a flat dict.
+
+    Also used for the cross-project table of batch_analysis.py.
+    """
+    categories = categorize_modules(coupling_metrics)
+    count = len(coupling_metrics) or 1
+    return {
+        "isolated": sum(1 for m in coupling_metrics if m["fan_in"] == 0 and m["fan_out"] == 0),
+        "no_fan_out": sum(1 for m in coupling_metrics if m["fan_out"] == 0),
+        "no_fan_in": sum(1 for m in coupling_metrics if m["fan_in"] == 0),
+        "stable_abstractions": len(categories[0]),
+        "unstable_abstractions": len(categories[1]),
+        "stable_concretions": len(categories[2]),
+        "unstable_concretions": len(categories[3]),
+        "avg_fan_in": sum(m["fan_in"] for m in coupling_metrics) / count,
+        "avg_fan_out": sum(m["fan_out"] for m in coupling_metrics) / count,
+        "avg_coupling": sum(m["coupling"] for m in coupling_metrics) / count,
+    }
+
+
+def write_summary(path, coupling_metrics, edge_count, cyclic_component_count, cyclic_module_count,
+                  cycle_count, max_cycle_length, max_cycles=None):
+    """
+    Write dependency_metrics_summary.txt from the per-module coupling records.
+
+    `cycle_count` is None when individual cycles were not enumerated; the
+    summary then only gives the cyclic components. `max_cycles` is the bound
+    the cycles were counted with; a count that reached it is written as a
+    lower bound.
+    """
+    stats = summary_stats(coupling_metrics)
+
+    with open(path, "w") as f:
+        f.write("DEPENDENCY METRICS SUMMARY\n")
+        f.write("==========================\n\n")
+
+        f.write(f"Total modules: {len(coupling_metrics)}\n")
+        f.write(f"Total dependencies: {edge_count}\n")
+
+        if cyclic_component_count:
+            f.write(f"Cyclic components: {cyclic_component_count} ({cyclic_module_count} modules)\n")
+            if cycle_count is not None:
+                capped = max_cycles is not None and cycle_count >= max_cycles
+                f.write(f"Cyclic dependencies (length <= {max_cycle_length}): "
+                        f"{'at least ' if capped else ''}{cycle_count}\n")
+        else:
+            f.write("Cyclic dependencies: None\n")
+
+        f.write(f"Isolated modules: {stats['isolated']}\n")
+        f.write(f"Modules with no imports (fan-out=0): {stats['no_fan_out']}\n")
+        f.write(f"Modules not imported (fan-in=0): {stats['no_fan_in']}\n\n")
+
+        f.write("Module Categorization:\n")
+        f.write(f"- Stable Abstractions: {stats['stable_abstractions']}\n")
+        f.write(f"- Unstable Abstractions: {stats['unstable_abstractions']}\n")
+        f.write(f"- Stable Concretions: {stats['stable_concretions']}\n")
+        f.write(f"- Unstable Concretions: {stats['unstable_concretions']}\n\n")
+
+        f.write("Averages:\n")
+        f.write(f"- Average Fan-In: {stats['avg_fan_in']:.2f}\n")
+        f.write(f"- Average Fan-Out: {stats['avg_fan_out']:.2f}\n")
+        f.write(f"- Average Coupling Score: {stats['avg_coupling']:.2f}\n")
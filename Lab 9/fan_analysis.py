@@ -1,81 +1,74 @@
-import json
+import time
+
+# Taken first so the startup measurement covers every import below
+start_time = time.perf_counter()
+
+import argparse
 import os
-import sys
 
-# Move matplotlib import after we modify sys.path to avoid circular imports
+from dependency_graph import DependencyGraph
+from dependency_plots import (DEFAULT_TOP_OUTLIERS, SCALABLE_FAN_OUTPUT, draw_fan_density,
+                              draw_fan_scatter, draw_fan_table, fan_outliers)
+from dependency_reports import write_fan_csv, write_fan_html
+from lazy_imports import report_startup, tabulate
+
+parser = argparse.ArgumentParser(description="Tabulate and plot fan-in/fan-out per module.")
+parser.add_argument("--no-plots", action="store_true",
+                    help="print the table only and never import the plotting stack")
+parser.add_argument("--output-mode", choices=["auto", "full", "scalable"], default="auto",
+                    help="full: print and draw the whole table, label every point; scalable: export the "
+                         f"table as CSV/HTML and draw a density plot; auto: scalable above {SCALABLE_FAN_OUTPUT} "
+                         "modules")
+parser.add_argument("--top", type=int, default=DEFAULT_TOP_OUTLIERS,
+                    help="outliers to print and label in scalable mode")
+args = parser.parse_args()
+
 current_dir = os.path.dirname(os.path.abspath(__file__))
-# Temporarily remove the current directory from path to avoid circular imports
-if current_dir in sys.path:
-    sys.path.remove(current_dir)
-
-# Now import matplotlib and other dependencies
-import matplotlib.pyplot as plt
-from tabulate import tabulate
-from PIL import Image
-
-# Restore the path
-sys.path.insert(0, current_dir)
-
-# Load the JSON file
-with open(os.path.join(current_dir, "dependencies.json"), "r") as f:
-    dependencies = json.load(f)
-
-# Initialize lists to store module data
-modules = []
-fan_ins = []
-fan_outs = []
-
-# Calculate fan-in and fan-out for each module
-for module_name, module_data in dependencies.items():
-    # Fan-out is the number of imports
-    fan_out = len(module_data.get("imports", []))
-    
-    # Fan-in is the number of modules that import this module
-    fan_in = len(module_data.get("imported_by", []))
-    
-    modules.append(module_name)
-    fan_ins.append(fan_in)
-    fan_outs.append(fan_out)
-
-# Prepare data for tabulation
-table_data = []
-for i, module in enumerate(modules):
-    table_data.append([module, fan_outs[i], fan_ins[i]])
-
-# Sort the table data by module name
-table_data.sort(key=lambda x: x[0])
-
-# Convert to tabulated text
-table_str = tabulate(table_data, headers=["Module", "Fan-Out", "Fan-In"], tablefmt="grid")
-
-print(table_str)
-
-# Configure plot
-plt.figure(figsize=(10, len(table_data) * 0.4))  # Adjust height based on number of rows
-plt.text(0, 1, table_str, fontsize=10, family="monospace", verticalalignment="top")
-
-plt.axis("off")  # Hide axes
-plt.tight_layout()
-
-# Save as image
-image_path = os.path.join(current_dir, "dependency_table.png")
-plt.savefig(image_path, bbox_inches="tight", dpi=300)
-print(f"Table saved as {image_path}")
-
-# Create a fan-in vs fan-out scatter plot
-plt.figure(figsize=(10, 8))
-plt.scatter(fan_ins, fan_outs, alpha=0.6)
-
-# Add labels to points
-for i, module in enumerate(modules):
-    plt.annotate(module, (fan_ins[i], fan_outs[i]), fontsize=8)
-
-plt.title("Fan-In vs Fan-Out Analysis")
-plt.xlabel("Fan-In (Number of modules importing this module)")
-plt.ylabel("Fan-Out (Number of modules imported by this module)")
-plt.grid(True, linestyle='--', alpha=0.7)
-
-# Save scatter plot
-scatter_path = os.path.join(current_dir, "fan_analysis_scatter.png")
-plt.savefig(scatter_path, bbox_inches="tight", dpi=300)
-print(f"Scatter plot saved as {scatter_path}")
+report_startup(start_time)
+
+# Load the dependency graph
+graph = DependencyGraph.load(os.path.join(current_dir, "dependencies.json"))
+
+# Module names with their fan-in (modules importing it) and fan-out (modules it imports)
+modules = graph.names
+fan_ins = graph.fan_in_counts()
+fan_outs = graph.fan_out_counts()
+
+scalable = args.output_mode == "scalable" or (args.output_mode == "auto" and len(modules) > SCALABLE_FAN_OUTPUT)
+
+if scalable:
+    # Columnar exports scale with the graph; the grid text and its image do not
+    csv_path = write_fan_csv(os.path.join(current_dir, "fan_table.csv"), modules, fan_ins, fan_outs)
+    html_path = write_fan_html(os.path.join(current_dir, "fan_table.html"), modules, fan_ins, fan_outs)
+    print(f"Fan table for {len(modules)} modules saved as {csv_path} and {html_path}")
+
+    print(f"\nTop {args.top} outliers (most extreme fan-in/fan-out, log-scaled):")
+    table_data = [[modules[i], fan_outs[i], fan_ins[i]] for i in fan_outliers(fan_ins, fan_outs, args.top)]
+    print(tabulate(table_data, headers=["Module", "Fan-Out", "Fan-In"], tablefmt="grid"))
+
+    if not args.no_plots:
+        scatter_path = draw_fan_density(modules, fan_ins, fan_outs,
+                                        os.path.join(current_dir, "fan_analysis_scatter.png"), args.top)
+        print(f"Density plot saved as {scatter_path}")
+else:
+    # Prepare data for tabulation
+    table_data = []
+    for i, module in enumerate(modules):
+        table_data.append([module, fan_outs[i], fan_ins[i]])
+
+    # Sort the table data by module name
+    table_data.sort(key=lambda x: x[0])
+
+    # Convert to tabulated text
+    table_str = tabulate(table_data, headers=["Module", "Fan-Out", "Fan-In"], tablefmt="grid")
+
+    print(table_str)
+
+    # Render the table and the scatter plot unless running metrics-only
+    if not args.no_plots:
+        image_path = draw_fan_table(table_str, len(table_data), os.path.join(current_dir, "dependency_table.png"))
+        print(f"Table saved as {image_path}")
+
+        scatter_path = draw_fan_scatter(modules, fan_ins, fan_outs,
+                                        os.path.join(current_dir, "fan_analysis_scatter.png"))
+        print(f"Scatter plot saved as {scatter_path}")
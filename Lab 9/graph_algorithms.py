@@ -0,0 +1,569 @@
+#!/usr/bin/env python3
+"""
+Graph algorithms shared by the dependency analysis scripts.
+
+Graphs are passed around as integer adjacency lists: ``successors[v]`` is an
+iterable of the node ids that node ``v`` points to. Module names are interned
+to ids by the caller, which keeps these routines free of dict-of-dict lookups.
+"""
+
+from array import array
+from collections import namedtuple
+
+# Result of condensing a graph and propagating reachability over it.
+#   component_of[v] -> id of the strongly connected component containing v
+#   components[c]   -> node ids in component c (reverse topological order)
+#   reach[c]        -> bitset of nodes reachable from component c via >= 1 edge
+#   order[b]        -> node id stored at bit position b of the bitsets
+Condensation = namedtuple("Condensation", ["component_of", "components", "reach", "order"])
+
+# Bytes reachable_counts may spend on reachable sets before it splits the
+# bit positions into windows, and the narrowest window it will use
+REACH_MEMORY_BUDGET = 256 << 20
+MIN_REACH_WINDOW = 4096
+
+
+def strongly_connected_components(successors):
+    """
+    Find the strongly connected components of a graph (iterative Tarjan).
+
+    Returns (component_of, components). Components are emitted in reverse
+    topological order: every component appears after all the components it
+    can reach.
+    """
+    n = len(successors)
+    index_of = [-1] * n
+    lowlink = [0] * n
+    on_stack = [False] * n
+    component_of = [-1] * n
+    components = []
+    stack = []
+    next_index = 0
+
+    for root in range(n):
+        if index_of[root] != -1:
+            continue
+
+        # Explicit DFS stack of (node, iterator over its successors)
+        index_of[root] = lowlink[root] = next_index
+        next_index += 1
+        stack.append(root)
+        on_stack[root] = True
+        work = [(root, iter(successors[root]))]
+
+        while work:
+            node, neighbours = work[-1]
+            descended = False
+            for nxt in neighbours:
+                if index_of[nxt] == -1:
+                    index_of[nxt] = lowlink[nxt] = next_index
+                    next_index += 1
+                    stack.append(nxt)
+                    on_stack[nxt] = True
+                    work.append((nxt, iter(successors[nxt])))
+                    descended = True
+                    break
+                if on_stack[nxt] and index_of[nxt] < lowlink[node]:
+                    lowlink[node] = index_of[nxt]
+            if descended:
+                continue
+
+            # All successors visited - close the node
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                if lowlink[node] < lowlink[parent]:
+                    lowlink[parent] = lowlink[node]
+
+            if lowlink[node] == index_of[node]:
+                component_id = len(components)
+                members = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component_of[member] = component_id
+                    members.append(member)
+                    if member == node:
+                        break
+                components.append(members)
+
+    return component_of, components
+
+
+def condensed_reachability(successors):
+    """
+    Compute, for every node, the set of nodes reachable from it via at least
+    one edge.
+
+    The graph is collapsed into its strongly connected components and the
+    condensation DAG is walked once in reverse topological order. Reachable
+    sets are stored once per component as integer bitsets, so members of a
+    cycle share a single set. Bit positions follow the component order, which
+    lets each component be OR-ed in as one contiguous mask.
+    """
+    component_of, components = strongly_connected_components(successors)
+
+    # Assign bit positions component by component
+    order = []
+    masks = []
+    for members in components:
+        masks.append(((1 << len(members)) - 1) << len(order))
+        order.extend(members)
+
+    reach = [0] * len(components)
+    closed = [0] * len(components)  # component mask | its reach
+    seen_from = [-1] * len(components)
+
+    for c, members in enumerate(components):
+        bits = 0
+        cyclic = len(members) > 1
+        for node in members:
+            for nxt in successors[node]:
+                target = component_of[nxt]
+                if target == c:
+                    # Only a self-loop can make a single node reach itself
+                    cyclic = True
+                elif seen_from[target] != c:
+                    seen_from[target] = c
+                    bits |= closed[target]
+        if cyclic:
+            bits |= masks[c]
+        reach[c] = bits
+        closed[c] = bits | masks[c]
+
+    return Condensation(component_of, components, reach, order)
+
+
+def reachable_counts(successors, memory_budget=REACH_MEMORY_BUDGET):
+    """
+    Return the number of nodes reachable from each node via >= 1 edge.
+
+    The same walk as condensed_reachability, but only the counts are kept:
+    each reachable set is popcounted as soon as it is built and released
+    once the last component importing it has been processed. When the sets
+    still alive at once would not fit in `memory_budget` bytes, the bit
+    positions are split into windows and the walk is repeated per window,
+    summing the counts; a pass only has to start at its window's first
+    component, since nothing before it can reach the window.
+    """
+    component_of, components = strongly_connected_components(successors)
+    count = len(components)
+
+    # Components come sinks first, so the last user of a set is the highest
+    # component with an edge into it
+    last_use = list(range(count))
+    for c, members in enumerate(components):
+        for node in members:
+            for nxt in successors[node]:
+                last_use[component_of[nxt]] = c
+
+    # Most sets held at once; each is at most one window wide
+    released = [0] * count
+    live = peak = 0
+    for c in range(count):
+        if last_use[c] != c:
+            live += 1
+            released[last_use[c]] += 1
+        live -= released[c]
+        peak = max(peak, live)
+    window = max(memory_budget * 8 // max(peak, 1), MIN_REACH_WINDOW)
+
+    counts_by_component = [0] * count
+    first = 0
+    while first < count:
+        # Components [first, stop) own the bit positions of this pass
+        stop, width = first, 0
+        while stop < count and (stop == first or width + len(components[stop]) <= window):
+            width += len(components[stop])
+            stop += 1
+
+        closed = [0] * count  # component mask | its reach, while still needed
+        seen_from = [-1] * count
+        offset = 0
+        for c in range(first, count):
+            bits = 0
+            cyclic = len(components[c]) > 1
+            for node in components[c]:
+                for nxt in successors[node]:
+                    target = component_of[nxt]
+                    if target == c:
+                        cyclic = True
+                    elif seen_from[target] != c:
+                        seen_from[target] = c
+                        bits |= closed[target]
+                        if last_use[target] == c:
+                            closed[target] = 0
+            mask = 0
+            if c < stop:
+                mask = ((1 << len(components[c])) - 1) << offset
+                offset += len(components[c])
+                if cyclic:
+                    bits |= mask
+            counts_by_component[c] += bits.bit_count()
+            if last_use[c] != c:
+                closed[c] = bits | mask
+        first = stop
+
+    return [counts_by_component[c] for c in component_of]
+
+
+# Longest import chains over the condensation DAG.
+#   depth[v]  -> longest chain (in edges) from a node nothing points to down to v
+#   height[v] -> longest chain from v down to a node that points to nothing
+#   chain     -> node ids along one longest chain, one node per component
+DepthProfile = namedtuple("DepthProfile", ["depth", "height", "chain"])
+
+
+def longest_chains(successors, scc=None):
+    """
+    Compute dependency depth and height for every node in one O(N + E) pass.
+
+    Each strongly connected component counts as a single step, so the result
+    is the true longest path of the condensation DAG. Pass the output of
+    strongly_connected_components as `scc` to reuse an existing condensation.
+    """
+    component_of, components = scc if scc is not None else strongly_connected_components(successors)
+    count = len(components)
+    height = [0] * count
+    depth = [0] * count
+    # Edge (from node, to node) realizing each component's height, for the chain
+    next_step = [None] * count
+
+    # Components come sinks first: heights can be filled in directly...
+    for c, members in enumerate(components):
+        for node in members:
+            for nxt in successors[node]:
+                target = component_of[nxt]
+                if target != c and height[target] + 1 > height[c]:
+                    height[c] = height[target] + 1
+                    next_step[c] = (node, nxt)
+
+    # ...and depths by walking the same order backwards
+    for c in range(count - 1, -1, -1):
+        for node in components[c]:
+            for nxt in successors[node]:
+                target = component_of[nxt]
+                if target != c and depth[c] + 1 > depth[target]:
+                    depth[target] = depth[c] + 1
+
+    chain = []
+    if count:
+        current = max(range(count), key=height.__getitem__)
+        entry = components[current][0]
+        while next_step[current] is not None:
+            source, target = next_step[current]
+            # Enter each component where the previous step landed
+            chain.append(entry if chain else source)
+            entry = target
+            current = component_of[target]
+        chain.append(entry)
+
+    return DepthProfile([depth[c] for c in component_of],
+                        [height[c] for c in component_of],
+                        chain)
+
+
+def betweenness_centrality(successors, pivots=None, seed=None):
+    """
+    Betweenness centrality of every node (Brandes' algorithm, unweighted, directed).
+
+    With `pivots` set, shortest paths are only accumulated from that many randomly
+    chosen source nodes and the result is scaled up by n / pivots, which gives an
+    unbiased estimate in O(pivots * E) time instead of O(N * E).
+    """
+    n = len(successors)
+    sources = range(n)
+    if pivots is not None and pivots < n:
+        import random
+        sources = random.Random(seed).sample(range(n), pivots)
+
+    centrality = [0.0] * n
+    sigma = [0] * n
+    distance = [-1] * n
+    delta = [0.0] * n
+
+    for source in sources:
+        # Breadth-first search counting shortest paths from the source
+        order = [source]
+        sigma[source] = 1
+        distance[source] = 0
+        head = 0
+        while head < len(order):
+            node = order[head]
+            head += 1
+            for nxt in successors[node]:
+                if distance[nxt] < 0:
+                    distance[nxt] = distance[node] + 1
+                    order.append(nxt)
+                if distance[nxt] == distance[node] + 1:
+                    sigma[nxt] += sigma[node]
+
+        # Accumulate dependencies in reverse BFS order
+        for node in reversed(order):
+            for nxt in successors[node]:
+                if distance[nxt] == distance[node] + 1:
+                    delta[node] += sigma[node] * (1 + delta[nxt]) / sigma[nxt]
+            if node != source:
+                centrality[node] += delta[node]
+
+        # Reset only the nodes this search touched
+        for node in order:
+            sigma[node] = 0
+            distance[node] = -1
+            delta[node] = 0.0
+
+    if pivots is not None and pivots < n and pivots > 0:
+        scale = n / pivots
+        centrality = [value * scale for value in centrality]
+    return centrality
+
+
+def closure(adjacency, seeds):
+    """Set of nodes reachable from `seeds` (seeds included) by following `adjacency`."""
+    seen = set(seeds)
+    stack = list(seen)
+    while stack:
+        node = stack.pop()
+        for nxt in adjacency[node]:
+            if nxt not in seen:
+                seen.add(nxt)
+                stack.append(nxt)
+    return seen
+
+
+def induced_subgraph(adjacency, nodes):
+    """
+    Restrict a graph to `nodes`.
+
+    Returns (local_nodes, local_adjacency): local id i stands for node
+    local_nodes[i], and only edges between kept nodes survive.
+    """
+    local_nodes = sorted(nodes)
+    local_id = {node: i for i, node in enumerate(local_nodes)}
+    local_adjacency = [[local_id[nxt] for nxt in adjacency[node] if nxt in local_id]
+                       for node in local_nodes]
+    return local_nodes, local_adjacency
+
+
+def reachable_counts_within(successors, nodes):
+    """
+    reachable_counts for `nodes` only, as {node: count}.
+
+    Only the part of the graph reachable from `nodes` is condensed, so the
+    cost follows the size of that region rather than of the whole graph.
+    """
+    local_nodes, local_adjacency = induced_subgraph(successors, closure(successors, nodes))
+    counts = reachable_counts(local_adjacency)
+    return {node: counts[i] for i, node in enumerate(local_nodes) if node in nodes}
+
+
+def components_containing(successors, predecessors, seeds):
+    """
+    The strongly connected components that contain any of `seeds`.
+
+    A component containing a seed lies both downstream and upstream of it, so
+    Tarjan only runs on the part of the graph between the seeds. Returns the
+    components as sorted lists of node ids, each listed once.
+    """
+    seeds = set(seeds)
+    region = closure(successors, seeds) & closure(predecessors, seeds)
+    local_nodes, local_adjacency = induced_subgraph(successors, region)
+    _, components = strongly_connected_components(local_adjacency)
+    found = []
+    for members in components:
+        members = sorted(local_nodes[i] for i in members)
+        if seeds.intersection(members):
+            found.append(members)
+    return found
+
+
+def condensed_adjacency(successors, scc):
+    """
+    Edges of the condensation DAG in CSR form: (offsets, targets).
+
+    `scc` is the (component_of, components) pair of the same graph; component
+    c points to targets[offsets[c]:offsets[c + 1]], each listed once.
+    """
+    component_of, components = scc
+    offsets = array("i", [0])
+    targets = array("i")
+    for c, members in enumerate(components):
+        row = {component_of[nxt] for node in members for nxt in successors[node]}
+        row.discard(c)
+        targets.extend(sorted(row))
+        offsets.append(len(targets))
+    return offsets, targets
+
+
+def quotient_weights(successors, group_of, group_count):
+    """
+    Edges between groups of nodes: {(group, group): number of edges}.
+
+    group_of[v] is v's group in range(group_count). Edges inside a group are
+    counted under (g, g), so every edge of the graph is accounted for once.
+    """
+    counts = {}
+    for node, group in enumerate(group_of):
+        base = group * group_count
+        for nxt in successors[node]:
+            key = base + group_of[nxt]
+            counts[key] = counts.get(key, 0) + 1
+    return {divmod(key, group_count): weight for key, weight in counts.items()}
+
+
+# Largest graph feedback_arc_set solves exactly: the subset DP takes O(2^n * n)
+EXACT_FEEDBACK_LIMIT = 12
+
+
+def eades_lin_smyth_order(successors):
+    """
+    Order the nodes so that few edges point backwards (Eades, Lin & Smyth 1993).
+
+    Sinks are peeled off to the end and sources to the front; when neither is
+    left, the node with the largest out-degree minus in-degree goes to the
+    front. Nodes are kept in buckets by that difference (dicts rather than
+    sets: set.pop slows down badly after many removals), so the whole run is
+    O(N + E). Self-loops are ignored.
+    """
+    n = len(successors)
+    predecessors = [[] for _ in range(n)]
+    out_degree = [0] * n
+    in_degree = [0] * n
+    for node in range(n):
+        for nxt in successors[node]:
+            if nxt != node:
+                predecessors[nxt].append(node)
+                out_degree[node] += 1
+                in_degree[nxt] += 1
+
+    buckets = {}
+    top = -n
+    sinks, sources = [], []
+    for node in range(n):
+        if out_degree[node] == 0:
+            sinks.append(node)
+        elif in_degree[node] == 0:
+            sources.append(node)
+        else:
+            delta = out_degree[node] - in_degree[node]
+            buckets.setdefault(delta, {})[node] = None
+            top = max(top, delta)
+
+    removed = [False] * n
+    front, back = [], []
+
+    def remove(node):
+        nonlocal top
+        removed[node] = True
+        for nxt in successors[node]:
+            if removed[nxt] or nxt == node:
+                continue
+            if out_degree[nxt] and in_degree[nxt]:
+                del buckets[out_degree[nxt] - in_degree[nxt]][nxt]
+            in_degree[nxt] -= 1
+            if out_degree[nxt] == 0:
+                continue  # Already a sink
+            if in_degree[nxt] == 0:
+                sources.append(nxt)
+            else:
+                delta = out_degree[nxt] - in_degree[nxt]
+                buckets.setdefault(delta, {})[nxt] = None
+                top = max(top, delta)
+        for prev in predecessors[node]:
+            if removed[prev]:
+                continue
+            if out_degree[prev] and in_degree[prev]:
+                del buckets[out_degree[prev] - in_degree[prev]][prev]
+            out_degree[prev] -= 1
+            if in_degree[prev] == 0 and out_degree[prev]:
+                continue  # Already a source
+            if out_degree[prev] == 0:
+                sinks.append(prev)
+            else:
+                buckets.setdefault(out_degree[prev] - in_degree[prev], {})[prev] = None
+
+    placed = 0
+    while placed < n:
+        while sinks:
+            node = sinks.pop()
+            if not removed[node]:
+                remove(node)
+                back.append(node)
+                placed += 1
+        while sources:
+            node = sources.pop()
+            if not removed[node]:
+                remove(node)
+                front.append(node)
+                placed += 1
+            if sinks:
+                break
+        if sinks or sources or placed == n:
+            continue
+        while not buckets.get(top):
+            top -= 1
+        node, _ = buckets[top].popitem()
+        remove(node)
+        front.append(node)
+        placed += 1
+
+    return front + back[::-1]
+
+
+def exact_feedback_order(successors):
+    """
+    An order of the nodes with the fewest possible backward edges.
+
+    Dynamic programming over subsets: best[S] is the fewest backward edges
+    among orders that place exactly the nodes of S first. Only usable for a
+    handful of nodes (see EXACT_FEEDBACK_LIMIT). Self-loops are ignored.
+    """
+    n = len(successors)
+    successor_mask = [0] * n
+    for node in range(n):
+        for nxt in successors[node]:
+            if nxt != node:
+                successor_mask[node] |= 1 << nxt
+
+    full = (1 << n) - 1
+    best = [n * n] * (full + 1)
+    last = [-1] * (full + 1)
+    best[0] = 0
+    for placed in range(full):
+        cost = best[placed]
+        remaining = full & ~placed
+        while remaining:
+            bit = remaining & -remaining
+            remaining ^= bit
+            node = bit.bit_length() - 1
+            # Appending node makes its edges into the already placed nodes point backwards
+            candidate = cost + (successor_mask[node] & placed).bit_count()
+            if candidate < best[placed | bit]:
+                best[placed | bit] = candidate
+                last[placed | bit] = node
+
+    order = []
+    placed = full
+    while placed:
+        node = last[placed]
+        order.append(node)
+        placed &= ~(1 << node)
+    return order[::-1]
+
+
+def feedback_arc_set(successors, exact_limit=EXACT_FEEDBACK_LIMIT):
+    """
+    Edges whose removal leaves the graph acyclic, as (source, target) pairs.
+
+    Graphs of at most `exact_limit` nodes get a minimum set; larger ones the
+    Eades-Lin-Smyth heuristic. Only backward edges of the order are returned,
+    plus every self-loop. Returns (edges, exact).
+    """
+    exact = len(successors) <= exact_limit
+    order = exact_feedback_order(successors) if exact else eades_lin_smyth_order(successors)
+    position = [0] * len(successors)
+    for i, node in enumerate(order):
+        position[node] = i
+    edges = [(node, nxt) for node in range(len(successors)) for nxt in successors[node]
+             if position[nxt] <= position[node]]
+    return edges, exact
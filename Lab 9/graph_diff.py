@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Diff two dependency graphs, e.g. the snapshots of a PR's base and head commits.
+
+Either side can be a dependencies.json or a binary snapshot (graph_snapshot.py).
+The diff reports:
+
+- modules and imports that were added or removed
+- fan-in, fan-out and coupling of every module at either end of a changed import
+- import cycles that appeared, disappeared, merged, split or changed members
+- modules whose transitive importer count changed
+
+Only the edge comparison looks at every module (a row-by-row scan of the two
+import arrays). Everything after that is worked out from the changed imports
+alone, on the same regions analysis_cache.py recomputes:
+
+- an SCC can only change if it contains an end of a changed import, or shares
+  a module with a component that does
+- a transitive importer count can only change downstream of a changed
+  import's target, and only where the other graph did not already reach the
+  module from that import's source
+
+so the cost follows the size of the change rather than of the graph, and the
+diff is cheap enough to run on every pull request.
+"""
+
+import argparse
+import json
+import sys
+import time
+
+from dependency_graph import DependencyGraph
+from graph_algorithms import closure, components_containing, reachable_counts_within
+
+DEFAULT_TOP = 20
+
+
+def diff_edges(old, new):
+    """
+    Compare the imports of two graphs.
+
+    Returns (added_modules, removed_modules, added_edges, removed_edges), the
+    edges as (importer, imported) name pairs.
+    """
+    old_names, new_names = old.names, new.names
+    added_edges, removed_edges = [], []
+
+    if old_names == new_names:
+        # Same module ids on both sides: compare the rows directly
+        for module_id, name in enumerate(old_names):
+            old_row, new_row = old.imports[module_id], new.imports[module_id]
+            if old_row == new_row:
+                continue
+            old_targets, new_targets = set(old_row.tolist()), set(new_row.tolist())
+            added_edges.extend((name, new_names[t]) for t in sorted(new_targets - old_targets))
+            removed_edges.extend((name, old_names[t]) for t in sorted(old_targets - new_targets))
+        return [], [], added_edges, removed_edges
+
+    new_index = new.index
+    old_index = old.index
+    removed_modules = [name for name in old_names if name not in new_index]
+    added_modules = [name for name in new_names if name not in old_index]
+    for module_id, name in enumerate(old_names):
+        old_targets = {old_names[t] for t in old.imports[module_id]}
+        new_id = new_index.get(name)
+        new_targets = {new_names[t] for t in new.imports[new_id]} if new_id is not None else set()
+        if old_targets != new_targets:
+            added_edges.extend((name, target) for target in sorted(new_targets - old_targets))
+            removed_edges.extend((name, target) for target in sorted(old_targets - new_targets))
+    for name in added_modules:
+        added_edges.extend((name, new_names[t]) for t in new.imports[new_index[name]])
+    return added_modules, removed_modules, added_edges, removed_edges
+
+
+def _fan(graph, name):
+    if name not in graph:
+        return None
+    node = graph.index[name]
+    fan_in, fan_out = graph.fan_in(node), graph.fan_out(node)
+    return {"fan_in": fan_in, "fan_out": fan_out, "coupling": fan_in * fan_out}
+
+
+def diff_fan(old, new, endpoints):
+    """Old and new fan-in/fan-out/coupling of every module in `endpoints` whose values changed."""
+    changes = []
+    for name in sorted(endpoints):
+        before, after = _fan(old, name), _fan(new, name)
+        if before != after:
+            changes.append({"module": name, "old": before, "new": after})
+    return changes
+
+
+def _cyclic_components(graph, names):
+    """Import cycles (as frozensets of names) that contain any of `names`."""
+    seeds = {graph.index[name] for name in names if name in graph}
+    found = set()
+    for members in components_containing(graph.imports, graph.imported_by, seeds):
+        # A lone module is only cyclic if it imports itself
+        if len(members) > 1 or members[0] in graph.imports[members[0]]:
+            found.add(frozenset(graph.names[node] for node in members))
+    return found
+
+
+def diff_cycles(old, new, endpoints):
+    """
+    Classify how the import cycles around `endpoints` changed.
+
+    Returns a list of {"kind", "old", "new"} records, where old and new are
+    lists of member lists and kind is one of "new", "broken", "merged",
+    "split" or "changed".
+    """
+    # A component can change without containing an endpoint, if it used to be
+    # (or now is) part of one that did. Growing the seeds by the members found
+    # on the other side settles after at most three rounds.
+    seeds = set(endpoints)
+    while True:
+        old_components = _cyclic_components(old, seeds)
+        new_components = _cyclic_components(new, seeds)
+        members = set().union(*old_components, *new_components)
+        if members <= seeds:
+            break
+        seeds |= members
+
+    unchanged = old_components & new_components
+    old_components = old_components - unchanged
+    new_components = new_components - unchanged
+
+    changes = []
+    for component in sorted(new_components, key=min):
+        overlapping = [c for c in old_components if c & component]
+        if not overlapping:
+            kind = "new"
+        elif len(overlapping) > 1:
+            kind = "merged"
+        elif len([c for c in new_components if c & overlapping[0]]) > 1:
+            continue  # Reported once from the old side below
+        else:
+            kind = "changed"
+        changes.append({"kind": kind, "old": sorted(sorted(c) for c in overlapping), "new": [sorted(component)]})
+    for component in sorted(old_components, key=min):
+        pieces = [c for c in new_components if c & component]
+        if not pieces:
+            changes.append({"kind": "broken", "old": [sorted(component)], "new": []})
+        elif len(pieces) > 1 and not any(len([o for o in old_components if o & piece]) > 1 for piece in pieces):
+            changes.append({"kind": "split", "old": [sorted(component)], "new": sorted(sorted(c) for c in pieces)})
+    return changes
+
+
+def _downstream(graph, names):
+    """Names of every module reachable from `names` (included) in `graph`."""
+    seeds = {graph.index[name] for name in names if name in graph}
+    return {graph.names[node] for node in closure(graph.imports, seeds)}
+
+
+def _importer_counts(graph, names):
+    """Transitive importer counts of the modules in `names` that exist in `graph`."""
+    nodes = {graph.index[name] for name in names if name in graph}
+    return {graph.names[node]: count for node, count in reachable_counts_within(graph.imported_by, nodes).items()}
+
+
+def _gained_importers(graph, other, edges):
+    """
+    Modules that `edges` (present in `graph` only) can give importers `other` lacks.
+
+    Anything that now reaches v through one of these imports either reached
+    the import's source already in `other`, or gets there through another
+    changed import. Following a path back to its first changed import (s, t),
+    v must be downstream of t in `graph` but not downstream of s in `other`.
+    """
+    targets_by_source = {}
+    for source, target in edges:
+        targets_by_source.setdefault(source, []).append(target)
+    region = set()
+    for source, targets in targets_by_source.items():
+        # Strictly downstream: s itself only reached s before if it was on a cycle
+        reached = set()
+        if source in other:
+            reached = _downstream(other, [other.names[t] for t in other.imports[other.index[source]]])
+        region |= _downstream(graph, targets) - reached
+    return region
+
+
+def diff_impact(old, new, added_edges, removed_edges, changed_modules=()):
+    """
+    Modules whose transitive importer count changed, largest change first.
+
+    Only modules picked out by _gained_importers (in either direction) and
+    added or removed modules can change, so counts are recomputed for those
+    alone.
+    """
+    region = set(changed_modules)
+    region |= _gained_importers(new, old, added_edges)
+    region |= _gained_importers(old, new, removed_edges)
+    before = _importer_counts(old, region)
+    after = _importer_counts(new, region)
+
+    changes = []
+    for name in before.keys() | after.keys():
+        old_count, new_count = before.get(name), after.get(name)
+        if old_count != new_count:
+            delta = (new_count or 0) - (old_count or 0)
+            changes.append({"module": name, "old": old_count, "new": new_count, "delta": delta})
+    changes.sort(key=lambda x: (-abs(x["delta"]), x["module"]))
+    return changes
+
+
+def diff_graphs(old, new):
+    """Full diff of two DependencyGraphs as a JSON-ready dict (see the module docstring)."""
+    added_modules, removed_modules, added_edges, removed_edges = diff_edges(old, new)
+    changed = added_edges + removed_edges
+    endpoints = {name for edge in changed for name in edge}
+    return {
+        "old_modules": len(old),
+        "new_modules": len(new),
+        "old_edges": old.number_of_edges(),
+        "new_edges": new.number_of_edges(),
+        "added_modules": added_modules,
+        "removed_modules": removed_modules,
+        "added_edges": added_edges,
+        "removed_edges": removed_edges,
+        "fan_changes": diff_fan(old, new, endpoints),
+        "cycle_changes": diff_cycles(old, new, endpoints),
+        "impact_changes": diff_impact(old, new, added_edges, removed_edges, added_modules + removed_modules),
+    }
+
+
+def format_diff(diff, top=DEFAULT_TOP):
+    """Human-readable report of a diff_graphs result."""
+    lines = [
+        "Dependency Graph Diff",
+        "=====================",
+        f"Modules: {diff['old_modules']} -> {diff['new_modules']} "
+        f"(+{len(diff['added_modules'])}, -{len(diff['removed_modules'])})",
+        f"Imports: {diff['old_edges']} -> {diff['new_edges']} "
+        f"(+{len(diff['added_edges'])}, -{len(diff['removed_edges'])})",
+        "",
+    ]
+
+    def section(title, items, describe):
+        if not items:
+            return
+        lines.append(f"{title} ({len(items)}):")
+        for item in items[:top]:
+            lines.append(f"  {describe(item)}")
+        if len(items) > top:
+            lines.append(f"  ... and {len(items) - top} more")
+        lines.append("")
+
+    section("Added modules", diff["added_modules"], str)
+    section("Removed modules", diff["removed_modules"], str)
+    section("Added imports", diff["added_edges"], lambda e: f"+ {e[0]} -> {e[1]}")
+    section("Removed imports", diff["removed_edges"], lambda e: f"- {e[0]} -> {e[1]}")
+
+    def fan(values):
+        if values is None:
+            return "absent"
+        return f"in {values['fan_in']}, out {values['fan_out']}, coupling {values['coupling']}"
+
+    section("Fan-in/fan-out changes", diff["fan_changes"],
+            lambda c: f"{c['module']}: {fan(c['old'])} -> {fan(c['new'])}")
+
+    def names(modules, limit=5):
+        modules = sorted(modules)
+        more = f", ... (+{len(modules) - limit})" if len(modules) > limit else ""
+        return ", ".join(modules[:limit]) + more
+
+    def cycle(change):
+        # Components can hold thousands of modules, so list sizes and the modules that moved
+        old = " + ".join(str(len(members)) for members in change["old"]) or "none"
+        new = " + ".join(str(len(members)) for members in change["new"]) or "none"
+        old_members = set().union(*change["old"])
+        new_members = set().union(*change["new"])
+        text = f"{change['kind']}: {old} -> {new} modules"
+        if new_members - old_members:
+            text += f"; joined: {names(new_members - old_members)}"
+        if old_members - new_members:
+            text += f"; left: {names(old_members - new_members)}"
+        if change["kind"] in ("merged", "split"):
+            pieces = change["new"] if change["kind"] == "split" else change["old"]
+            text += "; parts: " + " | ".join(names(members, 3) for members in pieces)
+        return text
+
+    section("Cycle changes", diff["cycle_changes"], cycle)
+    section("Transitive impact changes", diff["impact_changes"],
+            lambda c: f"{c['module']}: {c['old']} -> {c['new']} ({c['delta']:+d})")
+
+    if len(lines) == 5:
+        lines.append("No dependency changes.")
+    return "\n".join(lines).rstrip() + "\n"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Diff two dependency graphs (dependencies.json or snapshots).")
+    parser.add_argument("old", help="graph of the base commit")
+    parser.add_argument("new", help="graph of the changed commit")
+    parser.add_argument("--json", default=None, help="also write the full diff as JSON to this file")
+    parser.add_argument("--top", type=int, default=DEFAULT_TOP, help="entries listed per section of the report")
+    parser.add_argument("--fail-on-new-cycles", action="store_true",
+                        help="exit with status 1 if the change creates or grows an import cycle")
+    args = parser.parse_args()
+
+    start_time = time.perf_counter()
+    old_graph = DependencyGraph.load(args.old)
+    new_graph = DependencyGraph.load(args.new)
+    load_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    result = diff_graphs(old_graph, new_graph)
+    diff_time = time.perf_counter() - start_time
+
+    print(format_diff(result, args.top))
+    print(f"Loaded in {load_time:.2f} seconds, diffed in {diff_time:.2f} seconds")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Diff saved to {args.json}")
+
+    if args.fail_on_new_cycles:
+        grown = [c for c in result["cycle_changes"]
+                 if c["kind"] in ("new", "merged")
+                 or (c["kind"] == "changed" and not set(c["new"][0]) <= set(c["old"][0]))]
+        if grown:
+            print(f"{len(grown)} import cycle(s) created or grown")
+            sys.exit(1)
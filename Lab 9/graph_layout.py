@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+Cached, incremental and multilevel layouts for the dependency drawings.
+
+A force-directed layout is the slowest part of drawing a graph, and between
+two runs the graph usually changes little or not at all. LayoutCache keeps the
+positions of every drawing in a JSON file, keyed by a hash of its nodes, edges
+and layout parameters:
+
+    hit    same graph: the cached positions are returned as they are
+    warm   changed graph: nodes touching an added or removed edge, new nodes
+           and their neighbours within `refine_hops` are re-laid out; every
+           other node keeps its cached position, so the picture stays stable
+    cold   nothing cached: a fresh layout
+
+Small graphs use nx.spring_layout with the caller's parameters, so a cold
+layout is the same picture as before caching. From MULTILEVEL_THRESHOLD nodes
+on (where networkx would switch to a scipy-based solver) multilevel_layout is
+used instead: the graph is coarsened by edge matching down to a few dozen
+nodes, that is laid out exactly, and every finer level starts from its parent's
+position and only needs a few Fruchterman-Reingold sweeps. At the fine levels
+repulsion comes from a grid of node masses convolved with the force kernel by
+FFT (a particle-mesh scheme, the grid counterpart of Barnes-Hut), so a sweep
+costs O(N + E) rather than O(N^2). A warm start, whatever the size, runs a
+few cool sweeps in which only the moving nodes are displaced.
+"""
+
+import hashlib
+import json
+import os
+
+from lazy_imports import require
+
+LAYOUT_CACHE_VERSION = 1
+DEFAULT_LAYOUT_CACHE = ".layout_cache.json"
+
+# Nodes from which multilevel_layout replaces nx.spring_layout
+MULTILEVEL_THRESHOLD = 500
+# Coarsening stops at this many nodes, which are laid out exactly
+COARSEST_SIZE = 50
+# Above this many nodes, repulsion is computed on a grid instead of between every pair
+EXACT_REPULSION_LIMIT = 200
+GRID_CELLS = 64
+# Hops around a change whose nodes move in a warm-started layout (0: only its endpoints)
+DEFAULT_REFINE_HOPS = 0
+
+
+def graph_key(G, params):
+    """SHA-256 of a graph's nodes, edges and layout parameters."""
+    digest = hashlib.sha256()
+    digest.update(json.dumps(params, sort_keys=True).encode())
+    for node in sorted(map(str, G.nodes())):
+        digest.update(node.encode() + b"\0")
+    digest.update(b"\1")
+    for source, target in sorted((str(a), str(b)) for a, b in G.edges()):
+        digest.update(source.encode() + b"\0" + target.encode() + b"\0")
+    return digest.hexdigest()
+
+
+def _force_sweeps(np, pos, u, v, w, k, iterations, movable=None, temperature=0.1):
+    """
+    Fruchterman-Reingold sweeps over an (n, 2) position array, in place.
+
+    u, v, w are the endpoints and weights of the undirected edges. Only rows
+    set in `movable` (default: all) are moved. Each node moves at most
+    `temperature` per sweep, cooling linearly to zero.
+    """
+    n = len(pos)
+    if n < 2 or iterations <= 0:
+        return pos
+    for step in range(iterations):
+        if n <= EXACT_REPULSION_LIMIT:
+            delta = pos[:, None, :] - pos[None, :, :]
+            distance2 = np.maximum((delta ** 2).sum(axis=2), 1e-4)
+            displacement = (delta * (k * k / distance2)[:, :, None]).sum(axis=1)
+        else:
+            displacement = _grid_repulsion(np, pos, k)
+        # Attraction along every edge, scaled by its weight
+        delta = pos[u] - pos[v]
+        distance = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-2)
+        pull = delta * (distance * w / k)[:, None]
+        for axis in (0, 1):
+            displacement[:, axis] += np.bincount(v, pull[:, axis], n) - np.bincount(u, pull[:, axis], n)
+
+        if movable is not None:
+            displacement[~movable] = 0
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-9)
+        limit = temperature * (1 - step / iterations)
+        pos += displacement * (np.minimum(length, limit) / length)[:, None]
+    return pos
+
+
+def _grid_repulsion(np, pos, k, cells=GRID_CELLS):
+    """
+    Approximate repulsion on every node, in O(N + cells^2 log cells).
+
+    Nodes are binned into a cells x cells grid. The far field is the grid of
+    masses convolved (by FFT) with the repulsion kernel, read at each node's
+    cell; within a cell, a node is pushed away from the cell's centre of mass.
+    """
+    low = pos.min(axis=0)
+    h = max(float((pos.max(axis=0) - low).max()), 1e-9) / cells
+    cell_xy = np.minimum(((pos - low) / h).astype(int), cells - 1)
+    cell = cell_xy[:, 0] * cells + cell_xy[:, 1]
+    mass = np.bincount(cell, minlength=cells * cells).astype(float)
+
+    offsets = np.arange(-cells + 1, cells) * h
+    dx, dy = offsets[:, None], offsets[None, :]
+    distance2 = dx ** 2 + dy ** 2
+    distance2[cells - 1, cells - 1] = np.inf
+    size = 3 * cells
+    mass_spectrum = np.fft.rfft2(mass.reshape(cells, cells), (size, size))
+    field = []
+    for kernel in (k * k * dx / distance2, k * k * dy / distance2):
+        full = np.fft.irfft2(mass_spectrum * np.fft.rfft2(kernel, (size, size)), (size, size))
+        field.append(full[cells - 1:2 * cells - 1, cells - 1:2 * cells - 1].ravel()[cell])
+    displacement = np.stack(field, axis=1)
+
+    centre = np.stack([np.bincount(cell, pos[:, 0], cells * cells),
+                       np.bincount(cell, pos[:, 1], cells * cells)], axis=1) / np.maximum(mass, 1)[:, None]
+    delta = pos - centre[cell]
+    distance2 = np.maximum((delta ** 2).sum(axis=1), 1e-4)
+    displacement += delta * (k * k * (mass[cell] - 1) / distance2)[:, None]
+    return displacement
+
+
+def _coarsen(np, rng, n, u, v, w):
+    """
+    One level of coarsening by handshake matching, vectorized.
+
+    Every node picks the neighbour on its incident edge with the highest
+    random priority; two nodes that pick each other are merged. A node whose
+    pick was merged with someone else joins that group (so the leaves of a
+    hub do not stall the coarsening), and the nodes left over are paired up.
+
+    Returns (parent, coarse_n, coarse u, v, w); parallel coarse edges are
+    combined by summing their weights.
+    """
+    loops = u == v
+    sources = np.concatenate([u[~loops], v[~loops]])
+    targets = np.concatenate([v[~loops], u[~loops]])
+    # Sorted by source, then priority: priorities in [0, 1) break ties within a source
+    order = np.argsort(sources + np.tile(rng.random(len(sources) // 2), 2))
+    sources, targets = sources[order], targets[order]
+    last = np.ones(len(order), dtype=bool)
+    last[:-1] = sources[1:] != sources[:-1]
+    nodes = np.arange(n)
+    pick = nodes.copy()
+    pick[sources[last]] = targets[last]
+
+    mutual = (pick[pick] == nodes) & (pick != nodes)
+    leaders = mutual & (nodes < pick)
+    coarse_n = int(leaders.sum())
+    parent = np.full(n, -1)
+    parent[leaders] = np.arange(coarse_n)
+    followers = mutual & ~leaders
+    parent[followers] = parent[pick[followers]]
+    join = (parent < 0) & (parent[pick] >= 0)
+    parent[join] = parent[pick[join]]
+    left = np.flatnonzero(parent < 0)
+    parent[left] = coarse_n + np.arange(len(left)) // 2
+    coarse_n += (len(left) + 1) // 2
+
+    cu, cv = parent[u], parent[v]
+    keep = cu != cv
+    keys = np.minimum(cu, cv)[keep] * coarse_n + np.maximum(cu, cv)[keep]
+    keys, inverse = np.unique(keys, return_inverse=True)
+    weights = np.bincount(inverse, w[keep], len(keys))
+    return parent, coarse_n, keys // coarse_n, keys % coarse_n, weights
+
+
+def multilevel_layout(n, u, v, w=None, seed=42, sweeps=10):
+    """
+    Positions (an (n, 2) array, centred) for n nodes joined by undirected edges u[i]-v[i].
+
+    Coarsens (see _coarsen) until COARSEST_SIZE nodes remain,
+    lays that level out with exact repulsion, then walks back up: each node
+    starts at its parent's position, jittered, and is refined with `sweeps`
+    cheaper sweeps.
+    """
+    np = require("numpy")
+    rng = np.random.default_rng(seed)
+    u, v = np.asarray(u, dtype=int), np.asarray(v, dtype=int)
+    w = np.ones(len(u)) if w is None else np.asarray(w, dtype=float)
+
+    levels = []
+    size = n
+    while size > COARSEST_SIZE:
+        parent, coarse_n, cu, cv, cw = _coarsen(np, rng, size, u, v, w)
+        levels.append((parent, size, u, v, w))
+        size, u, v, w = coarse_n, cu, cv, cw
+
+    pos = rng.uniform(-1, 1, (size, 2))
+    _force_sweeps(np, pos, u, v, w, k=1 / np.sqrt(max(size, 1)), iterations=200)
+    while levels:
+        parent, size, u, v, w = levels.pop()
+        k = 1 / np.sqrt(size)
+        pos = pos[parent] + rng.uniform(-k / 2, k / 2, (size, 2))
+        _force_sweeps(np, pos, u, v, w, k, sweeps, temperature=k * 2)
+
+    # Not rescaled: a warm start refines these positions with the same k
+    return pos - pos.mean(axis=0)
+
+
+def _edge_arrays(np, G, nodes, weight=None):
+    """Endpoint indices (into `nodes`) and weights of G's edges as arrays."""
+    index = {node: i for i, node in enumerate(nodes)}
+    u = np.fromiter((index[a] for a, _ in G.edges()), dtype=int, count=G.number_of_edges())
+    v = np.fromiter((index[b] for _, b in G.edges()), dtype=int, count=G.number_of_edges())
+    if weight is None:
+        return u, v, np.ones(len(u))
+    return u, v, np.fromiter((data.get(weight, 1) for _, _, data in G.edges(data=True)), dtype=float,
+                             count=G.number_of_edges())
+
+
+class LayoutCache:
+    """
+    Node positions of named drawings, persisted as JSON with save().
+
+    layout() returns positions for a networkx graph and records whether the
+    cache was hit, warm-started or cold in `last_status`.
+    """
+
+    def __init__(self, cache_file=None, refine_hops=DEFAULT_REFINE_HOPS):
+        self.cache_file = cache_file
+        self.refine_hops = refine_hops
+        self.entries = {}
+        self.last_status = None
+        if cache_file and os.path.exists(cache_file):
+            try:
+                with open(cache_file, "r") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                # Unreadable or truncated: start over, like a cache from another version
+                data = None
+            if isinstance(data, dict) and data.get("version") == LAYOUT_CACHE_VERSION \
+                    and isinstance(data.get("entries"), dict):
+                self.entries = data["entries"]
+
+    def save(self):
+        if not self.cache_file:
+            return
+        # Written aside and renamed, so an interrupted save never leaves a partial file
+        partial = f"{self.cache_file}.tmp"
+        with open(partial, "w") as f:
+            json.dump({"version": LAYOUT_CACHE_VERSION, "entries": self.entries}, f)
+        os.replace(partial, self.cache_file)
+
+    def layout(self, name, G, seed=42, **params):
+        """
+        Positions {node: (x, y)} of G for the drawing `name`.
+
+        `params` (e.g. k, weight) are passed to nx.spring_layout for small
+        graphs; they are part of the cache key either way, edge weights are
+        not. Positions are not rescaled to a fixed box. Node names are stored
+        as strings, so nodes should be strings too.
+        """
+        key = graph_key(G, dict(params, seed=seed))
+        entry = self.entries.get(name)
+        if not isinstance(entry, dict) or not {"key", "positions", "edges"} <= entry.keys():
+            entry = None
+        if entry and entry["key"] == key:
+            self.last_status = "hit"
+            positions = {node: tuple(entry["positions"][str(node)]) for node in G}
+        else:
+            moving = None
+            if entry:
+                moving = self._changed_nodes(G, entry)
+            if moving is None:
+                self.last_status = "cold"
+                positions = self._fresh_layout(G, seed, params)
+            else:
+                self.last_status = "warm"
+                positions = self._warm_layout(G, entry["positions"], moving, seed, params)
+        self.entries[name] = {
+            "key": key,
+            "positions": {str(node): [float(x), float(y)] for node, (x, y) in positions.items()},
+            "edges": [[str(a), str(b)] for a, b in G.edges()],
+        }
+        return positions
+
+    def _changed_nodes(self, G, entry):
+        """Nodes to re-lay out, or None if too much changed for a warm start to help."""
+        old_positions = entry["positions"]
+        old_edges = {tuple(edge) for edge in entry["edges"]}
+        new_edges = {(str(a), str(b)) for a, b in G.edges()}
+        by_name = {str(node): node for node in G}
+
+        changed = {by_name[name] for name in by_name if name not in old_positions}
+        for a, b in old_edges.symmetric_difference(new_edges):
+            changed.update(by_name[name] for name in (a, b) if name in by_name)
+        if len(changed) > len(G) // 2 or len(changed) == len(G):
+            return None
+
+        moving = set(changed)
+        frontier = changed
+        undirected = G.to_undirected(as_view=True) if G.is_directed() else G
+        for _ in range(self.refine_hops):
+            frontier = {nxt for node in frontier for nxt in undirected[node]} - moving
+            moving |= frontier
+        return moving
+
+    def _fresh_layout(self, G, seed, params):
+        nx = require("networkx")
+        if len(G) < MULTILEVEL_THRESHOLD:
+            # Unscaled, so that a warm start sees the same distances the forces were balanced at
+            pos = nx.spring_layout(G, seed=seed, scale=None, **params)
+            return {node: tuple(xy) for node, xy in pos.items()}
+        nodes = list(G)
+        u, v, w = _edge_arrays(require("numpy"), G, nodes, params.get("weight"))
+        pos = multilevel_layout(len(nodes), u, v, w, seed=seed)
+        return {node: tuple(pos[i]) for i, node in enumerate(nodes)}
+
+    def _warm_layout(self, G, old_positions, moving, seed, params):
+        """Re-lay out `moving`, keeping every other node where it was."""
+        nx = require("networkx")
+        np = require("numpy")
+        rng = np.random.default_rng(seed)
+        start = {node: np.array(old_positions[str(node)]) for node in G if str(node) in old_positions}
+        nodes = list(G)
+        k = params.get("k") or 1 / np.sqrt(len(nodes))
+        # New nodes start next to the neighbours that already have a place
+        for node in nodes:
+            if node not in start:
+                placed = [start[nxt] for nxt in nx.all_neighbors(G, node) if nxt in start]
+                centre = np.mean(placed, axis=0) if placed else np.zeros(2)
+                angle = rng.uniform(0, 2 * np.pi)
+                start[node] = centre + k * np.array([np.cos(angle), np.sin(angle)])
+
+        u, v, w = _edge_arrays(np, G, nodes, params.get("weight"))
+        pos = np.array([start[node] for node in nodes], dtype=float)
+        movable = np.array([node in moving for node in nodes])
+        # A short, cool run: the moving nodes settle in among the fixed ones
+        _force_sweeps(np, pos, u, v, w, k, iterations=50, movable=movable, temperature=k / 4)
+        return {node: tuple(pos[i]) for i, node in enumerate(nodes)}
+
+
+def cached_layout(name, G, path, **params):
+    """Layout of G for the drawing saved at `path`, through the layout cache next to it."""
+    cache = LayoutCache(os.path.join(os.path.dirname(os.path.abspath(path)), DEFAULT_LAYOUT_CACHE))
+    pos = cache.layout(name, G, **params)
+    cache.save()
+    return pos, cache.last_status
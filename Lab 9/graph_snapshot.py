@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Binary snapshots of a dependency graph.
+
+A snapshot holds exactly what DependencyGraph needs, laid out so it can be
+memory-mapped and used without parsing anything:
+
+    header              magic, version, node/edge/component counts, string table size
+    string table        module names, UTF-8, NUL-separated, in module id order
+    import_offsets      int32 x (nodes + 1)    CSR of "imports"
+    import_targets      int32 x edges
+    importer_offsets    int32 x (nodes + 1)    CSR of "imported by"
+    importer_sources    int32 x edges
+    component_of        int32 x nodes          SCC id of every module
+    component_offsets   int32 x (components + 1)
+    component_members   int32 x nodes          members of each SCC, in Tarjan order
+
+Integers are little-endian and every section starts on an 8-byte boundary.
+Loading maps the file and casts each section to a memoryview, so the arrays are
+never copied; only the string table is decoded. DependencyGraph.load recognizes
+snapshots by their magic bytes, so every script accepts one in place of a
+dependencies.json.
+
+Module paths and bacon numbers are not stored; converting back to JSON gives
+"imports" and "imported_by" for every module, which is all the analysis uses.
+"""
+
+import argparse
+import json
+import mmap
+import struct
+import sys
+import time
+from array import array
+
+from dependency_graph import DependencyGraph
+
+MAGIC = b"DEPGRAPH"
+VERSION = 1
+# magic, version, nodes, edges, components, string table bytes
+HEADER = struct.Struct("<8sIIIIQ")
+
+SECTIONS = ["import_offsets", "import_targets", "importer_offsets", "importer_sources",
+            "component_of", "component_offsets", "component_members"]
+
+
+def _padding(size):
+    return -size % 8
+
+
+def is_snapshot(path):
+    """True if `path` starts with the snapshot magic bytes."""
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class SnapshotGraph(DependencyGraph):
+    """A DependencyGraph whose arrays are views into a memory-mapped snapshot."""
+
+    def __init__(self, names, sections, mapping=None):
+        super().__init__(names, sections["import_offsets"], sections["import_targets"],
+                         sections["importer_offsets"], sections["importer_sources"])
+        self.component_of = sections["component_of"]
+        self.component_offsets = sections["component_offsets"]
+        self.component_members = sections["component_members"]
+        # Keeps the mapping alive for as long as the views are in use
+        self._mapping = mapping
+
+    def strongly_connected_components(self):
+        """The stored SCCs, in the same form graph_algorithms returns them."""
+        if self._scc is None:
+            offsets = self.component_offsets
+            members = self.component_members
+            components = [members[offsets[c]:offsets[c + 1]].tolist() for c in range(len(offsets) - 1)]
+            self._scc = (self.component_of, components)
+        return self._scc
+
+
+def _int32_bytes(values):
+    """Little-endian int32 bytes of a sequence of ints."""
+    values = values if isinstance(values, array) and values.typecode == "i" else array("i", values)
+    if sys.byteorder == "big":
+        values = array("i", values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def write_snapshot(graph, path):
+    """Write `graph` (SCCs included) as a binary snapshot."""
+    component_of, components = graph.strongly_connected_components()
+    component_offsets = array("i", [0])
+    component_members = array("i")
+    for members in components:
+        component_members.extend(members)
+        component_offsets.append(len(component_members))
+
+    names = "\0".join(graph.names).encode("utf-8")
+    arrays = {
+        "import_offsets": graph.import_offsets,
+        "import_targets": graph.import_targets,
+        "importer_offsets": graph.importer_offsets,
+        "importer_sources": graph.importer_sources,
+        "component_of": component_of,
+        "component_offsets": component_offsets,
+        "component_members": component_members,
+    }
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(graph), graph.number_of_edges(), len(components), len(names)))
+        f.write(names + b"\0" * _padding(len(names)))
+        for name in SECTIONS:
+            data = _int32_bytes(arrays[name])
+            f.write(data + b"\0" * _padding(len(data)))
+    return path
+
+
+def load_snapshot(path):
+    """Memory-map a snapshot and return it as a SnapshotGraph."""
+    with open(path, "rb") as f:
+        mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    buffer = memoryview(mapping)
+
+    magic, version, node_count, edge_count, component_count, names_size = HEADER.unpack_from(buffer)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a dependency graph snapshot")
+    if version != VERSION:
+        raise ValueError(f"Unsupported snapshot version {version} in {path}")
+
+    position = HEADER.size
+    names = str(buffer[position:position + names_size], "utf-8").split("\0") if node_count else []
+    position += names_size + _padding(names_size)
+
+    lengths = {
+        "import_offsets": node_count + 1,
+        "import_targets": edge_count,
+        "importer_offsets": node_count + 1,
+        "importer_sources": edge_count,
+        "component_of": node_count,
+        "component_offsets": component_count + 1,
+        "component_members": node_count,
+    }
+    sections = {}
+    for name in SECTIONS:
+        size = lengths[name] * 4
+        view = buffer[position:position + size].cast("i")
+        if sys.byteorder == "big":
+            # Stored little-endian: a big-endian machine has to copy and swap
+            view = array("i", view)
+            view.byteswap()
+        sections[name] = view
+        position += size + _padding(size)
+    return SnapshotGraph(names, sections, mapping)
+
+
+def to_dependencies(graph):
+    """A pydeps-style dict with "imports" and "imported_by" for every module."""
+    names = graph.names
+    dependencies = {}
+    for module_id, name in enumerate(names):
+        entry = {"name": name, "path": None}
+        if len(graph.imported_by[module_id]):
+            entry["imported_by"] = [names[i] for i in graph.imported_by[module_id]]
+        if len(graph.imports[module_id]):
+            entry["imports"] = [names[i] for i in graph.imports[module_id]]
+        dependencies[name] = entry
+    return dependencies
+
+
+def convert(input_file, output_file):
+    """Convert dependencies.json to a snapshot or a snapshot back to JSON, based on the input."""
+    graph = DependencyGraph.load(input_file)
+    if is_snapshot(input_file):
+        with open(output_file, "w") as f:
+            json.dump(to_dependencies(graph), f, indent=4)
+        return "json"
+    write_snapshot(graph, output_file)
+    return "snapshot"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert between dependencies.json and binary graph snapshots.")
+    parser.add_argument("input", help="dependencies.json or snapshot file")
+    parser.add_argument("output", nargs="?", default=None,
+                        help="file to write; JSON input becomes a snapshot and vice versa")
+    args = parser.parse_args()
+
+    if args.output is None:
+        start_time = time.perf_counter()
+        graph = DependencyGraph.load(args.input)
+        kind = "snapshot" if is_snapshot(args.input) else "JSON"
+        print(f"{args.input}: {kind}, {len(graph)} modules, {graph.number_of_edges()} imports, "
+              f"{len(graph.strongly_connected_components()[1])} components "
+              f"(loaded in {(time.perf_counter() - start_time) * 1000:.1f} ms)")
+    else:
+        start_time = time.perf_counter()
+        kind = convert(args.input, args.output)
+        print(f"Wrote {kind} {args.output} in {time.perf_counter() - start_time:.2f} seconds")
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+Which modules does a change affect?
+
+Given a set of changed modules (or the .py files they live in), returns every
+module that imports one of them directly or indirectly, optionally ranked by
+how many imports away it is. Feed it `git diff --name-only` and select the
+test modules in the result to run only the tests a commit can break.
+
+An ImpactIndex is built once per graph: the strongly connected components of
+the import graph and the "imported by" edges between them (the condensation
+DAG). A query walks that DAG from the changed modules' components and expands
+each component it reaches into its members, so it costs time proportional to
+the answer, not to the graph. A whole import cycle is one step of the walk.
+
+A precomputed closure (one bitset of affected modules per component) would
+make the walk unnecessary, but takes O(N^2) bits: about 2.5 GB for 200,000
+modules, against a few MB for the DAG.
+"""
+
+import argparse
+import fnmatch
+import json
+import os
+import sys
+import time
+from collections import deque
+
+from dependency_graph import DependencyGraph
+from graph_algorithms import condensed_adjacency
+from import_extractor import find_modules
+
+
+class ImpactIndex:
+    """Reverse-reachability index over the condensation of a DependencyGraph."""
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.component_of, self.components = graph.strongly_connected_components()
+        self.offsets, self.importers = condensed_adjacency(graph.imported_by, (self.component_of, self.components))
+
+    def resolve(self, changes, source_root=None):
+        """
+        Map changed module names and .py paths to module ids.
+
+        Paths are looked up in the modules found under `source_root` or, without
+        one, turned into dotted names relative to the current directory.
+        Returns (ids, unknown), where unknown lists what matched no module.
+        """
+        index = self.graph.index
+        by_path = {}
+        if source_root is not None:
+            by_path = {os.path.abspath(path): module for module, path in find_modules(source_root).items()}
+
+        ids, unknown = set(), []
+        for change in changes:
+            module = change
+            if change.endswith(".py"):
+                path = os.path.abspath(change)
+                module = by_path.get(path)
+                if module is None:
+                    parts = os.path.relpath(path)[:-3].split(os.sep)
+                    if parts[-1] == "__init__":
+                        parts.pop()
+                    module = ".".join(parts)
+            if module in index:
+                ids.add(index[module])
+            else:
+                unknown.append(change)
+        return ids, unknown
+
+    def affected(self, module_ids):
+        """Ids of the given modules and of every module that imports one of them, transitively."""
+        offsets, importers = self.offsets, self.importers
+        seen = {self.component_of[node] for node in module_ids}
+        stack = list(seen)
+        while stack:
+            c = stack.pop()
+            for d in importers[offsets[c]:offsets[c + 1]]:
+                if d not in seen:
+                    seen.add(d)
+                    stack.append(d)
+        result = []
+        for c in seen:
+            result.extend(self.components[c])
+        return result
+
+    def distances(self, module_ids):
+        """
+        {id: fewest imports between it and a changed module} for every affected module.
+
+        This walks modules rather than components, to count every import on the way.
+        """
+        imported_by = self.graph.imported_by
+        distance = dict.fromkeys(module_ids, 0)
+        queue = deque(distance)
+        while queue:
+            node = queue.popleft()
+            step = distance[node] + 1
+            for importer in imported_by[node]:
+                if importer not in distance:
+                    distance[importer] = step
+                    queue.append(importer)
+        return distance
+
+    def query(self, changes, rank=False, select=None, source_root=None):
+        """
+        Modules affected by `changes` (module names and/or .py paths).
+
+        Returns (modules, unknown). With `rank`, modules is a list of
+        (module, distance) pairs, nearest first; otherwise a sorted list of
+        names. `select` keeps only modules matching one of the given glob
+        patterns (e.g. "tests.*").
+        """
+        module_ids, unknown = self.resolve(changes, source_root)
+        names = self.graph.names
+        if rank:
+            found = sorted(((names[node], d) for node, d in self.distances(module_ids).items()),
+                           key=lambda x: (x[1], x[0]))
+        else:
+            found = sorted(names[node] for node in self.affected(module_ids))
+        if select:
+            def keep(name):
+                return any(fnmatch.fnmatchcase(name, pattern) for pattern in select)
+            found = [item for item in found if keep(item[0] if rank else item)]
+        return found, unknown
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the modules affected by a change, e.g. to pick tests to run.")
+    parser.add_argument("dependency_file", help="dependencies.json or graph snapshot")
+    parser.add_argument("changes", nargs="*",
+                        help="changed module names or .py files; '-' (or nothing) reads them from stdin")
+    parser.add_argument("--source-root", default=None, help="source tree the .py paths belong to")
+    parser.add_argument("--rank", action="store_true", help="order by import distance from the change")
+    parser.add_argument("--select", action="append", default=None,
+                        help="only report modules matching this glob (repeatable), e.g. 'tests.*'")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    changes = [c for c in args.changes if c != "-"]
+    if not args.changes or "-" in args.changes:
+        changes.extend(line.strip() for line in sys.stdin if line.strip())
+
+    start_time = time.perf_counter()
+    impact_index = ImpactIndex(DependencyGraph.load(args.dependency_file))
+    index_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    found, unknown = impact_index.query(changes, args.rank, args.select, args.source_root)
+    query_time = time.perf_counter() - start_time
+
+    if args.json:
+        key = "ranked" if args.rank else "affected"
+        print(json.dumps({key: found, "unknown": unknown}, indent=2))
+    else:
+        for item in found:
+            print(f"{item[1]:>3}  {item[0]}" if args.rank else item)
+        # Keep stdout clean for piping into a test runner
+        if unknown:
+            print(f"Not in the graph: {', '.join(unknown)}", file=sys.stderr)
+        print(f"{len(found)} affected modules (index built in {index_time * 1000:.1f} ms, "
+              f"query took {query_time * 1000:.1f} ms)", file=sys.stderr)
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+"""
+Native import-graph extractor.
+
+Walks a Python source tree, parses every file with `ast` (nothing is imported or
+executed) and writes a dependencies.json in the same schema pydeps produces:
+
+    {"module": {"bacon": 1, "imports": [...], "imported_by": [...],
+                "name": "module", "path": "/abs/path/module.py"}, ...}
+
+Parsing is fanned out over a process pool; import resolution (relative imports,
+submodules imported with `from package import module`) happens afterwards in the
+parent process, once the full set of modules in the tree is known.
+"""
+
+import argparse
+import ast
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from importlib.machinery import PathFinder
+
+# Directories that never contain analyzable project sources
+SKIPPED_DIRS = {"__pycache__", ".git", ".hg", ".tox", ".nox", ".venv", "venv", "build", "dist",
+                "node_modules", ".mypy_cache", ".pytest_cache"}
+
+# Node types that can contain statements (and therefore imports)
+STATEMENT_NODES = (ast.stmt, ast.excepthandler, ast.match_case)
+
+# Below this many files the pool costs more than it saves
+PARALLEL_THRESHOLD = 64
+
+
+def find_modules(source_root):
+    """
+    Map every module under `source_root` to its file path.
+
+    If `source_root` is itself a package (it has an __init__.py), module names
+    start with the package name, just like `import package.module` would.
+    """
+    source_root = os.path.abspath(source_root)
+    base = source_root
+    while os.path.exists(os.path.join(base, "__init__.py")):
+        base = os.path.dirname(base)
+
+    modules = {}
+    for dirpath, dirnames, filenames in os.walk(source_root):
+        dirnames[:] = sorted(d for d in dirnames if d not in SKIPPED_DIRS and not d.startswith("."))
+        rel_parts = os.path.relpath(dirpath, base).split(os.sep)
+        if rel_parts == ["."]:
+            rel_parts = []
+        for filename in sorted(filenames):
+            if not filename.endswith(".py"):
+                continue
+            stem = filename[:-3]
+            parts = rel_parts if stem == "__init__" else rel_parts + [stem]
+            if not parts or not all(part.isidentifier() for part in parts):
+                continue
+            modules[".".join(parts)] = os.path.join(dirpath, filename)
+    return modules
+
+
+def parse_imports(path):
+    """
+    Parse one file and return its raw import statements.
+
+    Each record is [target, names, level]: `import a.b` gives ["a.b", None, 0],
+    `from ..x import y, z` gives ["x", ["y", "z"], 2]. Records are plain lists so
+    they can be cached as JSON.
+    """
+    try:
+        with open(path, "rb") as f:
+            tree = ast.parse(f.read(), filename=path)
+    except (SyntaxError, ValueError, OSError) as e:
+        print(f"Warning: could not parse {path}: {e}", file=sys.stderr)
+        return []
+
+    # Imports are statements, so only statement nodes need to be descended into
+    records = []
+    stack = [tree]
+    while stack:
+        for node in ast.iter_child_nodes(stack.pop()):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    records.append([alias.name, None, 0])
+            elif isinstance(node, ast.ImportFrom):
+                records.append([node.module or "", [alias.name for alias in node.names], node.level])
+            elif isinstance(node, STATEMENT_NODES):
+                stack.append(node)
+    return records
+
+
+def _parents(module):
+    """Yield a dotted module name and all of its parent packages."""
+    parts = module.split(".")
+    for i in range(len(parts), 0, -1):
+        yield ".".join(parts[:i])
+
+
+def resolve_imports(module, is_package, records, known_modules, include_external=True):
+    """
+    Turn raw import records of `module` into the set of modules it imports.
+
+    Importing a.b.c also imports packages a and a.b, so internal parents are
+    included. Third-party modules are reported by their top-level name and the
+    standard library is left out, as pydeps does by default.
+    """
+    package = module if is_package else module.rpartition(".")[0]
+    imported = set()
+    for target, names, level in records:
+        if level:
+            parts = package.split(".") if package else []
+            if level - 1 > len(parts):
+                continue  # relative import beyond the top-level package
+            base = ".".join(parts[:len(parts) - (level - 1)])
+            target = f"{base}.{target}" if base and target else (base or target)
+        if not target:
+            continue
+
+        internal = [parent for parent in _parents(target) if parent in known_modules]
+        if internal:
+            imported.update(internal)
+        else:
+            top_level = target.split(".")[0]
+            if include_external and top_level not in sys.stdlib_module_names and top_level != "__future__":
+                imported.add(top_level)
+
+        # `from package import module` imports a submodule
+        for name in names or ():
+            submodule = f"{target}.{name}"
+            if submodule in known_modules:
+                imported.add(submodule)
+
+    imported.discard(module)
+    return imported
+
+
+def _bacon_numbers(imports):
+    """
+    Distance of every module from an entry point (a module nothing imports).
+    Modules only reachable through cycles are seeded as extra entry points.
+    """
+    imported_by_anyone = {target for targets in imports.values() for target in targets}
+    bacon = {}
+    pending = sorted(imports)
+    seeds = [module for module in pending if module not in imported_by_anyone]
+    while True:
+        queue = deque(seed for seed in seeds if seed not in bacon)
+        for seed in queue:
+            bacon[seed] = 0
+        while queue:
+            module = queue.popleft()
+            for target in imports[module]:
+                if target not in bacon:
+                    bacon[target] = bacon[module] + 1
+                    queue.append(target)
+        unreached = [module for module in pending if module not in bacon]
+        if not unreached:
+            return bacon
+        seeds = unreached[:1]
+
+
+def _external_path(module):
+    """Locate a third-party top-level module on sys.path without importing it."""
+    try:
+        spec = PathFinder.find_spec(module)
+    except (ImportError, ValueError):
+        return None
+    if spec is None:
+        return None
+    if spec.origin and spec.origin not in ("built-in", "frozen"):
+        return spec.origin
+    return None
+
+
+def parse_all(paths, workers=None):
+    """Parse many files, in a process pool when there are enough of them."""
+    if workers == 1 or len(paths) < PARALLEL_THRESHOLD:
+        return [parse_imports(path) for path in paths]
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(paths) // (workers * 8))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(parse_imports, paths, chunksize=chunksize))
+
+
+def is_package_path(path):
+    """Whether `path` is the __init__.py of a package."""
+    return os.path.basename(path) == "__init__.py"
+
+
+def resolve_all(modules, raw_imports, include_external=True):
+    """Resolved imports (module -> set of modules) of every module in `modules`."""
+    return {module: resolve_imports(module, is_package_path(path), raw_imports[module], modules, include_external)
+            for module, path in modules.items()}
+
+
+def build_dependencies(modules, raw_imports, include_external=True):
+    """
+    Assemble the pydeps-style dependency dict.
+
+    `modules` maps module names to paths, `raw_imports` maps module names to the
+    records returned by parse_imports.
+    """
+    return assemble_dependencies(modules, resolve_all(modules, raw_imports, include_external))
+
+
+def assemble_dependencies(modules, resolved):
+    """
+    The pydeps-style dependency dict from the resolved imports of every module.
+
+    Imported modules outside `modules` (third-party ones) get their own entry.
+    """
+    imports = dict(resolved)
+    for targets in resolved.values():
+        for target in targets:
+            imports.setdefault(target, set())
+
+    imported_by = {module: set() for module in imports}
+    for module, targets in imports.items():
+        for target in targets:
+            imported_by[target].add(module)
+
+    bacon = _bacon_numbers(imports)
+    dependencies = {}
+    for module in sorted(imports):
+        entry = {"bacon": bacon[module], "name": module}
+        if imported_by[module]:
+            entry["imported_by"] = sorted(imported_by[module])
+        if imports[module]:
+            entry["imports"] = sorted(imports[module])
+        entry["path"] = modules.get(module) or _external_path(module)
+        dependencies[module] = entry
+    return dependencies
+
+
+def extract_dependencies(source_root, workers=None, include_external=True):
+    """Extract the import graph of every module under `source_root`."""
+    modules = find_modules(source_root)
+    names = list(modules)
+    parsed = parse_all([modules[name] for name in names], workers)
+    return build_dependencies(modules, dict(zip(names, parsed)), include_external)
+
+
+def write_dependencies(dependencies, output_file):
+    """Write the dependency dict in pydeps' layout (sorted keys, 4-space indent)."""
+    with open(output_file, "w") as f:
+        json.dump(dependencies, f, indent=4, sort_keys=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract a pydeps-style dependencies.json using ast only.")
+    parser.add_argument("source_root", help="package directory or directory containing packages")
+    parser.add_argument("-o", "--output", default="dependencies.json", help="where to write the JSON")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: all cores)")
+    parser.add_argument("--no-external", action="store_true", help="leave third-party modules out")
+    args = parser.parse_args()
+
+    start_time = time.time()
+    dependencies = extract_dependencies(args.source_root, args.workers, not args.no_external)
+    write_dependencies(dependencies, args.output)
+    edges = sum(len(entry.get("imports", [])) for entry in dependencies.values())
+    print(f"Extracted {len(dependencies)} modules and {edges} imports in "
+          f"{time.time() - start_time:.2f} seconds -> {args.output}")
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Timing and profiling records for the analysis stages.
+
+An Instrumentation object hands out `stage(name)` context managers. Each stage
+records wall time, CPU time, the process's peak RSS when it finished (and how
+much the stage raised it) and, if the caller fills it in, an item count. Stages
+can nest; every record names its parent. With a profile directory set, every
+outermost stage is also run under cProfile and dumped to NN_<name>.prof for
+pstats or snakeviz.
+
+The records are plain dicts so they can be written straight to JSON.
+"""
+
+import cProfile
+import json
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_kb():
+    """Peak resident set size of this process in KB, or None where it is unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def limit_memory(memory_limit_mb):
+    """
+    Cap the address space of this process (Unix only), e.g. as a worker initializer.
+
+    Allocations beyond the cap raise MemoryError instead of pushing the
+    machine into swap or the OOM killer.
+    """
+    if not memory_limit_mb or resource is None:
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+class Instrumentation:
+    """Collects one record per measured stage (see the module docstring)."""
+
+    def __init__(self, profile_dir=None):
+        self.profile_dir = profile_dir
+        self.records = []
+        self._open = []
+        self._profiling = False
+        self._profile_count = 0
+
+    @contextmanager
+    def stage(self, name, items=None):
+        """
+        Measure the enclosed block as stage `name`.
+
+        Yields the record, so the block can set record["items"] once it knows
+        how many things it processed.
+        """
+        record = {"stage": name, "parent": self._open[-1]["stage"] if self._open else None, "items": items}
+        profiler = None
+        if self.profile_dir and not self._profiling:
+            # cProfile can't nest, so only the outermost stage is profiled
+            profiler = cProfile.Profile()
+            self._profiling = True
+
+        self._open.append(record)
+        rss_before = peak_rss_kb()
+        cpu_start = time.process_time()
+        wall_start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield record
+        finally:
+            if profiler:
+                profiler.disable()
+            record["wall_seconds"] = round(time.perf_counter() - wall_start, 6)
+            record["cpu_seconds"] = round(time.process_time() - cpu_start, 6)
+            record["peak_rss_kb"] = peak_rss_kb()
+            record["rss_growth_kb"] = None if rss_before is None else record["peak_rss_kb"] - rss_before
+            self._open.pop()
+            self.records.append(record)
+            if profiler:
+                self._profiling = False
+                record["profile"] = self._dump_profile(profiler, name)
+
+    def _dump_profile(self, profiler, name):
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self._profile_count += 1
+        safe_name = re.sub(r"[^\w.-]+", "_", name)
+        path = os.path.join(self.profile_dir, f"{self._profile_count:02d}_{safe_name}.prof")
+        profiler.dump_stats(path)
+        return path
+
+    def as_dict(self):
+        return {
+            "python": sys.version.split()[0],
+            "pid": os.getpid(),
+            "peak_rss_kb": peak_rss_kb(),
+            "stages": self.records,
+        }
+
+    def write(self, path):
+        """Write all records as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.as_dict(), f, indent=2)
+        return path
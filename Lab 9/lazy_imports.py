@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Deferred imports of the plotting and table-formatting stack.
+
+matplotlib, networkx, numpy, PIL and tabulate together take well over a second
+to import, which dominates short metrics-only runs. The analysis scripts import
+them through these helpers from the stage that needs them, so a `--no-plots`
+run never loads the plotting stack at all. Plots are always rendered with the
+non-interactive Agg backend, so they also work on headless CI machines.
+"""
+
+import importlib
+import sys
+import time
+
+# Seconds a script may spend on imports and setup before the analysis starts
+STARTUP_BUDGET = 0.5
+
+
+def require(module_name, package=None):
+    """Import `module_name`, exiting with an install hint if it is missing."""
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        print(f"Error importing dependencies: {e}")
+        print(f"Make sure the required package is installed: {package or module_name.split('.')[0]}")
+        sys.exit(1)
+
+
+def pyplot():
+    """Return matplotlib.pyplot, forcing the Agg backend before it is first imported."""
+    matplotlib = require("matplotlib")
+    matplotlib.use("Agg")
+    return require("matplotlib.pyplot")
+
+
+def tabulate(*args, **kwargs):
+    """tabulate.tabulate, imported on first use."""
+    return require("tabulate").tabulate(*args, **kwargs)
+
+
+def report_startup(start_time, budget=STARTUP_BUDGET):
+    """Print how long startup took (since `start_time`) against the budget."""
+    elapsed = time.perf_counter() - start_time
+    status = "within" if elapsed <= budget else "OVER"
+    print(f"Startup: {elapsed * 1000:.0f} ms ({status} the {budget * 1000:.0f} ms budget)")
+    return elapsed
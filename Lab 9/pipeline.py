@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the dependency analysis.
+
+Runs any selection of these stages against one loaded dependency graph:
+
+    coupling  fan-in/fan-out/coupling table and coupling_metrics.csv
+    cycles    cyclic components (plus, with --enumerate, a bounded cycle list),
+              cyclic_dependencies_report.md
+    depth     longest import chain
+    impact    direct and transitive impact scores
+    risk      risk scores and dependency_impact_report.md
+    summary   dependency_metrics_summary.txt
+    plots     the charts of analyze_dependencies, fan_analysis and the impact assessment
+
+Intermediate results are cached properties of an AnalysisContext, so a stage
+only computes what no earlier stage needed yet: the SCCs are found once and
+shared by cycles, depth and risk, and with --enumerate simple_cycles runs once
+for both the cycle report and the summary.
+
+Loading the graph and every metric, report and chart are recorded by an
+Instrumentation (wall and CPU time, peak RSS, item counts); --instrument writes
+the records as JSON and --profile-dir adds a cProfile dump per stage.
+"""
+
+import time
+
+# Taken first so the startup measurement covers every import below
+start_time = time.perf_counter()
+
+import argparse
+import os
+from functools import cached_property, wraps
+
+from cycle_detector import (DEFAULT_MAX_CYCLE_LENGTH, DEFAULT_MAX_CYCLES, detect_cycles,
+                            iter_cycles, summarize_cycle_components)
+from dependency_graph import DependencyGraph
+from dependency_impact_assessment import (calculate_impact_scores, calculate_risk_scores,
+                                          generate_charts, generate_report)
+from dependency_plots import (SCALABLE_FAN_OUTPUT, draw_core_dependencies, draw_fan_density, draw_fan_scatter,
+                              draw_fan_table, draw_package_graph)
+from dependency_reports import categorize_modules, write_coupling_csv, write_fan_csv, write_fan_html, write_summary
+from instrumentation import Instrumentation
+from lazy_imports import report_startup, tabulate
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+
+def measured(name):
+    """
+    Like cached_property, but the first computation is recorded as stage `name`
+    on the context's instrumentation, with the size of the result as item count.
+    """
+    def decorator(method):
+        @wraps(method)
+        def compute(self):
+            with self.instrumentation.stage(name) as record:
+                value = method(self)
+                if hasattr(value, "__len__"):
+                    record["items"] = len(value)
+            return value
+        return cached_property(compute)
+    return decorator
+
+
+class AnalysisContext:
+    """
+    Everything the stages share, each piece computed on first use.
+
+    Individual cycles are only enumerated with `enumerate_cycles`; otherwise
+    the reports describe cycles by their components alone.
+
+    The graph itself caches its SCCs, so every property derived from them
+    (cycle components, cyclic modules, depth profile, risk) reuses one pass.
+    Computing a property is recorded on `instrumentation` under the property's
+    metric name.
+    """
+
+    def __init__(self, dependency_file, output_dir=None, max_cycle_length=DEFAULT_MAX_CYCLE_LENGTH,
+                 max_cycles=DEFAULT_MAX_CYCLES, centrality_method="connections", pivots=None,
+                 instrumentation=None, enumerate_cycles=False):
+        self.dependency_file = dependency_file
+        self.output_dir = output_dir or os.path.dirname(os.path.abspath(dependency_file))
+        self.max_cycle_length = max_cycle_length
+        self.max_cycles = max_cycles
+        self.enumerate_cycles = enumerate_cycles
+        self.centrality_method = centrality_method
+        self.pivots = pivots
+        self.instrumentation = instrumentation or Instrumentation()
+
+    def output_path(self, filename):
+        return os.path.join(self.output_dir, filename)
+
+    @measured("load")
+    def graph(self):
+        """The dependency graph, streamed straight from the JSON file."""
+        return DependencyGraph.load(self.dependency_file)
+
+    @measured("metric:scc")
+    def scc(self):
+        return self.graph.strongly_connected_components()[1]
+
+    @measured("metric:cyclic_modules")
+    def cyclic_modules(self):
+        self.scc  # computed (and recorded) once, then cached on the graph
+        return {self.graph.names[module_id] for module_id in self.graph.cyclic_nodes()}
+
+    @measured("metric:depth")
+    def depth_profile(self):
+        self.scc  # see cyclic_modules
+        return self.graph.longest_chains()
+
+    @measured("metric:coupling")
+    def coupling_table(self):
+        """Per-module records (see DependencyGraph.coupling_table) with depth, height and in_cycle."""
+        table = self.graph.coupling_table()
+        depth_profile = self.depth_profile
+        cyclic_modules = self.cyclic_modules
+        for module_id, m in enumerate(table.values()):
+            m["depth"] = depth_profile.depth[module_id]
+            m["height"] = depth_profile.height[module_id]
+            m["in_cycle"] = m["module"] in cyclic_modules
+        return table
+
+    @cached_property
+    def coupling_metrics(self):
+        """The coupling records ranked by coupling score."""
+        return sorted(self.coupling_table.values(), key=lambda x: x["coupling"], reverse=True)
+
+    @measured("metric:cycle_components")
+    def cycle_components(self):
+        self.scc  # see cyclic_modules
+        return summarize_cycle_components(self.graph)
+
+    @measured("metric:cycles")
+    def cycles(self):
+        """Individual cycles, bounded by max_cycle_length and max_cycles."""
+        return list(iter_cycles(self.graph, self.cycle_components, self.max_cycle_length, self.max_cycles))
+
+    @measured("metric:impact")
+    def impact_scores(self):
+        return calculate_impact_scores(self.graph)
+
+    @measured("metric:risk")
+    def risk_scores(self):
+        return calculate_risk_scores(self.graph, self.centrality_method, self.pivots, self.coupling_table)
+
+
+def run_coupling(ctx):
+    """Print the most coupled modules and the categorization, write coupling_metrics.csv."""
+    print("Top 10 Most Coupled Modules:")
+    table_data = [[m["module"], m["fan_in"], m["fan_out"], m["coupling"]]
+                  for m in ctx.coupling_metrics[:10]]
+    print(tabulate(table_data, headers=["Module", "Fan-In", "Fan-Out", "Coupling Score"], tablefmt="grid"))
+
+    categories = categorize_modules(ctx.coupling_metrics)
+    labels = ["Stable Abstractions", "Unstable Abstractions", "Stable Concretions", "Unstable Concretions"]
+    for label, modules in zip(labels, categories):
+        print(f"{label}: {len(modules)}")
+
+    csv_path = ctx.output_path("coupling_metrics.csv")
+    with ctx.instrumentation.stage("report:coupling_metrics.csv", len(ctx.coupling_metrics)):
+        write_coupling_csv(csv_path, ctx.coupling_metrics)
+    print(f"Coupling metrics saved as {csv_path}")
+
+
+def run_cycles(ctx):
+    """Report cyclic components and, if enumerated, the bounded cycle list (cycle_detector's report)."""
+    components = ctx.cycle_components
+    cycles = ctx.cycles if ctx.enumerate_cycles else None
+    with ctx.instrumentation.stage("report:cyclic_dependencies_report.md", len(cycles or components)):
+        detect_cycles(ctx.dependency_file, ctx.enumerate_cycles, ctx.max_cycle_length, ctx.max_cycles,
+                      graph=ctx.graph, components=components, cycles=cycles,
+                      report_file=ctx.output_path("cyclic_dependencies_report.md"))
+
+
+def run_depth(ctx):
+    """Print the longest import chain, with import cycles collapsed into one step."""
+    chain = ctx.depth_profile.chain
+    if not chain:
+        print("Could not determine the longest dependency chain.")
+        return
+    chain_names = []
+    for i in chain:
+        name = ctx.graph.names[i]
+        if name in ctx.cyclic_modules:
+            name += " (cycle)"
+        chain_names.append(name)
+    print(f"Maximum dependency depth: {len(chain) - 1}")
+    print(f"Longest dependency chain: {' -> '.join(chain_names)}")
+
+
+def run_impact(ctx):
+    """Print the modules whose changes affect the most other modules."""
+    print("Top 10 Modules by Impact:")
+    table_data = [[score['module'], score['direct_impact'], score['indirect_impact'], score['total_impact']]
+                  for score in ctx.impact_scores[:10]]
+    print(tabulate(table_data, headers=["Module", "Direct Impact", "Indirect Impact", "Total Impact"],
+                   tablefmt="grid"))
+
+
+def run_risk(ctx):
+    """Print the riskiest modules and write dependency_impact_report.md."""
+    print("Top 10 Modules by Risk:")
+    table_data = [[score['module'], score['fan_in'], score['fan_out'],
+                   'Yes' if score['in_cycle'] else 'No',
+                   f"{score['centrality']:.1f}", f"{score['risk_score']:.1f}"]
+                  for score in ctx.risk_scores[:10]]
+    print(tabulate(table_data, headers=["Module", "Fan-In", "Fan-Out", "In Cycle", "Centrality", "Risk Score"],
+                   tablefmt="grid"))
+
+    impact_scores, risk_scores = ctx.impact_scores, ctx.risk_scores
+    with ctx.instrumentation.stage("report:dependency_impact_report.md", len(risk_scores)):
+        report_path, _, _ = generate_report(impact_scores, risk_scores, ctx.graph, ctx.output_dir, plots=False)
+    print(f"Report generated: {report_path}")
+
+
+def run_summary(ctx):
+    """Write dependency_metrics_summary.txt."""
+    summary_path = ctx.output_path("dependency_metrics_summary.txt")
+    coupling_metrics = ctx.coupling_metrics
+    cycle_count = len(ctx.cycles) if ctx.enumerate_cycles else None
+    with ctx.instrumentation.stage("report:dependency_metrics_summary.txt", len(coupling_metrics)):
+        write_summary(summary_path, coupling_metrics, ctx.graph.number_of_edges(),
+                      len(ctx.cycle_components), len(ctx.cyclic_modules), cycle_count, ctx.max_cycle_length,
+                      ctx.max_cycles)
+    print(f"Summary saved as {summary_path}")
+
+
+def run_plots(ctx):
+    """Draw every chart; this is the only stage that imports the plotting stack."""
+    graph = ctx.graph
+    coupling_metrics, coupling_table = ctx.coupling_metrics, ctx.coupling_table
+    impact_scores, risk_scores = ctx.impact_scores, ctx.risk_scores
+    measure = ctx.instrumentation.stage
+    paths = []
+
+    with measure("chart:core_dependencies"):
+        paths.append(draw_core_dependencies(graph, coupling_metrics, coupling_table,
+                                            ctx.output_path("core_dependencies.png")))
+
+    with measure("chart:package_dependencies", len(graph)):
+        paths.append(draw_package_graph(graph, ctx.output_path("package_dependencies.png")))
+
+    fan_ins, fan_outs = graph.fan_in_counts(), graph.fan_out_counts()
+    if len(graph) > SCALABLE_FAN_OUTPUT:
+        # Too many modules for a table image or a labeled scatter plot
+        with measure("chart:fan_table", len(graph)):
+            paths.append(write_fan_csv(ctx.output_path("fan_table.csv"), graph.names, fan_ins, fan_outs))
+            paths.append(write_fan_html(ctx.output_path("fan_table.html"), graph.names, fan_ins, fan_outs))
+        with measure("chart:fan_analysis_scatter", len(graph)):
+            paths.append(draw_fan_density(graph.names, fan_ins, fan_outs, ctx.output_path("fan_analysis_scatter.png")))
+    else:
+        with measure("chart:dependency_table", len(coupling_table)):
+            table_data = sorted([m["module"], m["fan_out"], m["fan_in"]] for m in coupling_table.values())
+            table_str = tabulate(table_data, headers=["Module", "Fan-Out", "Fan-In"], tablefmt="grid")
+            paths.append(draw_fan_table(table_str, len(table_data), ctx.output_path("dependency_table.png")))
+
+        with measure("chart:fan_analysis_scatter", len(graph)):
+            paths.append(draw_fan_scatter(graph.names, fan_ins, fan_outs, ctx.output_path("fan_analysis_scatter.png")))
+
+    with measure("chart:impact_and_risk"):
+        paths.extend(generate_charts(impact_scores, risk_scores, ctx.output_dir))
+    for path in paths:
+        print(f"Chart saved as {path}")
+
+
+# Stages in the order they run, whatever order they are requested in
+STAGES = {
+    "coupling": run_coupling,
+    "cycles": run_cycles,
+    "depth": run_depth,
+    "impact": run_impact,
+    "risk": run_risk,
+    "summary": run_summary,
+    "plots": run_plots,
+}
+
+
+def run_pipeline(ctx, stages=None):
+    """
+    Run the selected stages (default: all) against `ctx` and return it.
+
+    Loading the graph and every stage are recorded on ctx.instrumentation; the
+    metrics and reports a stage computes are nested below it.
+    """
+    selected = set(STAGES if stages is None else stages)
+    unknown = selected - STAGES.keys()
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+
+    # Load up front so the first stage's numbers don't include it
+    with ctx.instrumentation.stage("stage:load") as record:
+        record["items"] = len(ctx.graph)
+
+    for name, stage in STAGES.items():
+        if name not in selected:
+            continue
+        print(f"\n=== {name} ===")
+        with ctx.instrumentation.stage(f"stage:{name}") as record:
+            stage(ctx)
+        print(f"[{name}] done in {record['wall_seconds']:.2f} seconds "
+              f"(CPU {record['cpu_seconds']:.2f} s, peak RSS {_format_kb(record['peak_rss_kb'])})")
+    return ctx
+
+
+def _format_kb(kb):
+    return "n/a" if kb is None else f"{kb / 1024:.0f} MB"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run selected dependency analysis stages on one shared graph.")
+    parser.add_argument("dependency_file", nargs="?", default=os.path.join(current_dir, "dependencies.json"),
+                        help="pydeps-style dependencies.json to analyze")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"comma-separated stages to run (default: {','.join(STAGES)})")
+    parser.add_argument("--no-plots", action="store_true", help="drop the plots stage")
+    parser.add_argument("--output-dir", default=None,
+                        help="where to write the outputs (default: next to the dependency file)")
+    parser.add_argument("--enumerate", action="store_true", dest="enumerate_cycles",
+                        help="also list individual cycles (bounded by --max-length and --max-cycles)")
+    parser.add_argument("--max-length", type=int, default=DEFAULT_MAX_CYCLE_LENGTH,
+                        help="longest cycle to enumerate")
+    parser.add_argument("--max-cycles", type=int, default=DEFAULT_MAX_CYCLES,
+                        help="stop enumerating after this many cycles")
+    parser.add_argument("--centrality", choices=["connections", "betweenness"], default="connections",
+                        help="centrality measure feeding the risk score")
+    parser.add_argument("--pivots", type=int, default=None,
+                        help="estimate betweenness from this many sampled source modules")
+    parser.add_argument("--instrument", default=None, metavar="JSON",
+                        help="write per-stage timings, CPU time, peak RSS and item counts to this file")
+    parser.add_argument("--profile-dir", default=None,
+                        help="also run every stage under cProfile and dump the stats here")
+    args = parser.parse_args()
+
+    stages = [stage.strip() for stage in args.stages.split(",") if stage.strip()]
+    if args.no_plots:
+        stages = [stage for stage in stages if stage != "plots"]
+    unknown = [stage for stage in stages if stage not in STAGES]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)} (choose from {', '.join(STAGES)})")
+
+    report_startup(start_time)
+    context = AnalysisContext(args.dependency_file, args.output_dir, args.max_length, args.max_cycles,
+                              args.centrality, args.pivots, Instrumentation(args.profile_dir),
+                              args.enumerate_cycles)
+    run_pipeline(context, stages)
+    if args.instrument:
+        print(f"\nInstrumentation saved as {context.instrumentation.write(args.instrument)}")
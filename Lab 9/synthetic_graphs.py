@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Generator for synthetic dependencies.json files.
+
+Produces pydeps-shaped graphs of any size for benchmarking. Modules are laid
+out in layers: module i mostly imports modules with a smaller index (the lower,
+more basic layers), which keeps the graph acyclic. Each import target is drawn
+with probability proportional to 1 / (rank + 1) ** hub_skew, so a larger skew
+concentrates the imports on a few hub modules, as in real code bases where
+everything imports the utils and config modules. A `back_edges` fraction of
+the imports point upwards instead; those are what create import cycles, and
+the larger the fraction, the larger the strongly connected components get.
+"""
+
+import argparse
+import json
+import random
+from bisect import bisect_left
+from itertools import accumulate
+
+
+def module_names(count, fanout=16):
+    """Dotted, package-like names: pkg0.mod3, pkg0.sub1.mod7, ..."""
+    names = []
+    for i in range(count):
+        parts = []
+        package = i // fanout
+        while True:
+            parts.append(f"pkg{package % fanout}" if not parts else f"sub{package % fanout}")
+            package //= fanout
+            if not package:
+                break
+        names.append(".".join(parts + [f"mod{i % fanout}"]))
+    return names
+
+
+def generate_imports(count, avg_imports=5.0, hub_skew=1.0, back_edges=0.01, seed=42):
+    """
+    Return one sorted list of imported module indexes per module.
+
+    The number of imports of a module is geometrically distributed with mean
+    `avg_imports`, capped at the number of possible targets.
+    """
+    rng = random.Random(seed)
+    # Cumulative hub weights: lower index = more popular
+    cumulative = list(accumulate((rank + 1) ** -hub_skew for rank in range(count)))
+    p_stop = 1.0 / (avg_imports + 1.0)
+
+    imports = []
+    for module in range(count):
+        targets = set()
+        wanted = 0
+        while rng.random() > p_stop:
+            wanted += 1
+        wanted = min(wanted, count - 1)
+        attempts = 0
+        while len(targets) < wanted and attempts < wanted * 4:
+            attempts += 1
+            if module and rng.random() >= back_edges:
+                # Import from a lower layer, weighted towards the hubs
+                target = bisect_left(cumulative, rng.random() * cumulative[module - 1])
+            elif module < count - 1:
+                # Import from a higher layer, closing cycles
+                target = rng.randrange(module + 1, count)
+            else:
+                continue
+            targets.add(min(target, count - 1))
+        targets.discard(module)
+        imports.append(sorted(targets))
+    return imports
+
+
+def generate_dependencies(count, avg_imports=5.0, hub_skew=1.0, back_edges=0.01, seed=42):
+    """Build a pydeps-style dependency dict (module -> {"imports", "imported_by", ...})."""
+    names = module_names(count)
+    imports = generate_imports(count, avg_imports, hub_skew, back_edges, seed)
+    imported_by = [[] for _ in range(count)]
+    for module, targets in enumerate(imports):
+        for target in targets:
+            imported_by[target].append(module)
+
+    dependencies = {}
+    for module, name in enumerate(names):
+        entry = {"bacon": 0, "name": name, "path": None}
+        if imported_by[module]:
+            entry["imported_by"] = [names[i] for i in imported_by[module]]
+        if imports[module]:
+            entry["imports"] = [names[i] for i in imports[module]]
+        dependencies[name] = entry
+    return dependencies
+
+
+def write_synthetic(path, count, avg_imports=5.0, hub_skew=1.0, back_edges=0.01, seed=42):
+    """Generate a graph and write it as a dependencies.json file; returns the edge count."""
+    dependencies = generate_dependencies(count, avg_imports, hub_skew, back_edges, seed)
+    with open(path, "w") as f:
+        json.dump(dependencies, f)
+    return sum(len(entry.get("imports", ())) for entry in dependencies.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a synthetic dependencies.json for benchmarking.")
+    parser.add_argument("modules", type=int, help="number of modules")
+    parser.add_argument("-o", "--output", default="synthetic_dependencies.json", help="where to write the JSON")
+    parser.add_argument("--avg-imports", type=float, default=5.0, help="mean number of imports per module")
+    parser.add_argument("--hub-skew", type=float, default=1.0,
+                        help="0 spreads imports evenly, larger values concentrate them on a few hubs")
+    parser.add_argument("--back-edges", type=float, default=0.01,
+                        help="fraction of imports pointing to a higher layer (creates cycles)")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    args = parser.parse_args()
+
+    edges = write_synthetic(args.output, args.modules, args.avg_imports, args.hub_skew, args.back_edges, args.seed)
+    print(f"Wrote {args.modules} modules and {edges} imports to {args.output}")
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Watch a source tree and keep the dependency metrics live.
+
+Polls file sizes and mtimes with os.stat (no OS-specific file watching), waits
+until a burst of saves has settled, then feeds the batch through the same
+incremental cache as analysis_cache.py. The module map, graph, metrics and
+cache stay in memory between refreshes, so editing a file costs a reparse and
+re-resolution of that file plus the metric updates for the part of the graph
+its changed imports can affect. Adding or deleting a file re-resolves every
+module (without reparsing the unchanged ones), which takes longer.
+
+Every refresh rewrites coupling_metrics.csv and dependency_metrics_summary.txt
+from the updated metrics, and cyclic_dependencies_report.md (the same sections
+as cycle_detector's report) whenever its content changes. dependencies.json
+serializes the whole graph, so it is written at most once per write delay and
+when the watcher stops.
+
+Only files that find_modules would list are watched: .py files with
+identifier names in directories with identifier names.
+"""
+
+import argparse
+import io
+import os
+import time
+
+from analysis_cache import DEFAULT_CACHE_FILE, AnalysisCache, LiveAnalysis
+from import_extractor import SKIPPED_DIRS
+
+# Seconds between two scans of the tree
+DEFAULT_POLL_INTERVAL = 0.1
+# Seconds without further changes before a batch of edits is analyzed
+DEFAULT_SETTLE_TIME = 0.05
+# Seconds a refresh may wait before dependencies.json is written
+DEFAULT_WRITE_DELAY = 1.0
+
+
+def scan_tree(source_root):
+    """Map every .py file under `source_root` that can be a module to its (size, mtime_ns)."""
+    state = {}
+    stack = [source_root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    # find_modules skips the files of these directories as well
+                    if entry.name not in SKIPPED_DIRS and not entry.name.startswith(".") \
+                            and entry.name.isidentifier():
+                        stack.append(entry.path)
+                elif entry.name.endswith(".py") and entry.name[:-3].isidentifier():
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue
+                    state[entry.path] = (stat.st_size, stat.st_mtime_ns)
+    return state
+
+
+def changed_paths(before, after):
+    """Paths added, removed or modified between two scans."""
+    return {path for path in before.keys() | after.keys() if before.get(path) != after.get(path)}
+
+
+def cycle_report_text(live, output_dir):
+    """
+    The cyclic_dependencies_report.md that cycle_detector.py would write for
+    OUTPUT_DIR/dependencies.json (without --enumerate). Break suggestions are
+    cached per component, so only components a refresh touched are solved again.
+    """
+    from cycle_detector import (rank_by_cycle_imports, write_cycle_breaks, write_problematic_modules,
+                                write_report_summary)
+    components = live.cache.cycle_summaries(live.graph)
+    buffer = io.StringIO()
+    write_report_summary(buffer, os.path.join(output_dir, "dependencies.json"), components)
+    if components:
+        write_problematic_modules(buffer, live.graph, rank_by_cycle_imports(components))
+        write_cycle_breaks(buffer, [c["breaks"] for c in components])
+    return buffer.getvalue()
+
+
+def update_cycle_report(live, output_dir, written=None):
+    """Rewrite cyclic_dependencies_report.md if it differs from `written`; returns the current text."""
+    report = cycle_report_text(live, output_dir)
+    if report != written:
+        with open(os.path.join(output_dir, "cyclic_dependencies_report.md"), "w") as f:
+            f.write(report)
+    return report
+
+
+def report_refresh(cache, recomputed, paths, elapsed, show_modules=True):
+    """Print one line per refresh plus the current numbers of the modules that changed."""
+    stamp = time.strftime("%H:%M:%S")
+    component_count, cyclic_module_count = cache.cyclic_totals()
+    print(f"[{stamp}] {len(paths)} file(s) changed, {len(recomputed)} module(s) recomputed "
+          f"in {elapsed * 1000:.1f} ms - {len(cache.metrics)} modules, {cache.edge_count} imports, "
+          f"{component_count} cyclic components ({cyclic_module_count} modules)")
+    if not show_modules:
+        return
+    for module in sorted(recomputed)[:10]:
+        m = cache.metrics.get(module)
+        if m:
+            print(f"    {module}: fan-in {m['fan_in']}, fan-out {m['fan_out']}, coupling {m['coupling']}, "
+                  f"impact {m['transitive_importers']}{', in cycle' if m['in_cycle'] else ''}")
+    if len(recomputed) > 10:
+        print(f"    ... and {len(recomputed) - 10} more")
+
+
+def watch(source_root, output_dir, cache_file=None, poll_interval=DEFAULT_POLL_INTERVAL,
+          settle_time=DEFAULT_SETTLE_TIME, workers=None, write_delay=DEFAULT_WRITE_DELAY, enumerate_cycles=False):
+    """Analyze `source_root` once, then keep the outputs updated until interrupted."""
+    source_root = os.path.abspath(source_root)
+    cache = AnalysisCache(cache_file or os.path.join(output_dir, DEFAULT_CACHE_FILE))
+    live = LiveAnalysis(cache, source_root, workers, enumerate_cycles)
+
+    start_time = time.perf_counter()
+    state = scan_tree(source_root)
+    _, recomputed = live.rebuild()
+    live.write_outputs(output_dir)
+    report = update_cycle_report(live, output_dir)
+    report_refresh(cache, recomputed, state, time.perf_counter() - start_time, show_modules=False)
+    print(f"Watching {source_root} (Ctrl+C to stop)")
+
+    pending = set()
+    last_change = 0.0
+    unwritten_since = None
+    try:
+        while True:
+            time.sleep(poll_interval)
+            current = scan_tree(source_root)
+            paths = changed_paths(state, current)
+            state = current
+            now = time.perf_counter()
+            if unwritten_since is not None and now - unwritten_since >= write_delay:
+                live.write_dependency_file(output_dir)
+                unwritten_since = None
+            if paths:
+                # Keep collecting until the burst of saves settles
+                pending |= paths
+                last_change = now
+                continue
+            if not pending or now - last_change < settle_time:
+                continue
+
+            start_time = time.perf_counter()
+            _, recomputed = live.refresh(pending)
+            live.write_metrics(output_dir)
+            report = update_cycle_report(live, output_dir, report)
+            report_refresh(cache, recomputed, pending, time.perf_counter() - start_time)
+            pending = set()
+            if unwritten_since is None:
+                unwritten_since = time.perf_counter()
+    except KeyboardInterrupt:
+        print("\nStopped watching.")
+    finally:
+        if unwritten_since is not None:
+            live.write_dependency_file(output_dir)
+        cache.save()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Keep dependency metrics live while files change.")
+    parser.add_argument("source_root", help="package directory or directory containing packages")
+    parser.add_argument("--output-dir", default=".", help="where to write the analysis files")
+    parser.add_argument("--cache", default=None, help=f"cache file (default: OUTPUT_DIR/{DEFAULT_CACHE_FILE})")
+    parser.add_argument("--interval", type=float, default=DEFAULT_POLL_INTERVAL, help="seconds between scans")
+    parser.add_argument("--settle", type=float, default=DEFAULT_SETTLE_TIME,
+                        help="quiet seconds before a batch of changes is analyzed")
+    parser.add_argument("--workers", type=int, default=None, help="parser processes (default: all cores)")
+    parser.add_argument("--write-delay", type=float, default=DEFAULT_WRITE_DELAY,
+                        help="longest wait in seconds before dependencies.json catches up with a refresh "
+                             "(the CSV, summary and cycle report are written by every refresh)")
+    parser.add_argument("--enumerate", action="store_true", dest="enumerate_cycles",
+                        help="count individual cycles for the summary")
+    args = parser.parse_args()
+    watch(args.source_root, args.output_dir, args.cache, args.interval, args.settle, args.workers,
+          args.write_delay, args.enumerate_cycles)